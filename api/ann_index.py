@@ -0,0 +1,119 @@
+import logging
+import math
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+# O k-means do FAISS pede ao menos 39 vetores de treino por centróide
+MIN_POINTS_PER_CENTROID = 39
+# Abaixo de 16 centróides por subquantizador o PQ perde precisão demais
+MIN_PQ_NBITS = 4
+
+
+def max_centroids(n_train: int) -> int:
+    return max(1, n_train // MIN_POINTS_PER_CENTROID)
+
+
+def default_nlist(n_vectors: int) -> int:
+    """~4·√n listas, limitado para haver ao menos 39 vetores de treino por centróide."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), max_centroids(n_vectors)))
+
+
+def index_spec(index_type: str, n_vectors: int, dim: int, nlist: int = 0,
+               pq_m: int = 0, pq_nbits: int = 8, hnsw_m: int = 32, n_train: int | None = None) -> str:
+    """
+    Traduz o tipo de índice configurado em uma string do faiss.index_factory.
+    nlist e o codebook do PQ (2**nbits centróides) ficam limitados pelo
+    número de vetores de treino (n_train, padrão n_vectors); se nem um PQ de
+    MIN_PQ_NBITS bits treina com o corpus, o índice cai para Flat (exato).
+    """
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    n_train = n_vectors if n_train is None else min(n_train, n_vectors)
+    requested = nlist or default_nlist(n_train)
+    nlist = min(requested, max_centroids(n_train))
+    if nlist < requested:
+        logger.warning("⚠️  nlist=%d exige mais vetores de treino; usando nlist=%d (%d vetores)", requested, nlist, n_train)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        nbits = min(pq_nbits, int(math.log2(max_centroids(n_train))))
+        if nbits < MIN_PQ_NBITS:
+            logger.warning("⚠️  %d vetores não bastam para treinar IVF-PQ; usando índice Flat (exato)", n_train)
+            return "Flat"
+        if nbits < pq_nbits:
+            logger.warning("⚠️  PQ com %d bits exige mais vetores de treino; usando %d bits", pq_nbits, nbits)
+        # m subquantizadores de nbits cada: dim*4 bytes -> m*nbits/8 bytes por vetor
+        m = pq_m or next(m for m in (48, 32, 24, 16, 12, 8, 4) if dim % m == 0)
+        return f"IVF{nlist},PQ{m}x{nbits}"
+    raise ValueError(f"Tipo de índice desconhecido: {index_type} (opções: {', '.join(INDEX_TYPES)})")
+
+
+def create_trained_index(spec: str, training_vectors: np.ndarray, hnsw_ef_construction: int = 200):
+    """Cria o índice vazio (métrica L2, como o FAISS do LangChain) e treina se necessário."""
+    dim = training_vectors.shape[1]
+    index = faiss.index_factory(dim, spec)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = hnsw_ef_construction
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(training_vectors, dtype=np.float32))
+    return index
+
+
+def supports_removal(index) -> bool:
+    """
+    Só o Flat remove vetores renumerando as posições, como o FAISS do LangChain
+    espera ao reindexar o index_to_docstore_id. O IVF mantém os rótulos
+    originais (a próxima inserção os reutilizaria) e o HNSW não remove;
+    nesses casos o índice precisa ser reconstruído.
+    """
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+
+def apply_search_params(index, nprobe: int = 0, ef_search: int = 0) -> dict:
+    """Ajusta nprobe (IVF) e efSearch (HNSW) em tempo de consulta; ignora o que não se aplica."""
+    applied = {}
+    params = faiss.ParameterSpace()
+    for name, value in (("nprobe", nprobe), ("efSearch", ef_search)):
+        if not value:
+            continue
+        try:
+            params.set_index_parameter(index, name, value)
+            applied[name] = value
+        except RuntimeError:
+            pass
+    return applied
+
+
+def filtered_search_params(index, positions: np.ndarray):
+    """
+    Parâmetros de busca que restringem o FAISS às posições dadas (pré-filtro
+    por subconjunto de ids): só os vetores permitidos disputam o top-k, em vez
+    de buscar a mais e descartar depois. Copia nprobe/efSearch do índice, já
+    que os SearchParameters substituem os valores configurados nele.
+    Retorna (params, selector): o chamador precisa manter o selector vivo.
+    """
+    positions = np.ascontiguousarray(positions, dtype=np.int64)
+    selector = faiss.IDSelectorBatch(len(positions), faiss.swig_ptr(positions))
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    elif hasattr(base, "hnsw"):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return params, (selector, positions)
+
+
+def index_type_name(index) -> str:
+    return type(faiss.downcast_index(index)).__name__
+
+
+def bytes_per_vector(index) -> float:
+    """Tamanho serializado do índice por vetor (serializa o índice inteiro; não usar no caminho quente)."""
+    return round(faiss.serialize_index(index).size / max(index.ntotal, 1), 1)
@@ -0,0 +1,252 @@
+import asyncio
+import base64
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+# Validade das entradas no backend compartilhado quando ttl_seconds=0: o Redis
+# roda com volatile-lru e só despeja chaves com TTL, então toda resposta tem um
+# (as chaves de controle, sem TTL, nunca são despejadas)
+SHARED_FALLBACK_TTL_S = 24 * 3600
+
+
+def normalize_question(text: str) -> str:
+    """Normaliza a pergunta para o cache exato: minúsculas, sem acentos, pontuação e espaços extras."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s.]", " ", text)
+    text = re.sub(r"\.(?!\d)", " ", text)  # preserva números de seção como 6.2.5
+    return " ".join(text.split())
+
+
+class AnswerCache:
+    """
+    Cache de respostas em dois níveis na frente do pipeline RAG:
+      1. exato: pergunta normalizada -> resposta
+      2. semântico: reutiliza a resposta cujo embedding da pergunta tem
+         similaridade de cosseno >= similarity_threshold com a nova pergunta
+
+    Despejo LRU limitado a max_entries, expiração por TTL e invalidação total
+    sempre que a versão do índice FAISS muda.
+
+    Com um backend compartilhado (shared), o nível exato também é gravado e
+    consultado nele, com a versão do índice na chave: uma resposta gerada
+    por um worker é servida pelos demais. O nível semântico continua local,
+    alimentado também pelas entradas trazidas do backend. As chamadas ao
+    backend (bloqueantes) rodam no executor padrão, fora do event loop.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600,
+                 similarity_threshold: float = 0.95, index_version: str | None = None,
+                 shared=None, key_prefix: str = "rag"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.index_version = index_version
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._matrix: np.ndarray | None = None
+        self._matrix_keys: list[str] = []
+        self.shared = shared
+        self.key_prefix = key_prefix
+        self.stats = {
+            'exact_hits': 0,
+            'shared_hits': 0,
+            'semantic_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'stale_writes': 0
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, entry: dict) -> bool:
+        return self.ttl_seconds > 0 and time.time() - entry['created_at'] > self.ttl_seconds
+
+    def _remove(self, key: str):
+        del self._entries[key]
+        self._matrix = None
+
+    async def get_exact(self, question: str):
+        """Busca pela pergunta normalizada. Não conta falta: a busca semântica vem em seguida."""
+        return (await self.get_exact_many([question]))[0]
+
+    async def get_exact_many(self, questions: list[str]) -> list:
+        """
+        Nível exato para várias perguntas (ex.: /ask/batch): as que faltam na
+        memória local são buscadas no backend compartilhado em uma única
+        leitura (MGET no Redis).
+        """
+        keys = [normalize_question(question) for question in questions]
+        values = [self._get_local(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if self.shared is None or not missing:
+            return values
+
+        version = self.index_version
+        shared_keys = [self._shared_key(keys[i], version) for i in missing]
+        raws = await asyncio.get_running_loop().run_in_executor(None, self.shared.get_many, shared_keys)
+        if self.index_version != version:
+            # Índice trocado durante a leitura: as entradas são da versão antiga
+            return values
+        for i, raw in zip(missing, raws):
+            if raw is None:
+                continue
+            entry = _decode_entry(raw)
+            if self._expired(entry):
+                continue
+            self._insert(keys[i], entry)
+            self.stats['shared_hits'] += 1
+            self.stats['exact_hits'] += 1
+            values[i] = entry['value']
+        return values
+
+    def _get_local(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            self._remove(key)
+            self.stats['expirations'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats['exact_hits'] += 1
+        return entry['value']
+
+    def get_semantic(self, query_vector: np.ndarray):
+        """Retorna (valor, similaridade) da entrada mais próxima acima do limiar, ou (None, melhor similaridade)."""
+        self._purge_expired()
+        if self._matrix is None:
+            # Entradas sem embedding (perguntas resolvidas por seção) só valem no nível exato
+            self._matrix_keys = [k for k, entry in self._entries.items() if entry['vector'] is not None]
+            if self._matrix_keys:
+                self._matrix = np.stack([self._entries[k]['vector'] for k in self._matrix_keys])
+        if not self._matrix_keys or self.similarity_threshold > 1:
+            self.stats['misses'] += 1
+            return None, 0.0
+
+        similarities = self._matrix @ _unit(query_vector)
+        best = int(np.argmax(similarities))
+        best_similarity = float(similarities[best])
+        if best_similarity < self.similarity_threshold:
+            self.stats['misses'] += 1
+            return None, best_similarity
+
+        key = self._matrix_keys[best]
+        self._entries.move_to_end(key)
+        self.stats['semantic_hits'] += 1
+        return self._entries[key]['value'], best_similarity
+
+    def record_miss(self):
+        """Falta sem busca semântica (pergunta que cita seções): só o nível exato foi consultado."""
+        self.stats['misses'] += 1
+
+    def put(self, question: str, query_vector: np.ndarray | None, value: dict,
+            index_version: str | None = None) -> bool:
+        """
+        Grava a resposta. index_version é a versão do índice usada na
+        recuperação: se o índice foi trocado enquanto a resposta era gerada,
+        a gravação é descartada (a resposta viria do índice antigo para o
+        cache já invalidado). Retorna se a resposta foi gravada.
+        """
+        if index_version is not None and index_version != self.index_version:
+            self.stats['stale_writes'] += 1
+            return False
+        key = normalize_question(question)
+        entry = {
+            'value': value,
+            'vector': _unit(query_vector) if query_vector is not None else None,
+            'created_at': time.time()
+        }
+        self._insert(key, entry)
+        if self.shared is not None:
+            self._put_shared(self._shared_key(key, self.index_version), _encode_entry(entry))
+        return True
+
+    def _shared_key(self, key: str, index_version: str | None) -> str:
+        return f"{self.key_prefix}:answers:{index_version}:{key}"
+
+    def _put_shared(self, shared_key: str, payload: bytes):
+        ttl_seconds = self.ttl_seconds if self.ttl_seconds > 0 else SHARED_FALLBACK_TTL_S
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # fora do event loop (scripts): grava direto
+            self.shared.set(shared_key, payload, ttl_seconds)
+            return
+        # Sem esperar: a resposta já está no cache local e vai para o cliente
+        loop.run_in_executor(None, self.shared.set, shared_key, payload, ttl_seconds)
+
+    def _insert(self, key: str, entry: dict):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._matrix = None
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _purge_expired(self):
+        if self.ttl_seconds <= 0:
+            return
+        expired = [k for k, entry in self._entries.items() if self._expired(entry)]
+        for key in expired:
+            self._remove(key)
+        self.stats['expirations'] += len(expired)
+
+    def invalidate(self, index_version: str | None = None):
+        """
+        Descarta todas as respostas (ex.: índice FAISS reconstruído). No
+        backend compartilhado, as entradas da versão antiga deixam de ser
+        consultadas (a versão faz parte da chave) e expiram pelo TTL.
+        """
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_keys = []
+        self.index_version = index_version
+        self.stats['invalidations'] += 1
+
+    def ensure_index_version(self, index_version: str):
+        if index_version != self.index_version:
+            self.invalidate(index_version)
+
+    def summary(self) -> dict:
+        hits = self.stats['exact_hits'] + self.stats['semantic_hits']
+        lookups = hits + self.stats['misses']
+        return {
+            **self.stats,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'similarity_threshold': self.similarity_threshold,
+            'shared_backend': self.shared.name if self.shared is not None else None,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'index_version': self.index_version
+        }
+
+
+def _encode_entry(entry: dict) -> bytes:
+    vector = entry['vector']
+    return json.dumps({
+        'value': entry['value'],
+        'vector': base64.b64encode(vector.astype(np.float32).tobytes()).decode("ascii") if vector is not None else None,
+        'created_at': entry['created_at']
+    }, ensure_ascii=False).encode("utf-8")
+
+
+def _decode_entry(raw: bytes) -> dict:
+    data = json.loads(raw)
+    if data['vector'] is not None:
+        data['vector'] = np.frombuffer(base64.b64decode(data['vector']), dtype=np.float32)
+    return data
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1 @@
+"""Benchmarks offline da API RAG (sem consumo da OpenAI nem acesso à rede)."""
@@ -0,0 +1,126 @@
+"""
+Relatório recall × latência dos índices ANN (IVF-Flat, IVF-PQ, HNSW)
+em relação ao índice exato (Flat), para escolher a configuração por
+tamanho de corpus.
+
+Usa os vetores reais do cache de embeddings (create_vector_store.py) quando
+existir e completa com vetores sintéticos até cada tamanho pedido.
+
+    cd api
+    python -m benchmarks.ann_report --corpus-sizes 10000 100000 --output ann.json
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+import faiss
+import numpy as np
+
+from ann_index import apply_search_params, bytes_per_vector, create_trained_index, index_spec
+from benchmarks.common import git_revision, percentiles
+from embedding_service import embedding_cache_file, load_embedding_cache
+
+CACHE_FILE = embedding_cache_file("iso17025_faiss_qwen", "all-MiniLM-L6-v2")
+SWEEPS = {
+    "ivf_flat": ("nprobe", [1, 4, 8, 16, 32, 64]),
+    "ivf_pq": ("nprobe", [1, 4, 8, 16, 32, 64]),
+    "hnsw": ("efSearch", [16, 32, 64, 128, 256]),
+}
+
+
+def corpus_vectors(size: int, dim: int, base: np.ndarray | None, rng, keep_base: bool = True) -> np.ndarray:
+    """Vetores reais (quando houver) + perturbações deles, imitando a distribuição do corpus."""
+    if base is None or len(base) == 0:
+        return rng.standard_normal((size, dim), dtype=np.float32)
+    picks = base[rng.integers(0, len(base), size)]
+    noise = rng.standard_normal((size, dim), dtype=np.float32) * picks.std() * 0.5
+    vectors = picks + noise
+    if keep_base:
+        vectors[:min(size, len(base))] = base[:size]
+    return vectors.astype(np.float32)
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found[i] = ids[0]
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {"recall_at_k": round(float(recall), 4), "latency_ms": percentiles(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall × latência dos índices ANN")
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--index-types", nargs="+", default=list(SWEEPS), choices=list(SWEEPS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    base = load_embedding_cache(CACHE_FILE)[1]
+    dim = base.shape[1] if base is not None else args.dim
+    faiss.omp_set_num_threads(1)  # latência por consulta, como no serviço
+
+    results = {}
+    for size in args.corpus_sizes:
+        print(f"📐 Corpus com {size} vetores...", file=sys.stderr)
+        vectors = corpus_vectors(size, dim, base, rng)
+        queries = corpus_vectors(args.queries, dim, vectors, rng, keep_base=False)
+
+        flat = create_trained_index("Flat", vectors)
+        flat.add(vectors)
+        _, truth = flat.search(queries, args.k)
+        size_results = {"flat": {
+            "spec": "Flat",
+            "bytes_per_vector": bytes_per_vector(flat),
+            **measure(flat, queries, truth, args.k),
+        }}
+
+        for index_type in args.index_types:
+            spec = index_spec(index_type, size, dim)
+            start = time.perf_counter()
+            index = create_trained_index(spec, vectors)
+            index.add(vectors)
+            build_s = time.perf_counter() - start
+            param, values = SWEEPS[index_type]
+            sweep = []
+            for value in values:
+                applied = apply_search_params(index, **{"nprobe" if param == "nprobe" else "ef_search": value})
+                if not applied:
+                    continue
+                sweep.append({param: value, **measure(index, queries, truth, args.k)})
+            size_results[index_type] = {
+                "spec": spec,
+                "build_s": round(build_s, 2),
+                "bytes_per_vector": bytes_per_vector(index),
+                "sweep": sweep,
+            }
+        results[str(size)] = size_results
+
+    report = {
+        "benchmark": "ann_report",
+        "generated_at": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "config": vars(args),
+        "vectors_source": "embedding_cache" if base is not None else "synthetic",
+        "results": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"💾 Relatório salvo em {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+
+import numpy as np
+import uvicorn
+
+SECTIONS = {
+    "4": "Requisitos gerais",
+    "5": "Requisitos de estrutura",
+    "6": "Requisitos de recursos",
+    "7": "Requisitos de processo",
+    "8": "Requisitos do sistema de gestão",
+}
+SUBJECTS = [
+    "imparcialidade", "confidencialidade", "pessoal", "instalações e condições ambientais",
+    "equipamentos", "rastreabilidade metrológica", "produtos e serviços providos externamente",
+    "análise crítica de pedidos", "seleção e validação de métodos", "amostragem",
+    "manuseio de itens de ensaio ou calibração", "registros técnicos",
+    "incerteza de medição", "garantia da validade dos resultados", "relato de resultados",
+    "reclamações", "trabalho não conforme", "controle de dados", "gestão de riscos",
+    "ações corretivas", "auditorias internas", "análise crítica pela gestão",
+]
+VERBS = [
+    "deve assegurar", "deve documentar", "deve manter registros de", "deve avaliar",
+    "deve implementar procedimentos para", "deve monitorar", "deve comunicar ao cliente",
+]
+
+QUESTIONS = [
+    "Quais procedimentos são obrigatórios segundo a norma?",
+    "Quando devo calibrar equipamentos de medição?",
+    "Por quanto tempo devo reter registros de ensaio?",
+    "Onde encontro informações sobre manuseio de amostras?",
+    "Quais são os requisitos para competência do pessoal?",
+    "Como garantir a rastreabilidade metrológica dos resultados?",
+    "O que a seção 7.4.1 exige sobre itens de ensaio?",
+    "Como tratar trabalho não conforme?",
+    "Quais informações devem constar no relatório de ensaio?",
+    "Como avaliar a incerteza de medição?",
+]
+
+
+def synthetic_corpus(size: int, seed: int = 17025) -> list[dict]:
+    """Gera requisitos no mesmo formato do iso17025.json (titulo/texto)."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(size):
+        section = rng.choice(list(SECTIONS))
+        number = f"{section}.{rng.randint(1, 9)}.{rng.randint(1, 12)}"
+        subject = rng.choice(SUBJECTS)
+        sentences = [
+            f"O laboratório {rng.choice(VERBS)} {rng.choice(SUBJECTS)}"
+            f" relacionados a {subject}."
+            for _ in range(rng.randint(2, 5))
+        ]
+        items.append({
+            "titulo": f"{number} {SECTIONS[section]} - {subject.capitalize()} ({i})",
+            "texto": " ".join(sentences),
+        })
+    return items
+
+
+def corpus_texts(items: list[dict]) -> list[str]:
+    return [f"{item['titulo']}. {item['texto']}" for item in items]
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    array = np.asarray(values, dtype=np.float64)
+    return {
+        "count": int(array.size),
+        "mean": round(float(array.mean()), 3),
+        "p50": round(float(np.percentile(array, 50)), 3),
+        "p95": round(float(np.percentile(array, 95)), 3),
+        "p99": round(float(np.percentile(array, 99)), 3),
+        "max": round(float(array.max()), 3),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, port: int, timeout: float = 120) -> uvicorn.Server:
+    """Sobe um app ASGI com uvicorn em uma thread daemon e espera ficar pronto."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + timeout
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"Servidor na porta {port} não iniciou em {timeout}s")
+        time.sleep(0.05)
+    return server
+
+
+def wait_ready(base_url: str, timeout: float = 300) -> dict:
+    """Espera o /ready da API responder 200 (modelo e índice aquecidos) e retorna o corpo."""
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            response = httpx.get(f"{base_url}/ready", timeout=5)
+            if response.status_code == 200:
+                return response.json()
+            if response.json().get("status") == "failed":
+                raise RuntimeError(f"Inicialização da API falhou: {response.json().get('error')}")
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"API em {base_url} não ficou pronta em {timeout}s")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
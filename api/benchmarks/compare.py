@@ -0,0 +1,46 @@
+"""
+Compara dois relatórios JSON de benchmark (ex.: de commits diferentes)
+e mostra a variação percentual de cada métrica numérica.
+
+    python -m benchmarks.compare base.json novo.json
+"""
+import argparse
+import json
+
+
+def flatten(data, prefix=""):
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key in ("config", "generated_at", "git_revision"):
+                continue
+            yield from flatten(value, f"{prefix}{key}.")
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield prefix.rstrip("."), float(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara relatórios de benchmark")
+    parser.add_argument("base")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Variação percentual a partir da qual a métrica é destacada")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    print(f"Base: {base.get('git_revision')}  Candidato: {candidate.get('git_revision')}")
+
+    base_metrics = dict(flatten(base))
+    for key, value in flatten(candidate):
+        if key not in base_metrics:
+            continue
+        old = base_metrics[key]
+        change = (value - old) / old * 100 if old else 0.0
+        flag = " ⚠️" if abs(change) >= args.threshold else ""
+        print(f"{key:70s} {old:12.3f} -> {value:12.3f} ({change:+.1f}%){flag}")
+
+
+if __name__ == "__main__":
+    main()
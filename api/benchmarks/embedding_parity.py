@@ -0,0 +1,95 @@
+"""
+Paridade e latência dos backends de embeddings (torch, onnx, onnx-int8).
+
+Codifica perguntas e requisitos sintéticos com cada backend, compara os
+vetores com os do PyTorch (referência usada para construir o índice) e mede
+a latência por consulta (lote 1) e por lote, além da memória residente
+acrescentada pelo carregamento de cada backend. Sai com código 1 se algum
+backend ficar abaixo de --min-cosine.
+
+    cd api
+    python -m benchmarks.embedding_parity --backends onnx onnx-int8 --output parity.json
+"""
+import argparse
+import json
+import resource
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.common import QUESTIONS, corpus_texts, git_revision, percentiles, synthetic_corpus
+from embedding_service import create_embeddings, parity_report
+
+
+def rss_mb() -> float:
+    """Pico de memória residente do processo (Linux: ru_maxrss em KiB)."""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def bench_backend(embeddings, texts: list[str], batch_size: int, repeats: int) -> dict:
+    embeddings.encode(QUESTIONS[:1])  # aquecimento
+    single = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        embeddings.encode([QUESTIONS[i % len(QUESTIONS)]])
+        single.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        embeddings.encode(texts[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    return {
+        "query_ms": percentiles(single),
+        "corpus_texts_per_s": round(len(texts) / max(elapsed, 1e-9), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridade e latência dos backends de embeddings")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"])
+    parser.add_argument("--corpus-size", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    texts = list(QUESTIONS) + corpus_texts(synthetic_corpus(args.corpus_size))
+
+    # Backends candidatos primeiro: o torch infla a memória residente do processo
+    results = {}
+    vectors = {}
+    for backend in args.backends + ["torch"]:
+        before = rss_mb()
+        embeddings = create_embeddings(backend, batch_size=args.batch_size)
+        results[backend] = {"load_rss_mb": round(rss_mb() - before, 1)}
+        results[backend].update(bench_backend(embeddings, texts, args.batch_size, args.repeats))
+        vectors[backend] = embeddings.encode(texts)
+
+    failed = []
+    for backend in args.backends:
+        results[backend]["parity"] = parity_report(vectors[backend], vectors["torch"])
+        if results[backend]["parity"]["min_cosine"] < args.min_cosine:
+            failed.append(backend)
+
+    report = {
+        "benchmark": "embedding_parity",
+        "generated_at": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "config": vars(args),
+        "backends": results,
+        "failed": failed,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"💾 Relatório salvo em {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    if failed:
+        print(f"❌ Abaixo de {args.min_cosine} de cosseno mínimo: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
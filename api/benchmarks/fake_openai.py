@@ -0,0 +1,116 @@
+"""
+Servidor local que imita POST /v1/chat/completions da OpenAI (com e sem
+streaming), com latência sorteada de uma distribuição log-normal.
+
+Uso isolado:
+    python -m benchmarks.fake_openai --port 8100 --latency-ms 1500
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = (
+    "Conforme o item 6.4.7 da ISO/IEC 17025:2017, o laboratório deve estabelecer um programa "
+    "de calibração, que deve ser analisado criticamente e ajustado conforme necessário para "
+    "manter a confiança na situação da calibração dos equipamentos."
+).split()
+
+
+def create_app(latency_ms: float = 1500, sigma: float = 0.35, ttft_fraction: float = 0.15,
+               completion_tokens: int = 200, seed: int | None = None) -> FastAPI:
+    """
+    latency_ms: mediana do tempo total de geração
+    sigma: desvio do log da latência (0 = latência fixa)
+    ttft_fraction: fração da latência gasta até o primeiro token
+    """
+    rng = random.Random(seed)
+    app = FastAPI(title="Fake OpenAI")
+    app.state.requests = 0
+
+    def sample_latency() -> float:
+        return latency_ms / 1000 * (rng.lognormvariate(0, sigma) if sigma > 0 else 1)
+
+    def usage(body: dict) -> dict:
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        total = sample_latency()
+        tokens = [WORDS[i % len(WORDS)] + " " for i in range(completion_tokens)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "gpt-4o-mini")
+
+        if not body.get("stream"):
+            await asyncio.sleep(total)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage(body),
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def sse():
+            def chunk(choices, **extra):
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": choices,
+                    **extra,
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            await asyncio.sleep(total * ttft_fraction)
+            per_token = total * (1 - ttft_fraction) / max(len(tokens), 1)
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(per_token)
+                yield chunk([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+            yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                yield chunk([], usage=usage(body))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(sse(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor OpenAI falso para benchmarks")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=1500)
+    parser.add_argument("--sigma", type=float, default=0.35)
+    parser.add_argument("--ttft-fraction", type=float, default=0.15)
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    args = parser.parse_args()
+    app = create_app(args.latency_ms, args.sigma, args.ttft_fraction, args.completion_tokens)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
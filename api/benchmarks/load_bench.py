@@ -0,0 +1,177 @@
+"""
+Teste de carga offline da API: sobe o main.app contra o OpenAI falso
+(benchmarks/fake_openai.py) e um corpus ISO 17025 sintético, dispara
+consultas com concorrência configurável e emite um relatório JSON com
+vazão e p50/p95/p99 por etapa.
+
+    cd api
+    python -m benchmarks.load_bench --concurrency 32 --requests 500 --output bench.json
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+from benchmarks.common import (
+    QUESTIONS, corpus_texts, free_port, git_revision, percentiles, start_server, synthetic_corpus,
+    wait_ready
+)
+from benchmarks import fake_openai
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_synthetic_index(workdir: str, corpus_size: int):
+    """Cria iso17025_faiss_qwen em workdir a partir do corpus sintético."""
+    from langchain_community.vectorstores import FAISS
+    from embedding_service import CPUEmbeddings, text_hash
+    from index_store import write_compact_index
+
+    texts = corpus_texts(synthetic_corpus(corpus_size))
+    embeddings = CPUEmbeddings()
+    vectors = embeddings.encode(texts)
+    ids = [text_hash(text) for text in texts]
+    index = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, ids=ids)
+    index_path = os.path.join(workdir, "iso17025_faiss_qwen")
+    index.save_local(index_path)
+    # Mesmo formato compacto (mmap) que a API carrega em produção
+    write_compact_index(index_path, ids, ((text, {}) for text in texts), [vectors], dim=vectors.shape[1])
+
+
+def load_api(workdir: str, fake_port: int, cache: bool):
+    """Importa main.py apontando o cliente OpenAI para o servidor falso."""
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/v1"
+    os.environ["ANSWER_CACHE_ENABLED"] = "true" if cache else "false"
+    os.chdir(workdir)
+    if API_DIR not in sys.path:
+        sys.path.insert(0, API_DIR)
+    return importlib.import_module("main")
+
+
+async def run_stream_request(client: httpx.AsyncClient, question: str) -> dict:
+    start = time.perf_counter()
+    first_token = None
+    metrics = {}
+    async with client.stream("POST", "/ask/stream", json={"question": question}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["event"] == "token" and first_token is None:
+                first_token = (time.perf_counter() - start) * 1000
+            elif event["event"] == "done":
+                metrics = event["metrics"]
+            elif event["event"] == "error":
+                raise RuntimeError(event["error"])
+    return {**metrics, "client_ttft_ms": first_token}
+
+
+async def run_request(client: httpx.AsyncClient, endpoint: str, question: str) -> dict:
+    if endpoint == "stream":
+        return await run_stream_request(client, question)
+    response = await client.post("/ask", json={"question": question})
+    response.raise_for_status()
+    data = response.json()
+    if "error" in data:
+        raise RuntimeError(data["error"])
+    return data["metrics"]
+
+
+async def drive(base_url: str, endpoint: str, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, errors = [], {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def one(i: int):
+            # Sufixo numérico evita que o cache exato sirva todas as consultas
+            question = f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    metrics = await run_request(client, endpoint, question)
+                except Exception as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                    return
+                samples.append({**metrics, "client_total_ms": (time.perf_counter() - start) * 1000})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    stages = {}
+    for key in ("client_total_ms", "client_ttft_ms", "total_time_ms", "retrieval_time_ms",
+                "generation_time_ms", "time_to_first_token_ms"):
+        values = [s[key] for s in samples if s.get(key) is not None]
+        if values:
+            stages[key] = percentiles(values)
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "completed": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 3) if elapsed else 0,
+        "latency_ms": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga offline da API RAG")
+    parser.add_argument("--endpoint", choices=["ask", "stream"], default="ask")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--corpus-size", type=int, default=156)
+    parser.add_argument("--llm-latency-ms", type=float, default=1500)
+    parser.add_argument("--llm-sigma", type=float, default=0.35)
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--cache", action="store_true", help="Mantém o cache de respostas ativo")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    print(f"🔹 Construindo índice sintético ({args.corpus_size} requisitos) em {workdir}...", file=sys.stderr)
+    build_synthetic_index(workdir, args.corpus_size)
+
+    fake_port, api_port = free_port(), free_port()
+    start_server(fake_openai.create_app(
+        latency_ms=args.llm_latency_ms, sigma=args.llm_sigma,
+        completion_tokens=args.completion_tokens, seed=0
+    ), fake_port)
+    main_module = load_api(workdir, fake_port, args.cache)
+    start_server(main_module.app, api_port)
+
+    base_url = f"http://127.0.0.1:{api_port}"
+    startup = wait_ready(base_url)
+    if args.warmup:
+        asyncio.run(drive(base_url, args.endpoint, args.warmup, 1))
+    print(f"🔹 Executando {args.requests} consultas com concorrência {args.concurrency}...", file=sys.stderr)
+    result = asyncio.run(drive(base_url, args.endpoint, args.requests, args.concurrency))
+
+    report = {
+        "benchmark": "load_test",
+        "generated_at": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "config": vars(args),
+        "startup_ms": startup.get("startup_ms", {}),
+        **result,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"💾 Relatório salvo em {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Micro-benchmarks das etapas de recuperação: embeddings.encode por
+tamanho de lote e busca no formato compacto (CompactStore, o caminho usado
+pela API) por tamanho de corpus.
+
+    cd api
+    python -m benchmarks.micro --corpus-sizes 156 1000 10000 --output micro.json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.common import QUESTIONS, corpus_texts, git_revision, percentiles, synthetic_corpus
+from index_manager import LoadedIndex
+from index_store import CompactStore, write_compact_index
+
+
+def time_calls(fn, repeats: int) -> list[float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_encode(embeddings, batch_sizes: list[int], repeats: int) -> dict:
+    results = {}
+    for batch_size in batch_sizes:
+        batch = [QUESTIONS[i % len(QUESTIONS)] for i in range(batch_size)]
+        embeddings.encode(batch)  # aquecimento
+        summary = percentiles(time_calls(lambda: embeddings.encode(batch), repeats))
+        summary["texts_per_s"] = round(batch_size / (summary["mean"] / 1000), 1)
+        results[str(batch_size)] = summary
+    return results
+
+
+def compact_index(directory: str, texts: list[str], vectors: np.ndarray) -> LoadedIndex:
+    """Grava o corpus no formato compacto (Flat) e o abre como a API abre."""
+    ids = [f"doc-{i}" for i in range(len(texts))]
+    records = ((text, {"section": text.split(" ", 1)[0]}) for text in texts)
+    blocks = (vectors[i:i + 4096] for i in range(0, len(vectors), 4096))
+    write_compact_index(directory, ids, records, blocks, dim=vectors.shape[1])
+    return LoadedIndex(store=CompactStore(directory), version="micro")
+
+
+def bench_search(embeddings, corpus_sizes: list[int], k: int, repeats: int) -> dict:
+    query_vectors = embeddings.encode(QUESTIONS)
+    results = {}
+    for size in corpus_sizes:
+        print(f"🔍 Corpus com {size} requisitos...", file=sys.stderr)
+        texts = corpus_texts(synthetic_corpus(size))
+        # Vetores aleatórios para corpora grandes: o custo da busca independe do conteúdo
+        if size <= 5000:
+            vectors = np.asarray(embeddings.encode(texts), dtype=np.float32)
+        else:
+            vectors = np.random.default_rng(0).standard_normal((size, query_vectors.shape[1]), dtype=np.float32)
+
+        with tempfile.TemporaryDirectory(prefix="micro-") as directory:
+            index = compact_index(directory, texts, vectors)
+            cursor = iter(range(10**9))
+
+            def search_by_vector():
+                index.dense_search(query_vectors[next(cursor) % len(query_vectors)], k=k)
+
+            def search_by_text():
+                question = QUESTIONS[next(cursor) % len(QUESTIONS)]
+                hits = index.dense_search(embeddings.encode([question])[0], k=k)
+                index.documents_for([doc_id for doc_id, _ in hits[0]])
+
+            search_by_vector()  # aquecimento: page faults do mmap
+            results[str(size)] = {
+                "search_by_vector_ms": percentiles(time_calls(search_by_vector, repeats)),
+                "search_with_encode_ms": percentiles(time_calls(search_by_text, repeats)),
+            }
+            del index
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de embeddings e busca no índice compacto")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[156, 1000, 10000, 100000])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--backend", default="torch", help="Backend de embeddings: torch, onnx ou onnx-int8")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    from embedding_service import create_embeddings
+    embeddings = create_embeddings(args.backend)
+
+    report = {
+        "benchmark": "micro",
+        "generated_at": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "config": vars(args),
+        "encode_ms_by_batch_size": bench_encode(embeddings, args.batch_sizes, args.repeats),
+        "search_ms_by_corpus_size": bench_search(embeddings, args.corpus_sizes, args.k, args.repeats),
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"💾 Relatório salvo em {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
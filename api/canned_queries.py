@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+from answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Perguntas de exemplo da interface (frontend/app_streamlit.py): as mais repetidas
+DEFAULT_CANNED_QUERIES = [
+    "Quais procedimentos são obrigatórios segundo a norma?",
+    "Quando devo calibrar equipamentos de medição?",
+    "Por quanto tempo devo reter registros de ensaio?",
+    "Onde encontro informações sobre manuseio de amostras?",
+]
+
+
+def load_canned_queries(path: str | None) -> list[str]:
+    """Exemplos da interface + perguntas de CANNED_QUERIES_FILE (lista JSON ou uma pergunta por linha)."""
+    questions = list(DEFAULT_CANNED_QUERIES)
+    if not path:
+        return questions
+    if not os.path.exists(path):
+        logger.warning("⚠️  CANNED_QUERIES_FILE '%s' não encontrado; usando só os exemplos da interface", path)
+        return questions
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if path.endswith(".json"):
+        questions.extend(json.loads(content))
+    else:
+        questions.extend(line for line in content.splitlines() if not line.lstrip().startswith("#"))
+    return questions
+
+
+class CannedQueries:
+    """
+    Tabela de perguntas frequentes com embedding calculado uma única vez na
+    inicialização, em um só forward pass: no caminho da requisição essas
+    perguntas não passam pelo modelo. O ranking de cada uma, na profundidade
+    fixa do /search, também fica guardado por versão do índice; depois de uma
+    troca de índice ele é refeito na primeira consulta (o embedding continua válido).
+    """
+
+    def __init__(self, questions: list[str], depth: int = 100):
+        unique = {}
+        for question in questions:
+            question = question.strip()
+            if question:
+                unique.setdefault(normalize_question(question), question)
+        self.questions = unique
+        self.depth = depth
+        self._vectors: dict[str, np.ndarray] = {}
+        self._rankings: dict[str, tuple[str, list]] = {}
+
+    def encode(self, embeddings) -> int:
+        """Codifica todas as perguntas da tabela de uma vez; retorna quantas."""
+        if not self.questions:
+            return 0
+        vectors = np.asarray(embeddings.encode(list(self.questions.values())), dtype=np.float32)
+        self._vectors = dict(zip(self.questions, vectors))
+        return len(self._vectors)
+
+    def __contains__(self, question: str) -> bool:
+        return normalize_question(question) in self._vectors
+
+    def vector(self, question: str) -> np.ndarray | None:
+        return self._vectors.get(normalize_question(question))
+
+    def ranking(self, question: str, version: str) -> list | None:
+        """Ranking guardado para esta versão do índice, ou None."""
+        entry = self._rankings.get(normalize_question(question))
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1]
+
+    def store_ranking(self, question: str, version: str, ranked: list):
+        self._rankings[normalize_question(question)] = (version, ranked)
+
+    def summary(self) -> dict:
+        return {
+            'queries': len(self._vectors),
+            'depth': self.depth,
+            'rankings': len(self._rankings)
+        }
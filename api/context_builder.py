@@ -0,0 +1,103 @@
+import logging
+import math
+import re
+from typing import NamedTuple
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Codificação do gpt-4o/gpt-4o-mini. O arquivo BPE é baixado pelo tiktoken na
+# primeira vez e fica em TIKTOKEN_CACHE_DIR (a imagem Docker já o inclui).
+TOKEN_ENCODING = "o200k_base"
+# Sem tiktoken: ~4 bytes UTF-8 por token, suficiente para respeitar o orçamento
+BYTES_PER_TOKEN = 4
+
+
+class TokenCounter:
+    """Contagem de tokens compatível com o tiktoken, com estimativa por bytes como alternativa offline."""
+
+    def __init__(self, encoding_name: str = TOKEN_ENCODING):
+        self.encoding = None
+        try:
+            import tiktoken
+            self.encoding = tiktoken.get_encoding(encoding_name)
+            self.backend = f"tiktoken:{encoding_name}"
+        except Exception as e:  # tiktoken ausente ou sem o arquivo BPE (sem rede)
+            logger.warning("⚠️  tiktoken indisponível (%s); contagem de tokens estimada por bytes", e)
+            self.backend = "estimate"
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text.encode("utf-8")) / BYTES_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        return text.encode("utf-8")[:max_tokens * BYTES_PER_TOKEN].decode("utf-8", errors="ignore")
+
+
+class ContextPack(NamedTuple):
+    text: str
+    documents: list[Document]  # documentos que entraram no contexto, na ordem de ranqueamento
+    tokens: int
+    dropped: int  # documentos fora do orçamento ou inteiramente repetidos
+    truncated: bool
+
+
+def _sentences(text: str) -> list[str]:
+    return [part.strip() for part in re.split(r"(?<=[.;:!?])\s+|\n+", text) if part.strip()]
+
+
+def _sentence_key(sentence: str) -> str:
+    return " ".join(sentence.lower().split())
+
+
+class ContextBuilder:
+    """
+    Monta o contexto do prompt a partir dos documentos ranqueados: cada trecho
+    recebe a seção como cabeçalho, frases já incluídas por um trecho mais bem
+    ranqueado são removidas (requisitos sobrepostos) e os trechos entram em
+    ordem até o orçamento de tokens. Se nem o primeiro cabe, ele é truncado.
+    """
+
+    def __init__(self, counter: TokenCounter, max_tokens: int = 1500):
+        self.counter = counter
+        self.max_tokens = max_tokens
+
+    def build(self, docs: list[Document]) -> ContextPack:
+        seen = set()
+        parts, included = [], []
+        used, dropped, truncated = 0, 0, False
+        separator_tokens = self.counter.count("\n\n")
+        for doc in docs:
+            sentences, keys = [], []
+            for sentence in _sentences(doc.page_content):
+                key = _sentence_key(sentence)
+                if key not in seen and key not in keys:
+                    keys.append(key)
+                    sentences.append(sentence)
+            if not sentences:
+                dropped += 1
+                continue
+
+            section = doc.metadata.get("section") if doc.metadata else None
+            header = f"[Seção {section}]\n" if section else ""
+            chunk = header + " ".join(sentences)
+            cost = self.counter.count(chunk) + (separator_tokens if parts else 0)
+            if used + cost > self.max_tokens:
+                if not parts:
+                    chunk = self.counter.truncate(chunk, self.max_tokens)
+                    cost, truncated = self.counter.count(chunk), True
+                else:
+                    dropped += 1
+                    continue
+            seen.update(keys)
+            parts.append(chunk)
+            included.append(doc)
+            used += cost
+        return ContextPack("\n\n".join(parts), included, used, dropped, truncated)
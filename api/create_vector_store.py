@@ -1,87 +1,440 @@
 import os
 import json
+import shutil
+import time
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from typing import NamedTuple
 import numpy as np
 import requests
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer
+from langchain.embeddings.base import Embeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 
-# === 1. Carregar JSON (local ou online) ===
-data = None
-json_files = ["iso17025.json"]
-json_url = "https://media.rubenszinho.dev/rubenszinho/iso17025.json"
-
-# Tentar arquivo local primeiro
-for json_path in json_files:
-    if os.path.exists(json_path):
-        print(f"🔍 Carregando arquivo local: {json_path}")
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        break
-
-# Se não encontrou localmente, baixar online
-if data is None:
-    print(f"📥 Baixando JSON de: {json_url}")
+from ann_index import create_trained_index, index_spec, supports_removal
+from embedding_service import embedding_cache_file, embedding_cache_hashes_file, load_embedding_cache, text_hash
+from index_store import has_compact_index, write_compact_index
+from lexical_index import LEXICAL_INDEX_FILE, LexicalIndex, leading_clause
+
+try:
+    import ijson  # parsing incremental de JSON grandes
+except ImportError:
+    ijson = None
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+FAISS_PATH = "iso17025_faiss_qwen"
+MANIFEST_FILE = "manifest.json"
+# Cache de embeddings por (modelo, hash do texto); fica dentro do diretório
+# do índice para persistir junto com o volume do docker-compose
+EMBEDDING_CACHE_DIR = os.path.join(FAISS_PATH, "embedding_cache")
+FULL_REBUILD = os.getenv("FULL_REBUILD", "false").lower() == "true"
+
+# Arquivos JSON a ingerir, separados por vírgula, no formato arquivo=Nome da norma
+# (ex.: "iso17025.json=ISO/IEC 17025:2017,iso15189.json=ISO 15189:2022");
+# o padrão é baixado se não existir
+DEFAULT_JSON = "iso17025.json"
+DEFAULT_STANDARD = "ISO/IEC 17025:2017"
+JSON_URL = "https://media.rubenszinho.dev/rubenszinho/iso17025.json"
+CORPUS_FILES = [
+    (path.strip(), standard.strip() or (DEFAULT_STANDARD if path.strip() == DEFAULT_JSON
+                                        else os.path.splitext(os.path.basename(path.strip()))[0]))
+    for path, _, standard in (
+        entry.partition("=") for entry in os.getenv("CORPUS_FILES", DEFAULT_JSON).split(",") if entry.strip()
+    )
+]
+
+# Pipeline de embeddings: processos dimensionados pelos núcleos e lotes ajustáveis
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", str(os.cpu_count() or 1)))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Abaixo disso o custo de subir processos supera o ganho; codifica no próprio processo
+PARALLEL_MIN_TEXTS = 2000
+# Acima deste número de vetores o buffer de embeddings é um arquivo mapeado em memória
+MEMMAP_THRESHOLD = int(os.getenv("MEMMAP_THRESHOLD", "50000"))
+# Lote de vetores inseridos por vez no índice FAISS
+INDEX_ADD_CHUNK = 10000
+
+# Tipo de índice: flat (exato), ivf_flat, ivf_pq ou hnsw (ver ann_index.py)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 = automático (~4·√n)
+PQ_M = int(os.getenv("PQ_M", "0"))  # 0 = automático (divisor da dimensão)
+PQ_NBITS = int(os.getenv("PQ_NBITS", "8"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+# Máximo de vetores usados para treinar IVF/PQ
+TRAINING_SAMPLE = 100000
+
+
+# === 1. Leitura incremental do JSON (local ou online) ===
+def ensure_default_json():
+    """Baixa o JSON da ISO 17025 se ele não existir localmente."""
+    if os.path.exists(DEFAULT_JSON):
+        return
+    print(f"📥 Baixando JSON de: {JSON_URL}")
     try:
-        response = requests.get(json_url, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        print("JSON baixado com sucesso")
-        
-        # Salvar localmente para próximas execuções
-        with open("iso17025.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print("💾 JSON salvo localmente para próximas execuções")
+        with requests.get(JSON_URL, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            # Salvar localmente para próximas execuções (em blocos, sem carregar tudo)
+            with open(DEFAULT_JSON, "wb") as f:
+                for block in response.iter_content(chunk_size=1 << 16):
+                    f.write(block)
+        print("💾 JSON baixado e salvo localmente para próximas execuções")
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"Erro ao baixar JSON online: {e}")
 
-if data is None:
-    raise FileNotFoundError("Nenhum arquivo JSON da ISO 17025 encontrado!")
-
-# Verificar a estrutura do JSON e processar adequadamente
-if isinstance(data, list) and len(data) > 0:
-    first_item = data[0]
-    
-    if "titulo" in first_item and "texto" in first_item:
-        # Formato com título e texto separados
-        texts = [f"{item['titulo']}. {item['texto']}" for item in data if item.get('texto', '').strip()]
-        print(f"📄 Formato detectado: JSON estruturado com títulos")
-    elif "texto" in first_item:
-        # Formato apenas com texto
-        texts = [item['texto'] for item in data if item.get('texto', '').strip()]
-        print(f"📄 Formato detectado: JSON simples com textos")
+
+def iter_requirements(json_path: str):
+    """Itera os itens do array JSON sem materializar o arquivo inteiro (quando ijson está disponível)."""
+    with open(json_path, "rb") as f:
+        if ijson is not None:
+            yield from ijson.items(f, "item")
+        else:
+            yield from json.load(f)
+
+
+def requirement_text(item: dict) -> str | None:
+    """Texto indexado de um requisito: 'titulo. texto' ou apenas 'texto'."""
+    texto = (item.get("texto") or "").strip()
+    if not texto:
+        return None
+    if item.get("titulo"):
+        return f"{item['titulo']}. {item['texto']}"
+    return item["texto"]
+
+
+def requirement_metadata(item: dict, standard: str) -> dict:
+    """Metadados gravados no docstore: norma, número da seção e título."""
+    titulo = (item.get("titulo") or "").strip()
+    section = str(item.get("secao") or item.get("section") or leading_clause(titulo) or titulo or "Unknown")
+    return {
+        "standard": item.get("norma") or standard,
+        "section": section,
+        "title": titulo
+    }
+
+
+class Requirement(NamedTuple):
+    text: str
+    metadata: dict
+    text_hash: str  # chave do cache de embeddings
+
+
+def load_documents() -> dict[str, Requirement]:
+    """
+    Lê todos os arquivos do corpus. O id de cada documento é o hash de texto +
+    metadados: mudar só os metadados troca o documento no índice, mas o
+    embedding (chaveado pelo hash do texto) é reaproveitado do cache.
+    """
+    if any(path == DEFAULT_JSON for path, _ in CORPUS_FILES):
+        ensure_default_json()
+
+    documents = {}
+    duplicates = 0
+    for json_path, standard in CORPUS_FILES:
+        if not os.path.exists(json_path):
+            raise FileNotFoundError(f"Arquivo do corpus não encontrado: {json_path}")
+        print(f"🔍 Lendo {json_path} [{standard}] ({'streaming' if ijson else 'json.load'})")
+        count = 0
+        for item in iter_requirements(json_path):
+            if not isinstance(item, dict) or "texto" not in item:
+                raise ValueError(f"Formato JSON não reconhecido em {json_path}!")
+            text = requirement_text(item)
+            if text is None:
+                continue
+            metadata = requirement_metadata(item, standard)
+            key = text_hash(text + json.dumps(metadata, sort_keys=True, ensure_ascii=False))
+            if key in documents:
+                duplicates += 1  # requisitos idênticos viram um único documento
+            else:
+                documents[key] = Requirement(text, metadata, text_hash(text))
+            count += 1
+        print(f"📄 {json_path}: {count} requisitos")
+
+    if not documents:
+        raise ValueError("Arquivo JSON vazio ou formato inválido!")
+    if duplicates:
+        print(f"♻️  {duplicates} requisitos duplicados ignorados")
+    print(f"📄 Total de requisitos: {len(documents)}")
+    return documents
+
+
+# === 2. Modelo de embeddings (carregado apenas se houver texto novo) ===
+embedder = None
+
+
+def get_embedder(threads: int | None = None):
+    global embedder
+    if embedder is None:
+        # Força uso de CPU para evitar problemas de CUDA
+        import torch
+        torch.cuda.is_available = lambda : False
+        if threads:
+            torch.set_num_threads(threads)
+        from sentence_transformers import SentenceTransformer
+
+        # Usar modelo mais leve que funciona bem em CPU
+        embedder = SentenceTransformer(MODEL_NAME, device='cpu')
+    return embedder
+
+
+class LazyEmbeddings(Embeddings):
+    """Embeddings exigido pelo FAISS do LangChain, sem carregar o modelo até ser usado."""
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return get_embedder().encode(texts, convert_to_numpy=True).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def _init_worker(threads: int):
+    get_embedder(threads)
+
+
+def _encode_batch(start: int, texts: list[str]) -> tuple[int, np.ndarray]:
+    vectors = get_embedder().encode(texts, batch_size=len(texts), show_progress_bar=False, convert_to_numpy=True)
+    return start, vectors.astype(np.float32)
+
+
+# === 3. Geração paralela de embeddings em buffer pré-alocado ===
+def allocate_buffer(rows: int, dim: int) -> np.ndarray:
+    if rows < MEMMAP_THRESHOLD:
+        return np.empty((rows, dim), dtype=np.float32)
+    path = os.path.join(tempfile.mkdtemp(prefix="embeddings-"), "buffer.npy")
+    print(f"🗂️  Buffer de embeddings mapeado em memória: {path}")
+    return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(rows, dim))
+
+
+def release_buffer(buffer: np.ndarray | None):
+    """Apaga o diretório temporário do buffer mapeado em memória (no-op para buffer em RAM)."""
+    if isinstance(buffer, np.memmap) and buffer.filename:
+        shutil.rmtree(os.path.dirname(buffer.filename), ignore_errors=True)
+
+
+def encode_texts(texts: list[str]) -> np.ndarray:
+    """
+    Codifica os textos em lotes de EMBED_BATCH_SIZE usando EMBED_WORKERS
+    processos e escreve cada lote diretamente em sua posição do buffer.
+    """
+    batches = [(i, texts[i:i + EMBED_BATCH_SIZE]) for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+    workers = max(1, min(EMBED_WORKERS, len(batches))) if len(texts) >= PARALLEL_MIN_TEXTS else 1
+    start_time = time.time()
+    progress = tqdm(total=len(texts), desc="🔍 Gerando embeddings", unit="req")
+
+    buffer = None
+    try:
+        if workers == 1:
+            print("🔄 Carregando modelo de embeddings (CPU only)...")
+            _, first = _encode_batch(*batches[0])
+            buffer = allocate_buffer(len(texts), first.shape[1])
+            buffer[:len(first)] = first
+            progress.update(len(first))
+            for start, batch in batches[1:]:
+                _, vectors = _encode_batch(start, batch)
+                buffer[start:start + len(vectors)] = vectors
+                progress.update(len(vectors))
+        else:
+            # Cada processo usa uma fatia dos núcleos para não haver disputa de threads
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            print(f"🔄 Iniciando {workers} processos de embeddings ({threads} thread(s) cada)...")
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context,
+                                     initializer=_init_worker, initargs=(threads,)) as pool:
+                futures = [pool.submit(_encode_batch, start, batch) for start, batch in batches]
+                for future in as_completed(futures):
+                    start, vectors = future.result()
+                    if buffer is None:
+                        buffer = allocate_buffer(len(texts), vectors.shape[1])
+                    buffer[start:start + len(vectors)] = vectors
+                    progress.update(len(vectors))
+    except BaseException:
+        release_buffer(buffer)
+        raise
+    progress.close()
+    elapsed = time.time() - start_time
+    print(f"⚡ {len(texts)} embeddings em {elapsed:.1f}s ({len(texts) / max(elapsed, 1e-9):.1f} req/s)")
+    return buffer
+
+
+# === 4. Cache de embeddings (modelo, hash) ===
+def cache_path() -> str:
+    return embedding_cache_file(FAISS_PATH, MODEL_NAME)
+
+
+def write_embedding_cache(hashes: list[str], cached_vectors: np.ndarray | None, cached_rows: dict,
+                          new_vectors: np.ndarray | None, new_rows: dict) -> np.ndarray:
+    """
+    Regrava o cache só com os hashes vivos (textos removidos do corpus saem
+    do cache), bloco a bloco em um .npy mapeado em memória: nem o cache
+    antigo nem o novo são carregados inteiros na RAM. Os arquivos são
+    trocados no final; retorna os vetores do novo cache (mmap somente leitura).
+    """
+    os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+    path = cache_path()
+    dim = (cached_vectors if cached_vectors is not None else new_vectors).shape[1]
+    tmp_vectors, tmp_hashes = path + ".tmp.npy", embedding_cache_hashes_file(path) + ".tmp.npy"
+    out = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=np.float32, shape=(len(hashes), dim))
+    for start in range(0, len(hashes), INDEX_ADD_CHUNK):
+        chunk = hashes[start:start + INDEX_ADD_CHUNK]
+        block = np.empty((len(chunk), dim), dtype=np.float32)
+        for source, rows in ((cached_vectors, cached_rows), (new_vectors, new_rows)):
+            positions = [i for i, h in enumerate(chunk) if h in rows]
+            if positions:
+                block[positions] = source[[rows[chunk[i]] for i in positions]]
+        out[start:start + len(chunk)] = block
+    out.flush()
+    del out
+    np.save(tmp_hashes, np.array(hashes))
+    os.replace(tmp_vectors, path)
+    os.replace(tmp_hashes, embedding_cache_hashes_file(path))
+    legacy = path[:-len(".npy")] + ".npz"  # formato anterior, lido inteiro na RAM
+    if os.path.exists(legacy):
+        os.remove(legacy)
+    print(f"💾 Cache de embeddings atualizado: {len(hashes)} vetores")
+    return np.load(path, mmap_mode="r")
+
+
+# === 5. Construção/atualização do índice a partir do buffer ===
+def iter_chunks(ids: list[str], documents: dict, vectors: np.ndarray, rows: dict):
+    for i in range(0, len(ids), INDEX_ADD_CHUNK):
+        chunk = ids[i:i + INDEX_ADD_CHUNK]
+        chunk_vectors = vectors[[rows[documents[h].text_hash] for h in chunk]]
+        pairs = list(zip([documents[h].text for h in chunk], chunk_vectors))
+        yield chunk, pairs, [documents[h].metadata for h in chunk]
+
+
+def create_empty_store(documents: dict, vectors: np.ndarray, rows: dict, spec: str) -> FAISS:
+    """Cria o vector store com um índice vazio do tipo configurado, já treinado."""
+    ids = list(documents)
+    if len(ids) > TRAINING_SAMPLE:
+        ids = [ids[i] for i in np.random.default_rng(0).choice(len(ids), TRAINING_SAMPLE, replace=False)]
+    training = vectors[sorted({rows[documents[h].text_hash] for h in ids})]
+    start = time.time()
+    index = create_trained_index(spec, training, hnsw_ef_construction=HNSW_EF_CONSTRUCTION)
+    if spec != "Flat":
+        print(f"🎯 Índice {spec} treinado em {time.time() - start:.1f}s com {len(training)} vetores")
+    return FAISS(LazyEmbeddings(), index, InMemoryDocstore(), {})
+
+
+def write_compact(faiss_index: FAISS, documents: dict, vectors: np.ndarray, rows: dict, spec: str):
+    """
+    Formato compacto lido pela API (index_store.py): textos e metadados
+    indexados por offset e, no índice Flat, os vetores em um .npy mapeável.
+    Segue a ordem de posições do FAISS, após as remoções/inserções. É gravado
+    por último: a troca do diretório publica a nova versão para a API.
+    """
+    ids = [faiss_index.index_to_docstore_id[p] for p in range(faiss_index.index.ntotal)]
+    records = ((documents[h].text, documents[h].metadata) for h in ids)
+    blocks = None
+    if INDEX_TYPE == "flat":
+        blocks = (
+            vectors[[rows[documents[h].text_hash] for h in ids[i:i + INDEX_ADD_CHUNK]]]
+            for i in range(0, len(ids), INDEX_ADD_CHUNK)
+        )
+    write_compact_index(FAISS_PATH, ids, records, blocks, dim=vectors.shape[1],
+                        signature={"model": MODEL_NAME, "index_spec": spec})
+    print(f"🗜️  Formato compacto salvo em '{FAISS_PATH}' ({len(ids)} documentos)")
+
+
+def build_index(documents: dict, vectors: np.ndarray, rows: dict):
+    manifest_path = os.path.join(FAISS_PATH, MANIFEST_FILE)
+    spec = index_spec(INDEX_TYPE, len(documents), vectors.shape[1],
+                      nlist=IVF_NLIST, pq_m=PQ_M, pq_nbits=PQ_NBITS, hnsw_m=HNSW_M,
+                      n_train=min(len(documents), TRAINING_SAMPLE))
+    manifest = None
+    if not FULL_REBUILD and os.path.exists(manifest_path) and os.path.exists(os.path.join(FAISS_PATH, "index.faiss")):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("model") != MODEL_NAME:
+            print(f"⚠️  Índice gerado com {manifest.get('model')}; reconstruindo com {MODEL_NAME}")
+            manifest = None
+        elif manifest.get("index_type", "flat") != INDEX_TYPE:
+            print(f"⚠️  Índice do tipo {manifest.get('index_type', 'flat')}; reconstruindo como {INDEX_TYPE}")
+            manifest = None
+        else:
+            # Mantém os parâmetros (ex.: nlist) com que o índice existente foi treinado
+            spec = manifest.get("index_spec", spec)
+
+    faiss_index = None
+    if manifest is not None:
+        faiss_index = FAISS.load_local(FAISS_PATH, LazyEmbeddings(), allow_dangerous_deserialization=True)
+        indexed = set(manifest["ids"])
+        added = [h for h in documents if h not in indexed]
+        removed = [h for h in manifest["ids"] if h not in documents]
+        if removed and not supports_removal(faiss_index.index):
+            print(f"⚠️  {spec} não suporta remoção incremental de vetores; reconstruindo o índice")
+            faiss_index = manifest = None
+        else:
+            if removed:
+                faiss_index.delete(ids=removed)
+            print(f"🔁 Atualização incremental: +{len(added)} / -{len(removed)} requisitos")
+
+    if manifest is None:
+        print(f"🏗️  Construindo índice FAISS completo ({spec})...")
+        faiss_index = create_empty_store(documents, vectors, rows, spec)
+        added, removed = list(documents), []
+
+    for chunk_ids, pairs, metadatas in iter_chunks(added, documents, vectors, rows):
+        faiss_index.add_embeddings(pairs, metadatas=metadatas, ids=chunk_ids)
+
+    lexical_path = os.path.join(FAISS_PATH, LEXICAL_INDEX_FILE)
+    if added or removed or manifest is None or not os.path.exists(lexical_path):
+        # Índice invertido BM25 + tabela de seções, reconstruído por completo (custo linear)
+        LexicalIndex.build(
+            {h: doc.text for h, doc in documents.items()},
+            sections={h: doc.metadata["section"] for h, doc in documents.items()}
+        ).save(lexical_path)
+        print(f"🔤 Índice lexical (BM25) salvo em '{lexical_path}'")
+
+    changed = added or removed or manifest is None
+    if changed:
+        # index.faiss antes do formato compacto: a API (IVF/HNSW) lê os dois da mesma versão
+        faiss_index.save_local(FAISS_PATH)
+    if changed or not has_compact_index(FAISS_PATH):
+        write_compact(faiss_index, documents, vectors, rows, spec)
+
+    if changed:
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "model": MODEL_NAME,
+                "index_type": INDEX_TYPE,
+                "index_spec": spec,
+                "ids": list(documents)
+            }, f)
+        print(f"💾 Base vetorial salva em '{FAISS_PATH}' ({len(documents)} requisitos)")
     else:
-        raise ValueError("Formato JSON não reconhecido!")
-else:
-    raise ValueError("Arquivo JSON vazio ou formato inválido!")
-print(f"📄 Total de requisitos ISO 17025: {len(texts)}")
-
-# === 2. Carregar modelo local de embeddings ===
-print("🔄 Carregando modelo de embeddings (CPU only)...")
-# Força uso de CPU para evitar problemas de CUDA
-import torch
-torch.cuda.is_available = lambda : False
-
-# Usar modelo mais leve que funciona bem em CPU
-embedder = SentenceTransformer("all-MiniLM-L6-v2", device='cpu')
-print("Modelo carregado com sucesso (CPU)")
-
-
-# === 3. Gerar embeddings em lote ===
-embeddings = []
-batch_size = 16
-for i in tqdm(range(0, len(texts), batch_size), desc="🔍 Gerando embeddings"):
-    batch = texts[i:i+batch_size]
-    batch_emb = embedder.encode(batch, show_progress_bar=False, convert_to_numpy=True)
-    embeddings.extend(batch_emb)
-
-embeddings = np.array(embeddings)
-print(f"Embeddings gerados: {embeddings.shape}")
-
-# === 4. Criar índice FAISS para consultoria em qualidade laboratorial ===
-text_embeddings = list(zip(texts, embeddings))
-faiss_index = FAISS.from_embeddings(text_embeddings, embedder)
-faiss_index.save_local("iso17025_faiss_qwen")
-
-print("💾 Base vetorial salva em 'iso17025_faiss_qwen'")
-print("Sistema RAG para consultoria em qualidade laboratorial pronto!")
+        print(f"✅ Base vetorial '{FAISS_PATH}' já está atualizada")
+
+
+def main():
+    documents = load_documents()
+
+    cached_hashes, cached_vectors = load_embedding_cache(cache_path())
+    if cached_hashes:
+        print(f"🗃️  Cache de embeddings: {len(cached_hashes)} vetores de {MODEL_NAME}")
+    cached_rows = {h: i for i, h in enumerate(cached_hashes)}
+    texts_by_hash = {doc.text_hash: doc.text for doc in documents.values()}
+    missing = [h for h in texts_by_hash if h not in cached_rows]
+    print(f"📄 Textos a codificar: {len(missing)} (reaproveitados do cache: {len(texts_by_hash) - len(missing)})")
+
+    live = list(texts_by_hash)
+    vectors = cached_vectors
+    if missing or len(cached_hashes) != len(live):
+        new_vectors = encode_texts([texts_by_hash[h] for h in missing]) if missing else None
+        try:
+            vectors = write_embedding_cache(live, cached_vectors, cached_rows,
+                                            new_vectors, {h: i for i, h in enumerate(missing)})
+        finally:
+            # O buffer já foi copiado para o cache; o arquivo temporário não é mais necessário
+            release_buffer(new_vectors)
+        rows = {h: i for i, h in enumerate(live)}
+    else:
+        rows = cached_rows
+
+    build_index(documents, vectors, rows)
+    print("Sistema RAG para consultoria em qualidade laboratorial pronto!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+from concurrent.futures import Executor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def text_hash(text: str) -> str:
+    """Chave do cache de embeddings (create_vector_store.py) para um texto."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def embedding_cache_file(index_path: str, model_name: str) -> str:
+    """Vetores de referência (PyTorch) gravados pelo create_vector_store.py junto ao índice (.npy mapeável)."""
+    return os.path.join(index_path, "embedding_cache", f"{model_name.replace('/', '__')}.npy")
+
+
+def embedding_cache_hashes_file(cache_file: str) -> str:
+    """Hashes dos textos, na ordem das linhas do .npy de vetores."""
+    return cache_file[:-len(".npy")] + ".hashes.npy"
+
+
+def load_embedding_cache(cache_file: str) -> tuple[list[str], np.ndarray | None]:
+    """
+    Hashes e vetores do cache de embeddings. Os vetores ficam mapeados em
+    memória (somente leitura): só as linhas usadas são lidas do disco.
+    """
+    hashes_file = embedding_cache_hashes_file(cache_file)
+    if not os.path.exists(cache_file) or not os.path.exists(hashes_file):
+        return [], None
+    hashes = np.load(hashes_file).tolist()
+    vectors = np.load(cache_file, mmap_mode="r")
+    if len(hashes) != len(vectors):  # gravação interrompida: o cache é descartado
+        logger.warning("⚠️  Cache de embeddings inconsistente em '%s'; ignorado", cache_file)
+        return [], None
+    return hashes, vectors
+
+
+# === Wrapper para embeddings CPU (PyTorch / sentence-transformers) ===
+class CPUEmbeddings(Embeddings):
+    backend = "torch"
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=32):
+        # Import tardio: o backend ONNX não precisa carregar o torch
+        import torch
+        from sentence_transformers import SentenceTransformer
+        # Força uso de CPU para compatibilidade
+        torch.cuda.is_available = lambda : False
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device='cpu')
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Codifica uma lista de textos em um único forward pass (em lotes de batch_size)."""
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        ).astype(np.float32)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.encode([text])[0].tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.encode(texts).tolist()
+
+
+# === Backend ONNX Runtime (opcionalmente quantizado em int8) ===
+class OnnxEmbeddings(Embeddings):
+    """
+    Mesmo modelo do CPUEmbeddings executado no ONNX Runtime, sem torch:
+    tokenizer rápido (tokenizers) + grafo ONNX publicado no repositório do
+    modelo + mean pooling e normalização L2, como no sentence-transformers.
+    Com quantize=True o grafo é quantizado dinamicamente (pesos int8) uma
+    vez e salvo em onnx_dir.
+    """
+
+    max_seq_length = 256  # mesmo limite do all-MiniLM-L6-v2 no sentence-transformers
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=32, quantize=False,
+                 onnx_dir="onnx_models", threads=0):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.backend = "onnx-int8" if quantize else "onnx"
+        repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(repo_id, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        model_path = hf_hub_download(repo_id, "onnx/model.onnx")
+        if quantize:
+            model_path = self._quantized(model_path, onnx_dir, model_name)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logger.info("🔹 Embeddings ONNX (%s): %s", self.backend, model_path)
+
+    @staticmethod
+    def _quantized(model_path: str, onnx_dir: str, model_name: str) -> str:
+        quantized_path = os.path.join(onnx_dir, f"{model_name.replace('/', '__')}-int8.onnx")
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            os.makedirs(onnx_dir, exist_ok=True)
+            logger.info("🔧 Quantizando modelo ONNX em int8: %s", quantized_path)
+            quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.zeros_like(input_ids),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feed.items() if k in self.input_names})[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Codifica em lotes de batch_size; textos ordenados por tamanho para reduzir padding."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encoded = self._encode_batch([texts[i] for i in batch])
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            vectors[batch] = encoded
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.encode([text])[0].tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.encode(texts).tolist()
+
+
+def create_embeddings(backend: str = "torch", model_name: str = "all-MiniLM-L6-v2",
+                      batch_size: int = 32, onnx_dir: str = "onnx_models", threads: int = 0) -> Embeddings:
+    """Instancia o backend de embeddings configurado (torch, onnx ou onnx-int8)."""
+    if backend == "torch":
+        return CPUEmbeddings(model_name, batch_size)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddings(model_name, batch_size, quantize=backend == "onnx-int8",
+                              onnx_dir=onnx_dir, threads=threads)
+    raise ValueError(f"Backend de embeddings desconhecido: {backend} (opções: {', '.join(EMBEDDING_BACKENDS)})")
+
+
+def parity_report(vectors: np.ndarray, reference: np.ndarray) -> dict:
+    """Compara vetores de um backend com os de referência (PyTorch), linha a linha."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    reference = np.asarray(reference, dtype=np.float32)
+    cosines = (vectors * reference).sum(axis=1) / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+    )
+    return {
+        "samples": len(cosines),
+        "min_cosine": round(float(cosines.min()), 6) if len(cosines) else None,
+        "mean_cosine": round(float(cosines.mean()), 6) if len(cosines) else None,
+        "max_abs_diff": round(float(np.abs(vectors - reference).max()), 6) if len(cosines) else None
+    }
+
+
+def reference_sample(cache_file: str, texts: list[str], sample: int, seed: int = 0):
+    """Textos (amostrados) e seus vetores de referência no cache de embeddings do índice."""
+    hashes, vectors = load_embedding_cache(cache_file)
+    if vectors is None:
+        return [], np.empty((0, 0), dtype=np.float32)
+    rows = {h: i for i, h in enumerate(hashes)}
+    pairs = [(text, rows[text_hash(text)]) for text in texts if text_hash(text) in rows]
+    pairs = random.Random(seed).sample(pairs, min(sample, len(pairs)))
+    return [text for text, _ in pairs], np.asarray(vectors[[row for _, row in pairs]])
+
+
+# === Serviço de embeddings de consultas com micro-batching ===
+class QueryEmbeddingBatcher:
+    """
+    Agrupa perguntas que chegam concorrentemente em uma janela curta
+    (max_wait_ms ou max_batch_size, o que ocorrer primeiro), codifica todas
+    em um único forward pass no executor e resolve o future de cada chamador.
+    """
+
+    def __init__(self, embeddings: Embeddings, executor: Executor,
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embeddings = embeddings
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self.stats = {'batches': 0, 'texts': 0, 'max_batch_seen': 0}
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Retorna o embedding (float32) da pergunta, compartilhando o lote com outras requisições."""
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect_batch(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            # Ignora chamadores que já desistiram (ex.: cliente desconectou)
+            batch = [(text, fut) for text, fut in batch if not fut.done()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(self.executor, self.embeddings.encode, texts)
+            except Exception as e:
+                logger.error("❌ Erro ao gerar embeddings em lote: %s", e, exc_info=True)
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            self.stats['batches'] += 1
+            self.stats['texts'] += len(texts)
+            self.stats['max_batch_seen'] = max(self.stats['max_batch_seen'], len(texts))
+            for (_, fut), vector in zip(batch, vectors):
+                if not fut.done():
+                    fut.set_result(vector)
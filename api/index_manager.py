@@ -0,0 +1,327 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from ann_index import apply_search_params
+from index_store import COMPACT_DIR, CompactStore, PickleStore, has_compact_index
+from lexical_index import LEXICAL_INDEX_FILE, LexicalIndex
+from observability import run_in_executor
+
+logger = logging.getLogger(__name__)
+
+# Subconjuntos de filtro guardados por índice (LRU): cada combinação distinta
+# de filtros ocupa memória proporcional ao número de documentos permitidos
+MAX_FILTER_SUBSETS = 64
+
+
+def index_fingerprint(path: str) -> str:
+    """
+    Versão do índice FAISS pelo conteúdo, igual em todas as réplicas (chave
+    das entradas do cache compartilhado): o digest gravado no formato
+    compacto ou, em índices sem ele, o manifesto do create_vector_store.py
+    (modelo, tipo e ids). O tamanho do BM25 entra para um índice lexical
+    regravado sozinho também trocar a versão. Barato o bastante para o watcher.
+    """
+    digest = hashlib.sha1()
+    compact_manifest = os.path.join(path, COMPACT_DIR, "manifest.json")
+    builder_manifest = os.path.join(path, "manifest.json")
+    if os.path.exists(compact_manifest):
+        with open(compact_manifest, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        digest.update(manifest.get("digest", json.dumps(manifest, sort_keys=True)).encode("utf-8"))
+    elif os.path.exists(builder_manifest):
+        with open(builder_manifest, "rb") as f:
+            digest.update(f.read())
+    else:
+        # Índice sem manifesto algum: só nome e tamanho, que não dependem do host
+        for name in sorted(os.listdir(path)) if os.path.isdir(path) else []:
+            if os.path.isfile(os.path.join(path, name)):
+                digest.update(f"{name}:{os.path.getsize(os.path.join(path, name))};".encode())
+    lexical_path = os.path.join(path, LEXICAL_INDEX_FILE)
+    if os.path.exists(lexical_path):
+        digest.update(f"bm25:{os.path.getsize(lexical_path)}".encode())
+    return digest.hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """Filtro de metadados: prefixo da seção ("6.4" casa 6.4, 6.4.1, ...) e/ou nome da norma."""
+    section_prefix: str | None = None
+    standard: str | None = None
+
+    def matches_section(self, section: str) -> bool:
+        if not self.section_prefix:
+            return True
+        prefix = self.section_prefix.rstrip(".")
+        return section == prefix or section.startswith(prefix + ".")
+
+    def matches_standard(self, standard: str) -> bool:
+        return not self.standard or standard.casefold() == self.standard.casefold()
+
+    def matches(self, metadata: dict) -> bool:
+        return (self.matches_section(str(metadata.get("section", "")))
+                and self.matches_standard(str(metadata.get("standard", ""))))
+
+    def positions(self, columns: dict[str, tuple[np.ndarray, list[str]]]) -> np.ndarray:
+        """Posições aceitas, testando só os valores distintos de cada coluna de metadados."""
+        codes, _ = columns["section"]
+        mask = np.ones(len(codes), dtype=bool)
+        for name, test in (("section", self.matches_section), ("standard", self.matches_standard)):
+            codes, values = columns[name]
+            accepted = [code for code, value in enumerate(values) if test(value)]
+            if len(accepted) < len(values):
+                mask &= np.isin(codes, accepted)
+        return np.flatnonzero(mask)
+
+
+@dataclass
+class FilterSubset:
+    """Documentos permitidos por um filtro, nas três numerações usadas na busca."""
+    ids: set[str]
+    lexical_positions: set[int] | None
+    allowed: object  # forma preparada pelo store: SearchParameters do FAISS ou posições ordenadas
+
+
+@dataclass
+class LoadedIndex:
+    store: CompactStore | PickleStore
+    version: str
+    lexical: LexicalIndex | None = None
+    loaded_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    load_time_ms: float = 0.0
+    warmup_ms: float = 0.0
+    # colunas de seção/norma por posição, abertas só quando o primeiro filtro é usado
+    _columns: dict | None = field(default=None, repr=False)
+    _subsets: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _subsets_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def documents(self) -> int:
+        return self.store.ntotal
+
+    @property
+    def facets(self) -> dict:
+        """Normas e seções de primeiro nível disponíveis para filtro (exibidas no /health)."""
+        return self.store.facets
+
+    @property
+    def columns(self) -> dict[str, tuple[np.ndarray, list[str]]]:
+        with self._subsets_lock:
+            if self._columns is None:
+                self._columns = self.store.metadata_columns()
+            return self._columns
+
+    def cached_subset(self, search_filter: SearchFilter) -> FilterSubset | None:
+        with self._subsets_lock:
+            cached = self._subsets.get(search_filter)
+            if cached is not None:
+                self._subsets.move_to_end(search_filter)
+            return cached
+
+    def subset(self, search_filter: SearchFilter) -> FilterSubset:
+        """
+        Subconjunto permitido pelo filtro, guardado (LRU) por versão do índice.
+        Montá-lo percorre o corpus inteiro: no servidor, chame pelo executor.
+        """
+        cached = self.cached_subset(search_filter)
+        if cached is not None:
+            return cached
+        positions = search_filter.positions(self.columns)
+        ids = {self.store.doc_id(int(position)) for position in positions}
+        allowed = self.store.prepare_filter(positions)
+        lexical_positions = None
+        if self.lexical is not None:
+            lexical_positions = {self.lexical.positions[d] for d in ids if d in self.lexical.positions}
+        subset = FilterSubset(ids=ids, lexical_positions=lexical_positions, allowed=allowed)
+        with self._subsets_lock:
+            subset = self._subsets.setdefault(search_filter, subset)
+            self._subsets.move_to_end(search_filter)
+            while len(self._subsets) > MAX_FILTER_SUBSETS:
+                self._subsets.popitem(last=False)
+            return subset
+
+    def dense_search(self, query_vectors: np.ndarray, k: int,
+                     subset: FilterSubset | None = None) -> list[list[tuple[str, float]]]:
+        """
+        Busca vetorial direta para uma ou mais perguntas: [(id do documento, distância L2)] por pergunta.
+        Com subset, só os documentos permitidos pelo filtro são considerados.
+        """
+        queries = np.ascontiguousarray(np.atleast_2d(query_vectors), dtype=np.float32)
+        distances, positions = self.store.search(queries, k, subset.allowed if subset is not None else None)
+        return [
+            [(self.store.doc_id(int(p)), float(d)) for p, d in zip(row_positions, row_distances) if p != -1]
+            for row_positions, row_distances in zip(positions, distances)
+        ]
+
+    def documents_for(self, ids: list[str]) -> list[Document]:
+        return [self.store.document(self.store.position(doc_id)) for doc_id in ids]
+
+
+class _ManagerEmbeddings(Embeddings):
+    """Repassa ao modelo atual do IndexManager, que pode terminar de carregar depois do índice."""
+
+    def __init__(self, manager: "IndexManager"):
+        self.manager = manager
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.manager.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.manager.embeddings.embed_query(text)
+
+
+class IndexManager:
+    """
+    Mantém o índice FAISS ativo e permite trocá-lo sem reiniciar a API.
+
+    A nova versão é carregada e aquecida no executor, em segundo plano, e
+    então substitui a atual com uma única atribuição: requisições em
+    andamento continuam usando a referência que já obtiveram.
+    """
+
+    def __init__(self, path: str, embeddings: Embeddings | None, executor: Executor,
+                 warmup_query: str = "calibração de equipamentos", nprobe: int = 0, ef_search: int = 0):
+        self.path = path
+        # Parâmetros de busca aplicados a cada versão carregada (IVF: nprobe, HNSW: efSearch)
+        self.search_params = {"nprobe": nprobe, "ef_search": ef_search}
+        self.embeddings = embeddings
+        self.executor = executor
+        self.warmup_query = warmup_query
+        self.current: LoadedIndex | None = None
+        self.reloads = 0
+        self._listeners = []
+        self._lock = asyncio.Lock()
+        self._watcher: asyncio.Task | None = None
+
+    def on_swap(self, callback):
+        """Registra callback(LoadedIndex) chamado após cada troca de índice."""
+        self._listeners.append(callback)
+
+    def _open_store(self) -> CompactStore | PickleStore:
+        if has_compact_index(self.path):
+            return CompactStore(self.path)
+        # Índice gerado antes do formato compacto: docstore inteiro via pickle
+        from langchain_community.vectorstores import FAISS  # import pesado, adiado até a carga
+        logger.warning("⚠️  Índice sem formato compacto; carregando docstore via pickle "
+                       "(execute create_vector_store.py para gerar o formato compacto)")
+        return PickleStore(FAISS.load_local(self.path, _ManagerEmbeddings(self),
+                                            allow_dangerous_deserialization=True))
+
+    def read(self) -> LoadedIndex:
+        """
+        Lê o índice do disco sem aquecê-lo. Não usa o modelo de embeddings,
+        então pode rodar em paralelo com o carregamento do modelo.
+        """
+        start = time.time()
+        version = index_fingerprint(self.path)
+        store = self._open_store()
+        if store.index is not None:
+            applied = apply_search_params(store.index, **self.search_params)
+            if applied:
+                logger.info("🔧 Parâmetros de busca do índice: %s", applied)
+        lexical_path = os.path.join(self.path, LEXICAL_INDEX_FILE)
+        lexical = LexicalIndex.load(lexical_path) if os.path.exists(lexical_path) else None
+        loaded = LoadedIndex(store=store, version=version, lexical=lexical)
+        loaded.load_time_ms = round((time.time() - start) * 1000, 2)
+        return loaded
+
+    def warm_up(self, loaded: LoadedIndex):
+        """Primeira codificação e busca pagam page faults e inicializações preguiçosas; paga-as aqui."""
+        start = time.time()
+        loaded.dense_search(np.array(self.embeddings.embed_query(self.warmup_query)), k=1)
+        if loaded.lexical is not None:
+            loaded.lexical.search(self.warmup_query, k=1)
+        loaded.warmup_ms = round((time.time() - start) * 1000, 2)
+
+    def _load(self) -> LoadedIndex:
+        loaded = self.read()
+        self.warm_up(loaded)
+        return loaded
+
+    def activate(self, loaded: LoadedIndex):
+        """Aquece e publica o índice lido por read() (carga inicial)."""
+        self.warm_up(loaded)
+        self.current = loaded
+
+    def load(self) -> LoadedIndex:
+        """Carga síncrona completa (leitura + aquecimento)."""
+        self.current = self._load()
+        return self.current
+
+    async def reload(self, force: bool = False) -> dict:
+        async with self._lock:
+            previous = self.current
+            if not force and previous is not None and index_fingerprint(self.path) == previous.version:
+                return {"status": "unchanged", "index_version": previous.version}
+
+            loaded = await run_in_executor(self.executor, self._load)
+            self.current = loaded
+            self.reloads += 1
+            for callback in self._listeners:
+                callback(loaded)
+            logger.info("🔄 Índice FAISS trocado: %s -> %s (%d vetores, %.0fms)",
+                        previous.version if previous else '-', loaded.version, loaded.documents,
+                        loaded.load_time_ms)
+            return {
+                "status": "reloaded",
+                "previous_version": previous.version if previous else None,
+                "index_version": loaded.version,
+                "documents_indexed": loaded.documents,
+                "load_time_ms": loaded.load_time_ms
+            }
+
+    async def _watch(self, interval_s: float):
+        # Só recarrega quando a versão em disco fica estável por dois ciclos,
+        # evitando ler um índice que ainda está sendo escrito
+        candidate = None
+        while True:
+            await asyncio.sleep(interval_s)
+            try:
+                on_disk = index_fingerprint(self.path)
+                if on_disk == self.current.version:
+                    candidate = None
+                elif on_disk == candidate:
+                    await self.reload()
+                    candidate = None
+                else:
+                    candidate = on_disk
+            except Exception as e:
+                logger.error("❌ Erro ao verificar/recarregar índice FAISS: %s", e, exc_info=True)
+
+    def start_watcher(self, interval_s: float):
+        if interval_s > 0 and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(interval_s))
+
+    async def stop_watcher(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    def describe(self) -> dict:
+        return {
+            "index_version": self.current.version,
+            "index_loaded_at": self.current.loaded_at,
+            "index_load_ms": self.current.load_time_ms,
+            "index_warmup_ms": self.current.warmup_ms,
+            "documents_indexed": self.current.documents,
+            "index_type": self.current.store.index_type,
+            "lexical_index": self.current.lexical is not None,
+            "filters": self.current.facets,
+            "index_reloads": self.reloads
+        }
@@ -0,0 +1,310 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from collections import defaultdict
+from typing import Iterable, Iterator
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ann_index import filtered_search_params, index_type_name
+
+logger = logging.getLogger(__name__)
+
+# Formato compacto, gravado pelo create_vector_store.py em <índice>/compact:
+#   manifest.json         contagem, dimensão, facetas, versão do formato e digest do conteúdo
+#   texts.bin             [texto, metadados] em JSON UTF-8, concatenados por posição do FAISS
+#   offsets.npy           int64 (n + 1): início de cada registro em texts.bin
+#   ids.npy               S32 (n): id do documento em cada posição
+#   sorted_ids.npy        ids ordenados + sorted_positions.npy, para id -> posição por busca binária
+#   vectors.npy/norms.npy float32 (n, dim) e ‖x‖² por posição (só índice Flat)
+#   <coluna>_codes.npy    int32 (n): código da seção/norma por posição; os valores
+#                         distintos ficam em manifest["columns"] (filtros sem decodificar JSON)
+# Tudo é lido com mmap: vários workers no mesmo host compartilham as páginas
+# do page cache em vez de cada um desserializar (pickle) uma cópia privada.
+COMPACT_DIR = "compact"
+COMPACT_FORMAT_VERSION = 1
+# Linhas de vetores por bloco na busca exata (limita a matriz temporária de distâncias)
+SEARCH_BLOCK_ROWS = 65536
+# Metadados usados pelos filtros de busca, gravados como colunas de códigos
+METADATA_COLUMNS = ("section", "standard")
+
+
+def compact_path(index_path: str) -> str:
+    return os.path.join(index_path, COMPACT_DIR)
+
+
+def has_compact_index(index_path: str) -> bool:
+    return os.path.exists(os.path.join(compact_path(index_path), "manifest.json"))
+
+
+def count_facets(metadatas: Iterable[dict]) -> dict:
+    """Normas e seções de primeiro nível disponíveis para filtro, com a contagem de documentos."""
+    standards, sections = defaultdict(int), defaultdict(int)
+    for metadata in metadatas:
+        if metadata.get("standard"):
+            standards[metadata["standard"]] += 1
+        if metadata.get("section"):
+            sections[str(metadata["section"]).split(".")[0]] += 1
+    return {"standards": dict(standards), "sections": dict(sorted(sections.items()))}
+
+
+def encode_columns(records: Iterable[tuple[int, dict]], count: int) -> dict[str, tuple[np.ndarray, list[str]]]:
+    """Colunas de metadados por posição: {nome: (códigos int32, valores distintos)}."""
+    codes = {name: np.zeros(count, dtype=np.int32) for name in METADATA_COLUMNS}
+    vocab = {name: {} for name in METADATA_COLUMNS}
+    for position, metadata in records:
+        for name in METADATA_COLUMNS:
+            value = str(metadata.get(name, ""))
+            codes[name][position] = vocab[name].setdefault(value, len(vocab[name]))
+    return {name: (codes[name], list(vocab[name])) for name in METADATA_COLUMNS}
+
+
+def content_digest(ids: list[str], signature: dict | None = None) -> str:
+    """
+    Versão do índice pelo conteúdo: ids na ordem das posições (hash de texto e
+    metadados) e a assinatura do build (modelo, tipo de índice). Não depende de
+    host nem de mtime, então réplicas com o mesmo índice publicam a mesma versão.
+    """
+    digest = hashlib.sha1(json.dumps(signature or {}, sort_keys=True).encode("utf-8"))
+    for doc_id in ids:
+        digest.update(doc_id.encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+def write_compact_index(index_path: str, ids: list[str], records: Iterator[tuple[str, dict]],
+                        vectors: Iterator[np.ndarray] | None = None, dim: int = 0,
+                        signature: dict | None = None):
+    """
+    Grava o formato compacto em um diretório temporário e o troca pelo atual.
+    records: (texto, metadados) na ordem das posições do FAISS; vectors: blocos
+    de vetores na mesma ordem (só para índice Flat, buscado direto no mmap);
+    signature: o que mais define o conteúdo (modelo, tipo de índice), no digest.
+    """
+    target = compact_path(index_path)
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    offsets = np.empty(len(ids) + 1, dtype=np.int64)
+    offsets[0] = 0
+    metadatas = []
+    with open(os.path.join(staging, "texts.bin"), "wb") as f:
+        for i, (text, metadata) in enumerate(records):
+            payload = json.dumps([text, metadata], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            f.write(payload)
+            offsets[i + 1] = offsets[i] + len(payload)
+            metadatas.append(metadata)
+    np.save(os.path.join(staging, "offsets.npy"), offsets)
+
+    id_array = np.array(ids, dtype="S32")
+    order = np.argsort(id_array, kind="stable")
+    np.save(os.path.join(staging, "ids.npy"), id_array)
+    np.save(os.path.join(staging, "sorted_ids.npy"), id_array[order])
+    np.save(os.path.join(staging, "sorted_positions.npy"), order.astype(np.int64))
+
+    if vectors is not None:
+        matrix = np.lib.format.open_memmap(os.path.join(staging, "vectors.npy"), mode="w+",
+                                           dtype=np.float32, shape=(len(ids), dim))
+        norms = np.empty(len(ids), dtype=np.float32)
+        row = 0
+        for block in vectors:
+            matrix[row:row + len(block)] = block
+            norms[row:row + len(block)] = np.einsum("ij,ij->i", block, block)
+            row += len(block)
+        matrix.flush()
+        del matrix
+        np.save(os.path.join(staging, "norms.npy"), norms)
+
+    columns = encode_columns(enumerate(metadatas), len(ids))
+    for name, (codes, _) in columns.items():
+        np.save(os.path.join(staging, f"{name}_codes.npy"), codes)
+
+    with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "format_version": COMPACT_FORMAT_VERSION,
+            "count": len(ids),
+            "dim": dim,
+            "vectors": vectors is not None,
+            "facets": count_facets(metadatas),
+            "columns": {name: values for name, (_, values) in columns.items()},
+            "digest": content_digest(ids, signature)
+        }, f, ensure_ascii=False)
+
+    # Troca de diretórios: o watcher da API só recarrega depois de dois ciclos estáveis
+    previous = target + ".old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(target):
+        os.replace(target, previous)
+    os.replace(staging, target)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+class CompactStore:
+    """
+    Leitor do formato compacto. Nada é copiado para a memória do processo na
+    carga: textos, ids e vetores são decodificados sob demanda a partir do mmap.
+    Índice Flat: busca exata em blocos sobre vectors.npy. IVF/HNSW: index.faiss
+    lido com IO_FLAG_MMAP (as listas invertidas do IVF ficam mapeadas).
+    """
+
+    def __init__(self, index_path: str):
+        self.directory = directory = compact_path(index_path)
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest["format_version"] != COMPACT_FORMAT_VERSION:
+            raise ValueError(f"Formato compacto v{self.manifest['format_version']} não suportado")
+
+        def mapped(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        self.offsets = mapped("offsets.npy")
+        self.ids = mapped("ids.npy")
+        self.sorted_ids = mapped("sorted_ids.npy")
+        self.sorted_positions = mapped("sorted_positions.npy")
+        self.texts = np.memmap(os.path.join(directory, "texts.bin"), dtype=np.uint8, mode="r") \
+            if self.offsets[-1] > 0 else np.empty(0, dtype=np.uint8)
+        self.facets = self.manifest["facets"]
+
+        self.index = None
+        self.vectors = self.norms = None
+        if self.manifest["vectors"]:
+            self.vectors = mapped("vectors.npy")
+            self.norms = mapped("norms.npy")
+        else:
+            import faiss
+            self.index = faiss.read_index(os.path.join(index_path, "index.faiss"),
+                                          faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.manifest["count"])
+
+    @property
+    def index_type(self) -> str:
+        return "IndexFlatL2 (mmap)" if self.index is None else f"{index_type_name(self.index)} (mmap)"
+
+    def prepare_filter(self, positions: np.ndarray):
+        """Forma do subconjunto usada por search(): SearchParameters do FAISS ou as posições ordenadas."""
+        positions = np.sort(np.asarray(positions, dtype=np.int64))
+        if self.index is not None:
+            return filtered_search_params(self.index, positions)
+        return positions
+
+    def search(self, queries: np.ndarray, k: int, allowed=None) -> tuple[np.ndarray, np.ndarray]:
+        if self.index is not None:
+            if allowed is not None:
+                return self.index.search(queries, k, params=allowed[0])
+            return self.index.search(queries, k)
+        return self._exact_search(queries, k, allowed)
+
+    def _exact_search(self, queries: np.ndarray, k: int, allowed: np.ndarray | None):
+        """L2² = ‖x‖² − 2·x·q + ‖q‖², em blocos, mantendo o top-k parcial de cada pergunta."""
+        nq = len(queries)
+        query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        best_d = np.empty((nq, 0), dtype=np.float32)
+        best_i = np.empty((nq, 0), dtype=np.int64)
+        total = self.ntotal if allowed is None else len(allowed)
+        for start in range(0, total, SEARCH_BLOCK_ROWS):
+            if allowed is None:
+                positions = np.arange(start, min(start + SEARCH_BLOCK_ROWS, total), dtype=np.int64)
+                block, norms = self.vectors[start:start + len(positions)], self.norms[start:start + len(positions)]
+            else:
+                positions = allowed[start:start + SEARCH_BLOCK_ROWS]
+                block, norms = self.vectors[positions], self.norms[positions]
+            distances = norms[None, :] - 2 * (queries @ block.T) + query_norms
+            best_d = np.hstack([best_d, distances.astype(np.float32)])
+            best_i = np.hstack([best_i, np.broadcast_to(positions, distances.shape)])
+            if best_d.shape[1] > k:
+                keep = np.argpartition(best_d, k - 1, axis=1)[:, :k]
+                best_d = np.take_along_axis(best_d, keep, axis=1)
+                best_i = np.take_along_axis(best_i, keep, axis=1)
+        order = np.argsort(best_d, axis=1)
+        best_d = np.take_along_axis(best_d, order, axis=1)
+        best_i = np.take_along_axis(best_i, order, axis=1)
+        if best_d.shape[1] < k:  # mesmo contrato do FAISS: completa com -1
+            pad = k - best_d.shape[1]
+            best_d = np.hstack([best_d, np.full((nq, pad), np.inf, dtype=np.float32)])
+            best_i = np.hstack([best_i, np.full((nq, pad), -1, dtype=np.int64)])
+        return best_d, best_i
+
+    def metadata_columns(self) -> dict[str, tuple[np.ndarray, list[str]]]:
+        """Códigos de seção/norma mapeados do disco; índices gravados antes das colunas decodificam os registros."""
+        if "columns" not in self.manifest:
+            return encode_columns(((p, metadata) for p, _, metadata in self.records()), self.ntotal)
+        return {
+            name: (np.load(os.path.join(self.directory, f"{name}_codes.npy"), mmap_mode="r"), values)
+            for name, values in self.manifest["columns"].items()
+        }
+
+    def doc_id(self, position: int) -> str:
+        return self.ids[position].decode("ascii")
+
+    def position(self, doc_id: str) -> int | None:
+        key = doc_id.encode("ascii")
+        i = int(np.searchsorted(self.sorted_ids, key))
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == key:
+            return int(self.sorted_positions[i])
+        return None
+
+    def _record(self, position: int) -> tuple[str, dict]:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        text, metadata = json.loads(self.texts[start:end].tobytes().decode("utf-8"))
+        return text, metadata
+
+    def document(self, position: int) -> Document:
+        text, metadata = self._record(position)
+        return Document(page_content=text, metadata=metadata)
+
+    def records(self) -> Iterator[tuple[int, str, dict]]:
+        for position in range(self.ntotal):
+            yield position, self.doc_id(position), self._record(position)[1]
+
+
+class PickleStore:
+    """
+    Formato legado do LangChain (index.faiss + index.pkl desserializado com
+    pickle): usado apenas quando o índice ainda não tem o formato compacto.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.index = store.index
+        self._positions = None
+        self.facets = count_facets(metadata for _, _, metadata in self.records())
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def index_type(self) -> str:
+        return index_type_name(self.index)
+
+    def prepare_filter(self, positions: np.ndarray):
+        return filtered_search_params(self.index, np.sort(np.asarray(positions, dtype=np.int64)))
+
+    def search(self, queries: np.ndarray, k: int, allowed=None) -> tuple[np.ndarray, np.ndarray]:
+        if allowed is not None:
+            return self.index.search(queries, k, params=allowed[0])
+        return self.index.search(queries, k)
+
+    def metadata_columns(self) -> dict[str, tuple[np.ndarray, list[str]]]:
+        return encode_columns(((p, metadata) for p, _, metadata in self.records()), self.ntotal)
+
+    def doc_id(self, position: int) -> str:
+        return self.store.index_to_docstore_id[position]
+
+    def position(self, doc_id: str) -> int | None:
+        if self._positions is None:
+            self._positions = {d: p for p, d in self.store.index_to_docstore_id.items()}
+        return self._positions.get(doc_id)
+
+    def document(self, position: int) -> Document:
+        return self.store.docstore.search(self.doc_id(position))
+
+    def records(self) -> Iterator[tuple[int, str, dict]]:
+        for position, doc_id in self.store.index_to_docstore_id.items():
+            yield int(position), doc_id, self.store.docstore.search(doc_id).metadata or {}
@@ -0,0 +1,138 @@
+import heapq
+import json
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+LEXICAL_INDEX_FILE = "lexical_index.json"
+
+STOPWORDS = set("""
+a ao aos as com como da das de do dos e em entre na nas no nos o os ou para pela pelas pelo
+pelos por que se sem sob sobre um uma umas uns ser sao deve devem quais qual quando onde
+devo minha meu meus minhas este esta isso isto the of and
+""".split())
+
+# Números de seção como 6.2.5 ou 7.4 (não pega 17025 nem 2017)
+CLAUSE_PATTERN = re.compile(r"(?<![\d.])(\d{1,2}(?:\.\d{1,2}){1,3})(?![\d.]*\d)")
+LEADING_CLAUSE = re.compile(r"^\s*(\d{1,2}(?:\.\d{1,2}){1,3})\b")
+TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)+|\w+")
+
+
+def strip_accents(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list[str]:
+    """Tokens em minúsculas e sem acentos; números de seção (6.2.5) viram um único token."""
+    return [t for t in TOKEN_PATTERN.findall(strip_accents(text))
+            if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+def clause_numbers(question: str) -> list[str]:
+    return CLAUSE_PATTERN.findall(question)
+
+
+def leading_clause(text: str) -> str | None:
+    """Número da seção no início do texto indexado ('6.2.5 Título. Texto')."""
+    match = LEADING_CLAUSE.match(text)
+    return match.group(1) if match else None
+
+
+class LexicalIndex:
+    """
+    Índice invertido BM25 construído junto com o FAISS, mais uma tabela
+    número de seção -> documentos para resolver referências explícitas
+    ("item 6.2.5") em O(1). Documentos são identificados pelos mesmos ids
+    do docstore do FAISS (hash do texto).
+    """
+
+    def __init__(self, ids: list[str], doc_lengths: list[int], postings: dict,
+                 clauses: dict, k1: float = 1.5, b: float = 0.75):
+        self.ids = ids
+        self.doc_lengths = doc_lengths
+        self.postings = postings  # termo -> [[posição do documento, frequência], ...]
+        self.clauses = clauses
+        self.k1 = k1
+        self.b = b
+        self.positions = {doc_id: position for position, doc_id in enumerate(ids)}
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        n = len(ids)
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in postings.items()
+        }
+
+    @classmethod
+    def build(cls, documents: dict[str, str], sections: dict[str, str] | None = None) -> "LexicalIndex":
+        """documents: id -> texto; sections: id -> número da seção (senão, extraído do início do texto)."""
+        ids, lengths = [], []
+        postings = defaultdict(list)
+        clauses = defaultdict(list)
+        for position, (doc_id, text) in enumerate(documents.items()):
+            tokens = tokenize(text)
+            ids.append(doc_id)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append([position, tf])
+            clause = leading_clause((sections or {}).get(doc_id) or "") or leading_clause(text)
+            if clause:
+                clauses[clause].append(position)
+        return cls(ids, lengths, dict(postings), dict(clauses))
+
+    def search(self, query: str, k: int, allowed: set[int] | None = None) -> list[tuple[str, float]]:
+        """Top-k documentos por BM25: [(id, score)]. allowed restringe a busca a essas posições."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for position, tf in plist:
+                if allowed is not None and position not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / self.avg_length)
+                scores[position] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.ids[position], score) for position, score in best]
+
+    def lookup_clauses(self, question: str) -> list[str]:
+        """Ids dos documentos cujas seções são citadas explicitamente na pergunta."""
+        found = []
+        for clause in clause_numbers(question):
+            for position in self.clauses.get(clause, []):
+                doc_id = self.ids[position]
+                if doc_id not in found:
+                    found.append(doc_id)
+        return found
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings,
+                "clauses": self.clauses
+            }, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["ids"], data["doc_lengths"], data["postings"], data["clauses"])
+
+
+def reciprocal_rank_scores(rankings: list[list[str]], k: int = 60) -> dict[str, float]:
+    """Pontuação RRF de cada id: soma de 1/(k + posição) em cada lista."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1 / (k + rank + 1)
+    return scores
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[str]:
+    """Funde listas ordenadas de ids somando 1/(k + posição) de cada lista."""
+    scores = reciprocal_rank_scores(rankings, k)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+
+import prometheus_metrics as prom
+
+logger = logging.getLogger(__name__)
+
+
+class LLMGatewayError(Exception):
+    """Falha do gateway com o status HTTP a devolver ao cliente (e Retry-After, se houver)."""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMOverloaded(LLMGatewayError):
+    """Fila de espera cheia ou tempo de espera esgotado: a API descarta a carga excedente."""
+    status_code = 503
+
+
+class LLMRateLimited(LLMGatewayError):
+    """A OpenAI continuou respondendo 429 depois de todas as tentativas."""
+    status_code = 429
+
+
+class LLMTimeout(LLMGatewayError):
+    status_code = 504
+
+
+class TokenBucket:
+    """
+    Balde de fichas reabastecido continuamente a rate_per_minute. acquire()
+    espera até haver fichas suficientes; adjust() corrige a estimativa com o
+    consumo real (o saldo pode ficar negativo e atrasa as próximas chamadas).
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """Retira amount fichas, esperando o reabastecimento se preciso; retorna a espera em segundos."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:  # FIFO: quem chegou primeiro é atendido primeiro
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def adjust(self, delta: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+def estimate_tokens(params: dict) -> int:
+    """Estimativa conservadora de tokens da chamada (~4 caracteres por token + max_tokens)."""
+    prompt_chars = sum(len(message.get("content") or "") for message in params.get("messages", []))
+    return prompt_chars // 4 + int(params.get("max_tokens") or 0)
+
+
+def retry_after_seconds(error) -> float | None:
+    """Lê Retry-After (segundos) ou retry-after-ms da resposta de erro da OpenAI."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def retry_reason(error) -> str | None:
+    """Motivo para nova tentativa, ou None se o erro não é transitório."""
+    import openai  # já carregado pelo cliente; import local mantém o módulo leve
+
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, openai.InternalServerError):
+        return "server_error"
+    return None
+
+
+class LLMGateway:
+    """
+    Camada única para as chamadas ao LLM:
+      - no máximo max_concurrency chamadas simultâneas (semáforo);
+      - até max_queue chamadas esperando vaga por no máximo queue_timeout_s;
+        além disso a carga é descartada (LLMOverloaded -> 503 + Retry-After);
+      - ritmo limitado por requisições e tokens por minuto (token bucket);
+      - novas tentativas com backoff exponencial com jitter, respeitando o
+        Retry-After da OpenAI; 429 persistente vira LLMRateLimited (429).
+    """
+
+    def __init__(self, client, max_concurrency: int = 16, max_queue: int = 64, queue_timeout_s: float = 30.0,
+                 requests_per_minute: float = 0, tokens_per_minute: float = 0, max_retries: int = 3,
+                 backoff_base_s: float = 0.5, backoff_max_s: float = 20.0):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.active = 0
+        self.stats = {'calls': 0, 'retries': 0, 'shed': 0, 'rate_limited': 0, 'pacing_wait_s': 0.0}
+
+    def saturated(self) -> bool:
+        """Todas as vagas ocupadas e fila de espera cheia: novas chamadas seriam descartadas."""
+        return self._slots.locked() and self.waiting >= self.max_queue
+
+    def _shed(self, reason: str, message: str):
+        self.stats['shed'] += 1
+        prom.LLM_SHED.labels(reason=reason).inc()
+        raise LLMOverloaded(message, retry_after=max(1.0, self.queue_timeout_s / 2))
+
+    def _abandon(self, acquire: asyncio.Future):
+        """Desiste de esperar por uma vaga; se o acquire já tiver vencido, a vaga é devolvida."""
+        acquire.add_done_callback(
+            lambda task: task.cancelled() or task.exception() is not None or self._slots.release()
+        )
+        acquire.cancel()
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        """Admissão na fila, vaga no semáforo e ritmo do token bucket, nessa ordem."""
+        if self.saturated():
+            self._shed("queue_full", f"Fila de chamadas ao LLM cheia ({self.max_queue} aguardando)")
+        queued_at = time.monotonic()
+        if self._slots.locked():
+            self.waiting += 1
+            prom.LLM_QUEUE_DEPTH.set(self.waiting)
+            # Espera por uma tarefa própria em vez de asyncio.wait_for: até o Python
+            # 3.11, um acquire concluído junto com o timeout perdia a vaga para sempre
+            acquire = asyncio.ensure_future(self._slots.acquire())
+            try:
+                done, _ = await asyncio.wait({acquire}, timeout=self.queue_timeout_s)
+            except BaseException:
+                self._abandon(acquire)
+                raise
+            finally:
+                self.waiting -= 1
+                prom.LLM_QUEUE_DEPTH.set(self.waiting)
+            if not done:
+                self._abandon(acquire)
+                self._shed("queue_timeout", f"Sem vaga para chamar o LLM em {self.queue_timeout_s:.0f}s")
+        else:
+            await self._slots.acquire()  # vaga livre: retorna sem suspender
+        prom.LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - queued_at)
+
+        self.active += 1
+        prom.LLM_ACTIVE_CALLS.set(self.active)
+        try:
+            waited = 0.0
+            if self.request_bucket is not None:
+                waited += await self.request_bucket.acquire(1)
+            if self.token_bucket is not None:
+                waited += await self.token_bucket.acquire(estimated_tokens)
+            self.stats['pacing_wait_s'] = round(self.stats['pacing_wait_s'] + waited, 3)
+            yield
+        finally:
+            self.active -= 1
+            prom.LLM_ACTIVE_CALLS.set(self.active)
+            self._slots.release()
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        # Full jitter; o Retry-After do servidor é um piso
+        delay = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    async def _create(self, params: dict):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.stats['calls'] += 1
+                return await self.client.chat.completions.create(**params)
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None:
+                    raise
+                retry_after = retry_after_seconds(e)
+                if attempt == self.max_retries:
+                    if reason == "rate_limit":
+                        self.stats['rate_limited'] += 1
+                        raise LLMRateLimited("Limite de requisições da OpenAI atingido",
+                                             retry_after=retry_after or self.backoff_max_s) from e
+                    if reason == "timeout":
+                        raise LLMTimeout("Tempo limite da chamada ao LLM excedido") from e
+                    raise LLMOverloaded(f"LLM indisponível ({reason})", retry_after=self.backoff_max_s) from e
+                delay = self._backoff(attempt, retry_after)
+                self.stats['retries'] += 1
+                prom.LLM_RETRIES.labels(reason=reason).inc()
+                logger.warning("🔁 Chamada ao LLM falhou (%s); nova tentativa %d/%d em %.2fs",
+                               reason, attempt + 1, self.max_retries, delay)
+                # Com token bucket, a espera vale para todos: evita que os demais batam no 429 também
+                if reason == "rate_limit" and self.request_bucket is not None:
+                    self.request_bucket.adjust(1)
+                await asyncio.sleep(delay)
+
+    def _settle(self, estimated_tokens: int, usage):
+        """Corrige o balde de tokens com o consumo real informado pela OpenAI."""
+        if self.token_bucket is not None and usage is not None:
+            self.token_bucket.adjust((usage.total_tokens or 0) - estimated_tokens)
+
+    async def complete(self, **params):
+        """chat.completions.create sem streaming, passando pelo gateway."""
+        estimated = estimate_tokens(params)
+        async with self.slot(estimated):
+            response = await self._create(params)
+        self._settle(estimated, getattr(response, "usage", None))
+        return response
+
+    @asynccontextmanager
+    async def stream(self, **params):
+        """
+        chat.completions.create com stream=True: a vaga fica ocupada enquanto
+        o chamador consome os fragmentos. Só a abertura do stream é repetida
+        em caso de erro transitório (nenhum token foi enviado ainda). Ao sair
+        (inclusive se o cliente desconectar no meio) a resposta HTTP do
+        upstream é fechada, interrompendo a geração no provedor.
+        """
+        estimated = estimate_tokens(params)
+        async with self.slot(estimated):
+            stream = await self._create({**params, "stream": True})
+            usage = []
+            try:
+                try:
+                    yield stream, usage
+                finally:
+                    await stream.close()
+            finally:
+                self._settle(estimated, usage[-1] if usage else None)
+
+    def summary(self) -> dict:
+        return {
+            **self.stats,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue
+        }
@@ -1,88 +1,700 @@
+import time
+MODULE_START = time.perf_counter()  # mede o custo dos imports na inicialização
+
 import os
+import hmac
 import json
-import time
+import random
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager
 from datetime import datetime
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
-from langchain_community.vectorstores import FAISS
-from langchain.embeddings.base import Embeddings
 from langchain_core.documents import Document
-from openai import OpenAI
 import numpy as np
 
-# === Configurar logging detalhado ===
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - [%(levelname)s] - %(message)s',
-    handlers=[
-        logging.FileHandler('rag_system.log'),
-        logging.StreamHandler()
-    ]
+from embedding_service import (
+    QueryEmbeddingBatcher, create_embeddings, embedding_cache_file, parity_report, reference_sample
 )
-logger = logging.getLogger(__name__)
+from answer_cache import AnswerCache, normalize_question
+from canned_queries import CannedQueries, load_canned_queries
+from context_builder import ContextBuilder, ContextPack, TokenCounter
+from index_manager import FilterSubset, IndexManager, LoadedIndex, SearchFilter
+from llm_gateway import LLMGateway, LLMGatewayError
+from lexical_index import reciprocal_rank_fusion, reciprocal_rank_scores
+from metrics import MetricsStore
+from reranker import DEFAULT_RERANK_MODEL, CrossEncoderReranker
+from observability import (
+    TraceMiddleware, current_spans, run_in_executor, setup_logging, setup_tracing, shutdown_tracing, span
+)
+from shared_state import ReloadBroadcast, StatsPublisher, create_state_backend, worker_id
+from single_flight import SingleFlight
+import prometheus_metrics as prom
 
-# Dicionário para armazenar estatísticas de requisições
-query_stats = {
-    'total_queries': 0,
-    'total_response_time_ms': 0,
-    'min_response_time_ms': float('inf'),
-    'max_response_time_ms': 0,
-    'queries': []
-}
+# === Configurar logging: JSON com trace ID, gravado por uma thread em segundo plano ===
+load_dotenv()
+# Processos uvicorn (API_WORKERS) não podem rotacionar o mesmo arquivo: um
+# renomearia o arquivo que os outros ainda gravam. Com mais de um, só console
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+LOG_FILE = os.getenv("LOG_FILE", "rag_system.log") if API_WORKERS <= 1 else ""
+setup_logging(
+    LOG_FILE,
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    json_format=os.getenv("LOG_FORMAT", "json").lower() == "json",
+    max_bytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+    backup_count=int(os.getenv("LOG_BACKUP_COUNT", "5"))
+)
+logger = logging.getLogger(__name__)
+if API_WORKERS > 1 and os.getenv("LOG_FILE", "rag_system.log"):
+    logger.info("📝 API_WORKERS=%d: log apenas no console (LOG_FILE ignorado)", API_WORKERS)
+setup_tracing(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"), os.getenv("OTEL_SERVICE_NAME", "rag-api"))
 
 # === 1. Carregar variáveis de ambiente ===
-load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 print(f"🔹 OPENAI_API_KEY encontrada: {'sim' if api_key else 'não'}")
 if not api_key:
     raise ValueError("❌ Nenhuma chave OPENAI_API_KEY encontrada no arquivo .env")
 
 FAISS_PATH = "iso17025_faiss_qwen"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch, onnx ou onnx-int8
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "onnx_models")
+EMBEDDING_PARITY_SAMPLE = int(os.getenv("EMBEDDING_PARITY_SAMPLE", "64"))
+EMBEDDING_PARITY_MIN_COSINE = float(os.getenv("EMBEDDING_PARITY_MIN_COSINE", "0.99"))
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+METRICS_RECENT_QUERIES = int(os.getenv("METRICS_RECENT_QUERIES", "200"))
+K_DOCUMENTS = int(os.getenv("K_DOCUMENTS", "5"))
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "1500"))
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL)
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", str(K_DOCUMENTS)))
+RERANK_MIN_SCORE = float(os.getenv("RERANK_MIN_SCORE", "0.1"))
+RERANK_MAX_GAP = float(os.getenv("RERANK_MAX_GAP", "0.3"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+# Executor próprio do cross-encoder: um reranking que estoura o orçamento
+# continua rodando, mas só ocupa estas threads, nunca as da busca
+RERANK_WORKERS = int(os.getenv("RERANK_WORKERS", "1"))
+# Rerankings em execução (inclusive os já abandonados pelo orçamento); acima
+# disso a ordem da busca é usada direto, sem enfileirar mais trabalho
+RERANK_MAX_IN_FLIGHT = int(os.getenv("RERANK_MAX_IN_FLIGHT", str(2 * RERANK_WORKERS)))
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+SEARCH_MAX_K = int(os.getenv("SEARCH_MAX_K", "50"))
+SEARCH_MAX_DEPTH = int(os.getenv("SEARCH_MAX_DEPTH", "100"))  # offset + k máximo no /search
+CANNED_QUERIES_FILE = os.getenv("CANNED_QUERIES_FILE")
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "0"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "0"))
+INDEX_WATCH_INTERVAL_S = float(os.getenv("INDEX_WATCH_INTERVAL_S", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "200"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "30"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))  # 0 = sem limite
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))  # 0 = sem limite
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "0.5"))
+LLM_BACKOFF_MAX_S = float(os.getenv("LLM_BACKOFF_MAX_S", "20"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+STATE_BACKEND = os.getenv("STATE_BACKEND", "local")  # local, memory ou redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "rag")
+STATE_SYNC_INTERVAL_S = float(os.getenv("STATE_SYNC_INTERVAL_S", "2"))
+# Verificação do índice em disco ligada à força com vários workers sem backend compartilhado
+MULTI_WORKER_WATCH_INTERVAL_S = 5.0
+
+# Estatísticas de requisições com memória constante (agregados + consultas recentes)
+metrics_store = MetricsStore(recent_size=METRICS_RECENT_QUERIES)
+
+# Estado compartilhado entre workers/réplicas (cache de respostas e /stats).
+# O índice não passa por aqui: o formato compacto já é mapeado em memória e
+# compartilhado pelo page cache entre os workers do mesmo host.
+state_backend = create_state_backend(STATE_BACKEND, REDIS_URL)
+if state_backend is None and API_WORKERS > 1 and INDEX_WATCH_INTERVAL_S <= 0:
+    # Sem backend o /admin/reload-index só alcança o worker que recebeu a chamada:
+    # os demais passam a detectar sozinhos o índice reconstruído
+    INDEX_WATCH_INTERVAL_S = MULTI_WORKER_WATCH_INTERVAL_S
+    logger.warning("⚠️  API_WORKERS=%d sem backend compartilhado: verificando o índice em disco a cada %.0fs",
+                   API_WORKERS, INDEX_WATCH_INTERVAL_S)
+
+# === 2. Componentes pesados: carregados em paralelo na inicialização (ver warm_start) ===
+# Modelo de embeddings, cliente OpenAI e lote de consultas ficam prontos só
+# depois do aquecimento; até lá /ready responde 503 e /live responde 200.
+embeddings = None
+query_embedder: QueryEmbeddingBatcher | None = None
+client = None
+llm_gateway: LLMGateway | None = None
+context_builder: ContextBuilder | None = None
+reranker: CrossEncoderReranker | None = None
+embedding_parity = None
+startup_state = {"status": "starting", "error": None, "timings_ms": {}}
+startup_task: asyncio.Task | None = None
+
+# Executor limitado para a recuperação (encode + busca FAISS são síncronos e
+# consomem CPU; rodá-los no event loop bloquearia /health e as demais consultas)
+retrieval_executor = ThreadPoolExecutor(
+    max_workers=RETRIEVAL_WORKERS,
+    thread_name_prefix="retrieval"
+)
 
-# === 2. Definir wrapper para embeddings CPU ===
-class CPUEmbeddings(Embeddings):
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
-        # Força uso de CPU para compatibilidade
-        import torch
-        torch.cuda.is_available = lambda : False
-        self.model = SentenceTransformer(model_name, device='cpu')
+rerank_executor = ThreadPoolExecutor(
+    max_workers=RERANK_WORKERS,
+    thread_name_prefix="rerank"
+)
+rerank_in_flight = 0
+
+index_manager = IndexManager(
+    FAISS_PATH, None, retrieval_executor, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH
+)
+
+# Cache de respostas (exato + semântico), invalidado quando o índice muda
+answer_cache = AnswerCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL_S,
+    similarity_threshold=ANSWER_CACHE_SIMILARITY,
+    shared=state_backend,
+    key_prefix=STATE_KEY_PREFIX
+)
+index_manager.on_swap(lambda loaded: answer_cache.invalidate(loaded.version))
+
+# Perguntas de exemplo e consultas configuradas: embedding e top-k pré-calculados
+canned_queries = CannedQueries(load_canned_queries(CANNED_QUERIES_FILE), depth=SEARCH_MAX_DEPTH)
+
+# Perguntas idênticas em andamento compartilham uma única execução do pipeline
+single_flight = SingleFlight()
+
+def worker_counters() -> dict:
+    return {
+        "answer_cache": dict(answer_cache.stats),
+        "coalescing": dict(single_flight.stats),
+        "llm_gateway": dict(llm_gateway.stats) if llm_gateway else {}
+    }
+
+def worker_snapshot() -> dict:
+    return {"metrics": metrics_store.to_dict(), **worker_counters()}
+
+stats_publisher = StatsPublisher(
+    state_backend, STATE_KEY_PREFIX, worker_snapshot, interval_s=STATE_SYNC_INTERVAL_S
+) if state_backend is not None else None
 
-    def embed_query(self, text: str) -> list[float]:
-        return self.model.encode(text, convert_to_numpy=True).tolist()
+# /admin/reload-index propagado aos demais workers pelo backend compartilhado
+reload_broadcast = ReloadBroadcast(
+    state_backend, STATE_KEY_PREFIX, lambda force: index_manager.reload(force=force),
+    interval_s=STATE_SYNC_INTERVAL_S
+) if state_backend is not None else None
 
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        return [self.model.encode(t, convert_to_numpy=True).tolist() for t in texts]
+def load_embeddings():
+    logger.info("🔹 Carregando modelo de embeddings (CPU, backend %s)...", EMBEDDING_BACKEND)
+    return create_embeddings(EMBEDDING_BACKEND, EMBEDDING_MODEL, onnx_dir=EMBEDDING_ONNX_DIR)
 
-# === 3. Inicializar embeddings e FAISS ===
-print("🔹 Carregando modelo de embeddings (CPU)...")
-embeddings = CPUEmbeddings()
+def load_llm_client():
+    from openai import AsyncOpenAI  # import adiado: ocorre em paralelo com modelo e índice
+    # Novas tentativas ficam a cargo do LLMGateway (backoff com jitter e Retry-After)
+    return AsyncOpenAI(api_key=api_key, timeout=LLM_TIMEOUT_S, max_retries=0)
 
-print("🔹 Carregando índice FAISS...")
-faiss_index = FAISS.load_local(FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
+def load_context_builder():
+    return ContextBuilder(TokenCounter(), max_tokens=CONTEXT_MAX_TOKENS)
 
-# === 4. Inicializar cliente da API OpenAI ===
-print("🔹 Inicializando cliente OpenAI (responses API)...")
-client = OpenAI(api_key=api_key)
+def load_reranker():
+    if not RERANK_ENABLED:
+        return None
+    logger.info("🔹 Carregando cross-encoder para reranking (%s)...", RERANK_MODEL)
+    model = CrossEncoderReranker(RERANK_MODEL)
+    model.score("aquecimento", ["aquecimento"])  # primeira inferência fora do caminho da requisição
+    return model
+
+def check_embedding_parity() -> dict | None:
+    """
+    Com backend diferente do PyTorch, compara os vetores de uma amostra do
+    corpus com os vetores de referência gravados pelo create_vector_store.py:
+    o índice só é reaproveitado se a similaridade de cosseno mínima atingir
+    EMBEDDING_PARITY_MIN_COSINE.
+    """
+    reference_file = embedding_cache_file(FAISS_PATH, EMBEDDING_MODEL)
+    if EMBEDDING_BACKEND == "torch" or EMBEDDING_PARITY_SAMPLE <= 0:
+        return None
+    if not os.path.exists(reference_file):
+        logger.warning("⚠️  Sem vetores de referência em '%s'; verificação de paridade ignorada", reference_file)
+        return None
+    store = index_manager.current.store
+    positions = random.Random(0).sample(range(store.ntotal), min(EMBEDDING_PARITY_SAMPLE, store.ntotal))
+    texts = [store.document(position).page_content for position in positions]
+    sample_texts, reference = reference_sample(reference_file, texts, EMBEDDING_PARITY_SAMPLE)
+    report = parity_report(embeddings.encode(sample_texts), reference)
+    logger.info("🔍 Paridade %s x torch: %s", EMBEDDING_BACKEND, report)
+    if report["samples"] and report["min_cosine"] < EMBEDDING_PARITY_MIN_COSINE:
+        raise RuntimeError(
+            f"❌ Embeddings {EMBEDDING_BACKEND} divergem do índice (cosseno mínimo {report['min_cosine']} < "
+            f"{EMBEDDING_PARITY_MIN_COSINE}); use EMBEDDING_BACKEND=torch ou reconstrua o índice"
+        )
+    return report
 
-# === 5. Configurar FastAPI ===
+async def warm_start():
+    """
+    Inicialização em segundo plano, com o servidor já respondendo /live:
+    modelo de embeddings, índice FAISS/BM25 e cliente OpenAI carregam em
+    paralelo no executor; depois o índice é aquecido com uma codificação e
+    uma busca reais, e só então a API passa a "ready".
+    """
+    global embeddings, query_embedder, client, llm_gateway, context_builder, reranker, embedding_parity
+    timings = startup_state["timings_ms"]
+    timings["imports"] = round((time.perf_counter() - MODULE_START) * 1000, 2)
+    loop = asyncio.get_running_loop()
+
+    def timed(phase: str, fn):
+        def run():
+            phase_start = time.perf_counter()
+            result = fn()
+            timings[phase] = round((time.perf_counter() - phase_start) * 1000, 2)
+            return result
+        return loop.run_in_executor(retrieval_executor, run)
+
+    try:
+        embeddings, loaded, client, context_builder, reranker = await asyncio.gather(
+            timed("model_load", load_embeddings),
+            timed("index_load", index_manager.read),
+            timed("llm_client", load_llm_client),
+            timed("tokenizer", load_context_builder),
+            timed("reranker_load", load_reranker)
+        )
+        index_manager.embeddings = embeddings
+        await timed("warmup", lambda: index_manager.activate(loaded))
+        embedding_parity = await timed("parity_check", check_embedding_parity)
+        answer_cache.index_version = loaded.version
+        llm_gateway = LLMGateway(
+            client,
+            max_concurrency=LLM_MAX_CONCURRENCY,
+            max_queue=LLM_MAX_QUEUE,
+            queue_timeout_s=LLM_QUEUE_TIMEOUT_S,
+            requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+            max_retries=LLM_MAX_RETRIES,
+            backoff_base_s=LLM_BACKOFF_BASE_S,
+            backoff_max_s=LLM_BACKOFF_MAX_S
+        )
+
+        # Perguntas concorrentes são codificadas juntas em um único forward pass
+        query_embedder = QueryEmbeddingBatcher(
+            embeddings,
+            retrieval_executor,
+            max_batch_size=EMBED_MAX_BATCH_SIZE,
+            max_wait_ms=EMBED_MAX_WAIT_MS
+        )
+        await query_embedder.start()
+        await timed("canned_queries", lambda: canned_queries.encode(embeddings))
+        canned_start = time.perf_counter()
+        await precompute_canned_rankings()
+        timings["canned_rankings"] = round((time.perf_counter() - canned_start) * 1000, 2)
+        index_manager.start_watcher(INDEX_WATCH_INTERVAL_S)
+        if reload_broadcast is not None:
+            reload_broadcast.start()
+    except Exception as e:
+        startup_state.update(status="failed", error=str(e))
+        logger.error("❌ Falha na inicialização da API: %s", e, exc_info=True)
+        return
+
+    timings["total"] = round((time.perf_counter() - MODULE_START) * 1000, 2)
+    for phase, elapsed_ms in timings.items():
+        prom.STARTUP_SECONDS.labels(phase=phase).set(elapsed_ms / 1000)
+    startup_state["status"] = "ready"
+    logger.info("✅ API pronta em %.0fms (índice %s, %d vetores) - fases: %s",
+                timings['total'], loaded.version, loaded.documents, timings)
+
+def ensure_ready():
+    """Consultas só são aceitas depois do aquecimento (503 + Retry-After até lá)."""
+    if startup_state["status"] != "ready":
+        raise HTTPException(
+            status_code=503,
+            detail=f"API em inicialização ({startup_state['status']})",
+            headers={"Retry-After": "5"}
+        )
+
+def retry_after_headers(error: LLMGatewayError) -> dict | None:
+    if error.retry_after is None:
+        return None
+    return {"Retry-After": str(max(1, round(error.retry_after)))}
+
+async def start_background_services():
+    # Não bloqueia: o servidor passa a responder /live enquanto modelo e índice carregam
+    global startup_task
+    startup_task = asyncio.create_task(warm_start())
+    if stats_publisher is not None:
+        stats_publisher.start()
+
+async def shutdown_executors():
+    if startup_task is not None and not startup_task.done():
+        startup_task.cancel()
+    await index_manager.stop_watcher()
+    if query_embedder is not None:
+        await query_embedder.stop()
+    retrieval_executor.shutdown(wait=False)
+    rerank_executor.shutdown(wait=False)
+    if client is not None:
+        await client.close()
+    if stats_publisher is not None:
+        await stats_publisher.stop()
+    if reload_broadcast is not None:
+        await reload_broadcast.stop()
+    if state_backend is not None:
+        state_backend.close()
+    shutdown_tracing()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_background_services()
+    try:
+        yield
+    finally:
+        await shutdown_executors()
+
+# === 3. Configurar FastAPI ===
 app = FastAPI(
     title="Assistente RAG para Consultoria em Qualidade Laboratorial",
     description="Sistema RAG aplicado à norma ISO/IEC 17025:2017 para consultoria técnica",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-class QueryRequest(BaseModel):
+# Um trace ID por requisição (X-Request-ID do cliente, se enviado), devolvido em X-Trace-Id
+app.add_middleware(TraceMiddleware)
+
+class QueryFilters(BaseModel):
+    section_prefix: str | None = None  # ex.: "6.4" restringe a 6.4, 6.4.1, 6.4.2...
+    standard: str | None = None  # ex.: "ISO/IEC 17025:2017"
+
+    def to_search_filter(self) -> SearchFilter | None:
+        section_prefix = (self.section_prefix or "").strip() or None
+        standard = (self.standard or "").strip() or None
+        if section_prefix is None and standard is None:
+            return None
+        return SearchFilter(section_prefix=section_prefix, standard=standard)
+
+class FilteredRequest(BaseModel):
+    filters: QueryFilters | None = None
+
+    def search_filter(self) -> SearchFilter | None:
+        return self.filters.to_search_filter() if self.filters else None
+
+class QueryRequest(FilteredRequest):
     question: str
 
+class BatchQueryRequest(FilteredRequest):
+    questions: list[str]
+    stream: bool = False  # NDJSON com cada item assim que termina
+
+class SearchRequest(FilteredRequest):
+    query: str
+    k: int = 10
+    offset: int = 0
+
+async def embed_question(question: str) -> np.ndarray:
+    vector = canned_queries.vector(question)
+    if vector is not None:
+        prom.CANNED_QUERY_HITS.labels(kind="embedding").inc()
+        return vector
+    with span("embed"), prom.EMBEDDING_SECONDS.time():
+        return await query_embedder.embed(question)
+
+def cited_clause_ids(question: str) -> list[str]:
+    """Documentos das seções citadas explicitamente na pergunta (ex.: "6.2.5"), em O(1)."""
+    lexical = index_manager.current.lexical
+    if not HYBRID_SEARCH or lexical is None:
+        return []
+    return lexical.lookup_clauses(question)
+
+def pinned_clause_ids(question: str, subset: FilterSubset | None) -> list[str]:
+    """Seções citadas na pergunta, restritas ao filtro; entram no topo do ranking."""
+    pinned = cited_clause_ids(question)
+    if subset is not None:
+        pinned = [doc_id for doc_id in pinned if doc_id in subset.ids]
+    if pinned:
+        prom.CLAUSE_LOOKUPS.inc()
+    return pinned
+
+def fuse_rankings(pinned: list[str], rankings: list[list[str]], k: int) -> list[str]:
+    """Seções citadas primeiro, depois a reciprocal rank fusion das buscas densa e lexical."""
+    return (pinned + [doc_id for doc_id in reciprocal_rank_fusion(rankings, RRF_K) if doc_id not in pinned])[:k]
+
+async def filter_subset(active: LoadedIndex, search_filter: SearchFilter | None) -> FilterSubset | None:
+    """Subconjunto do filtro; só a primeira montagem por índice vai ao executor (varre o corpus)."""
+    if search_filter is None:
+        return None
+    cached = active.cached_subset(search_filter)
+    if cached is not None:
+        return cached
+    return await run_in_executor(retrieval_executor, active.subset, search_filter)
+
+async def rank_documents(question: str, query_vector: np.ndarray | None,
+                         k: int = K_DOCUMENTS,
+                         search_filter: SearchFilter | None = None) -> tuple[LoadedIndex, list[tuple[str, dict]]]:
+    """
+    Recuperação híbrida fora do event loop: seções citadas na pergunta vêm
+    primeiro; busca densa (FAISS) e lexical (BM25) rodam em paralelo no
+    executor e são fundidas por reciprocal rank fusion. Sem embedding
+    (pergunta resolvida pela tabela de seções), apenas o BM25 completa o top-k.
+    Com filtro de metadados, as três etapas ficam restritas ao subconjunto de
+    ids permitido (pré-filtro), então o top-k nunca sai incompleto.
+    Retorna (índice usado, [(id, pontuações)]): RRF, distância L2 e BM25.
+    """
+    # Referência fixada aqui: uma troca de índice não afeta esta requisição
+    active = index_manager.current
+    subset = await filter_subset(active, search_filter)
+    if subset is not None and not subset.ids:
+        return active, []
+    pinned = pinned_clause_ids(question, subset)
+    use_lexical = HYBRID_SEARCH and active.lexical is not None
+    candidates = max(k, HYBRID_CANDIDATES) if use_lexical else k
+
+    def dense():
+        with prom.SEARCH_SECONDS.time():
+            return active.dense_search(query_vector, candidates, subset)[0]
+
+    def lexical():
+        with prom.LEXICAL_SEARCH_SECONDS.time():
+            allowed = subset.lexical_positions if subset is not None else None
+            return active.lexical.search(question, candidates, allowed)
+
+    searches = {}
+    if query_vector is not None:
+        searches["distance"] = run_in_executor(retrieval_executor, dense)
+    if use_lexical:
+        searches["bm25"] = run_in_executor(retrieval_executor, lexical)
+    with span("search"):
+        hits = dict(zip(searches, await asyncio.gather(*searches.values())))
+    rankings = [[doc_id for doc_id, _ in row] for row in hits.values()]
+    fused = reciprocal_rank_scores(rankings, RRF_K)
+    scores = {name: dict(row) for name, row in hits.items()}
+    return active, [
+        (doc_id, {
+            "score": round(fused.get(doc_id, 0.0), 6),
+            "pinned": doc_id in pinned,
+            **{name: round(values[doc_id], 4) if doc_id in values else None for name, values in scores.items()}
+        })
+        for doc_id in fuse_rankings(pinned, rankings, k)
+    ]
+
+async def retrieve_documents(question: str, query_vector: np.ndarray | None,
+                             k: int = K_DOCUMENTS,
+                             search_filter: SearchFilter | None = None) -> tuple[LoadedIndex, list[Document]]:
+    """(índice usado, documentos do ranking híbrido na ordem); ver rank_documents."""
+    active, ranked = await rank_documents(question, query_vector, k, search_filter)
+    with span("search"):
+        return active, active.documents_for([doc_id for doc_id, _ in ranked])
+
+async def precompute_canned_rankings():
+    """Top-k de cada pergunta da tabela pré-calculada no índice atual (na inicialização)."""
+    for question in canned_queries.questions.values():
+        vector = None if cited_clause_ids(question) else canned_queries.vector(question)
+        active, ranked = await rank_documents(question, vector, canned_queries.depth)
+        canned_queries.store_ranking(question, active.version, ranked)
+
+def rerank_finished(_):
+    global rerank_in_flight
+    rerank_in_flight -= 1
+
+async def rerank_documents(question: str, docs: list[Document]) -> tuple[list[Document], dict]:
+    """
+    Com RERANK_ENABLED, reordena os RERANK_CANDIDATES recuperados com o
+    cross-encoder e mantém só os mais relevantes. Perguntas que citam seções
+    não passam pelo reranking (os trechos citados já vêm fixados no topo).
+    Se o reranking estourar RERANK_BUDGET_MS, segue com a ordem da busca; com
+    RERANK_MAX_IN_FLIGHT rerankings ainda em execução, nem chega a tentar.
+    """
+    global rerank_in_flight
+    if reranker is None or not docs or cited_clause_ids(question):
+        return docs[:K_DOCUMENTS], {}
+    if rerank_in_flight >= RERANK_MAX_IN_FLIGHT:
+        prom.RERANK_FALLBACKS.labels(reason="saturated").inc()
+        return docs[:K_DOCUMENTS], {"rerank": "saturated"}
+    rerank_start = time.time()
+    rerank_in_flight += 1
+    job = run_in_executor(
+        rerank_executor,
+        lambda: reranker.rerank(question, docs, RERANK_TOP_N, RERANK_MIN_SCORE, RERANK_MAX_GAP)
+    )
+    job.add_done_callback(rerank_finished)
+    try:
+        with span("rerank"), prom.RERANK_SECONDS.time():
+            # shield: o job segue no executor após o timeout e só libera a vaga ao terminar
+            result = await asyncio.wait_for(asyncio.shield(job), RERANK_BUDGET_MS / 1000)
+    except asyncio.TimeoutError:
+        prom.RERANK_FALLBACKS.labels(reason="budget").inc()
+        logger.warning("⚠️  Reranking excedeu %.0fms; usando a ordem da busca", RERANK_BUDGET_MS)
+        return docs[:K_DOCUMENTS], {"rerank_time_ms": round((time.time() - rerank_start) * 1000, 2),
+                                    "rerank": "budget_exceeded"}
+    return result.documents, {
+        "rerank_time_ms": round((time.time() - rerank_start) * 1000, 2),
+        "rerank_candidates": result.candidates,
+        "rerank_scores": result.scores
+    }
+
+def retrieval_depth() -> int:
+    """Candidatos buscados por pergunta: mais amplo quando o reranking escolhe os melhores."""
+    return max(RERANK_CANDIDATES, K_DOCUMENTS) if reranker is not None else K_DOCUMENTS
+
+async def check_answer_cache(question: str, semantic: bool = True, lookup: bool = True):
+    """
+    Consulta o cache exato e, em caso de falta, gera o embedding da pergunta
+    e consulta o cache semântico. Retorna (resposta em cache ou None, nível,
+    similaridade, embedding da pergunta) — o embedding é reaproveitado na busca.
+    Com semantic=False (pergunta cita seções explicitamente) nenhum embedding
+    é gerado: "6.2.5" e "6.2.6" têm embeddings quase idênticos e o cache
+    semântico trocaria uma resposta pela outra. Com lookup=False (consulta
+    com filtro, cuja resposta depende do filtro) o cache não é consultado.
+    """
+    if not lookup:
+        return None, "bypass", 0.0, await embed_question(question) if semantic else None
+
+    if ANSWER_CACHE_ENABLED:
+        answer_cache.ensure_index_version(index_manager.current.version)
+        cached = await answer_cache.get_exact(question)
+        if cached is not None:
+            prom.CACHE_LOOKUPS.labels(result="exact").inc()
+            return cached, "exact", 1.0, None
+
+    if not semantic:
+        if ANSWER_CACHE_ENABLED:
+            answer_cache.record_miss()
+            prom.CACHE_LOOKUPS.labels(result="miss").inc()
+        return None, "miss", 0.0, None
+
+    query_vector = await embed_question(question)
+    if ANSWER_CACHE_ENABLED:
+        cached, similarity = answer_cache.get_semantic(query_vector)
+        prom.CACHE_LOOKUPS.labels(result="semantic" if cached is not None else "miss").inc()
+        if cached is not None:
+            return cached, "semantic", similarity, query_vector
+    return None, "miss", 0.0, query_vector
+
+SYSTEM_INFO = {
+    "scenario": "Consultoria em Qualidade Laboratorial",
+    "standard": "ISO/IEC 17025:2017",
+    "method": "RAG (Retrieval-Augmented Generation)"
+}
+
+GENERATION_PARAMS = {
+    "model": "gpt-4o-mini",
+    "temperature": 0.2,
+    "max_tokens": 800
+}
+
+# Instruções fixas na mensagem de sistema: o prefixo do prompt é idêntico em
+# todas as chamadas e pode ser reaproveitado pelo cache de prompt da OpenAI
+SYSTEM_PROMPT = """Você é um consultor técnico especializado em qualidade laboratorial que utiliza a norma ISO/IEC 17025:2017.
+Responda à consulta usando APENAS as informações do contexto fornecido dos requisitos da norma.
+
+Instruções:
+- Seja preciso e técnico
+- Cite os números das seções quando relevante (ex: "conforme item 6.2.5", "seção 7.4.1")
+- Mantenha o foco na aplicação prática para laboratórios
+- Se a informação não estiver no contexto, indique claramente"""
+
+# Resposta quando nenhum requisito foi recuperado (filtro de seção/norma sem
+# documentos): o LLM não é chamado, já que responderia sem contexto algum
+NO_CONTEXT_ANSWER = ("Não encontrei requisitos que atendam aos filtros informados (seção/norma). "
+                     "Ajuste ou remova os filtros e refaça a consulta.")
+
+def build_prompt(docs: list[Document], question: str) -> tuple[list[dict], ContextPack]:
+    """
+    Monta as mensagens de consultoria: instruções fixas no sistema e, na
+    mensagem do usuário, o contexto limitado a CONTEXT_MAX_TOKENS seguido da consulta.
+    """
+    pack = context_builder.build(docs)
+    prom.CONTEXT_TOKENS.observe(pack.tokens)
+    user_message = f"""Contexto da ISO/IEC 17025:2017:
+{pack.text}
+
+Consulta do cliente: {question}
+
+Resposta técnica:"""
+    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user_message}], pack
+
+def timed_build_prompt(docs: list[Document], question: str) -> tuple[list[dict], ContextPack]:
+    with span("prompt"), prom.PROMPT_BUILD_SECONDS.time():
+        return build_prompt(docs, question)
+
+async def generate_answer(docs: list[Document], question: str, endpoint: str) -> tuple[str, float, ContextPack]:
+    """Chamada ao LLM sem streaming (/ask e /ask/batch): (resposta, tempo de geração em ms, contexto usado)."""
+    if not docs:
+        return NO_CONTEXT_ANSWER, 0.0, ContextPack(text="", documents=[], tokens=0, dropped=0, truncated=False)
+    messages, pack = timed_build_prompt(docs, question)
+    generation_start = time.time()
+    with span("llm"):
+        response = await llm_gateway.complete(messages=messages, **GENERATION_PARAMS)
+    generation_time = (time.time() - generation_start) * 1000  # em ms
+    prom.LLM_GENERATION_SECONDS.labels(endpoint=endpoint).observe(generation_time / 1000)
+    prom.record_usage(response.usage)
+    return response.choices[0].message.content.strip(), generation_time, pack
+
+def document_refs(docs: list[Document]) -> list[str]:
+    return [doc.metadata.get('section', 'Unknown') if hasattr(doc, 'metadata') else f'Doc {i}'
+            for i, doc in enumerate(docs)]
+
+def record_query(query_info: dict):
+    """Atualiza as estatísticas acumuladas com uma consulta bem-sucedida."""
+    metrics_store.record_success(query_info)
+
+def record_error(question: str, error: Exception):
+    prom.ERRORS.labels(type=type(error).__name__).inc()
+    logger.error("❌ Erro ao processar consulta: %s", error, exc_info=True)
+    metrics_store.record_error({
+        'timestamp': datetime.now().isoformat(),
+        'query': question,
+        'status': 'error',
+        'error': str(error)
+    })
+
+def cached_response(cached: dict, question: str, cache_level: str, similarity: float,
+                    query_start_time: float) -> dict:
+    """Monta a resposta de /ask a partir de uma entrada do cache de respostas."""
+    total_time = (time.time() - query_start_time) * 1000  # em ms
+    record_query({
+        'timestamp': datetime.now().isoformat(),
+        'query': question,
+        'total_time_ms': round(total_time, 2),
+        'retrieval_time_ms': 0,
+        'generation_time_ms': 0,
+        'documents_retrieved': cached['documents_retrieved'],
+        'answer_length': len(cached['answer']),
+        'cache': cache_level,
+        'status': 'success'
+    })
+    logger.info("⚡ Resposta servida pelo cache (%s, similaridade %.3f) em %.2fms", cache_level, similarity,
+                total_time, extra={"cache": cache_level, "spans": current_spans()})
+    return {
+        **cached,
+        "question": question,
+        "cached_question": cached["question"],
+        "metrics": {
+            "total_time_ms": round(total_time, 2),
+            "retrieval_time_ms": 0,
+            "generation_time_ms": 0,
+            "cache": cache_level,
+            "cache_similarity": round(similarity, 4)
+        }
+    }
+
 @app.post("/ask")
 async def ask_rag(req: QueryRequest):
     """
     Endpoint principal do sistema RAG para consultoria em qualidade laboratorial.
     Recebe uma consulta, faz busca semântica na base ISO 17025 e gera resposta fundamentada.
     """
+    ensure_ready()
     query_start_time = time.time()
     
     question = req.question.strip()
@@ -90,65 +702,58 @@ async def ask_rag(req: QueryRequest):
         logger.warning("❌ Consulta vazia recebida")
         return {"error": "Consulta vazia"}
 
-    logger.info(f"🔍 Nova consulta recebida: '{question}'")
-    
-    try:
-        # === Recuperar requisitos mais relevantes da ISO 17025 ===
-        retrieval_start = time.time()
-        retrieved_docs = faiss_index.similarity_search(question, k=5)
-        retrieval_time = (time.time() - retrieval_start) * 1000  # em ms
-        
-        context = "\n\n".join([doc.page_content for doc in retrieved_docs])
-        logger.info(f"Recuperados {len(retrieved_docs)} documentos em {retrieval_time:.2f}ms")
-        
-        # Registrar documentos recuperados
-        doc_refs = [doc.metadata.get('section', 'Unknown') if hasattr(doc, 'metadata') else f'Doc {i}' 
-                   for i, doc in enumerate(retrieved_docs)]
-        logger.info(f"📚 Documentos: {', '.join(doc_refs)}")
-
-        # === Montar prompt contextualizado para consultoria ===
-        prompt = f"""
-Você é um consultor técnico especializado em qualidade laboratorial que utiliza a norma ISO/IEC 17025:2017.
-Responda à consulta usando APENAS as informações do contexto fornecido dos requisitos da norma.
+    logger.info("🔍 Nova consulta recebida: '%s'", question)
+    search_filter = req.search_filter()
 
-Instruções:
-- Seja preciso e técnico
-- Cite os números das seções quando relevante (ex: "conforme item 6.2.5", "seção 7.4.1")
-- Mantenha o foco na aplicação prática para laboratórios
-- Se a informação não estiver no contexto, indique claramente
-
-Contexto da ISO/IEC 17025:2017:
-{context}
+    with prom.REQUESTS_IN_FLIGHT.labels(endpoint="/ask").track_inprogress():
+        if not COALESCE_REQUESTS:
+            return await answer_question(question, query_start_time, search_filter)
+        # Mesma pergunta normalizada, mesmo filtro e mesma versão do índice -> mesma resposta
+        key = (normalize_question(question), search_filter, K_DOCUMENTS, index_manager.current.version)
+        result, shared = await single_flight.do(
+            key, lambda: answer_question(question, query_start_time, search_filter)
+        )
+        if not shared or "metrics" not in result:
+            return result
+        prom.COALESCED_REQUESTS.inc()
+        logger.info("🔗 Consulta agrupada com uma execução idêntica em andamento: '%s'", question)
+        total_time = (time.time() - query_start_time) * 1000  # em ms
+        return {
+            **result,
+            "question": question,
+            "metrics": {**result["metrics"], "total_time_ms": round(total_time, 2), "coalesced": True}
+        }
 
-Consulta do cliente: {question}
+async def answer_question(question: str, query_start_time: float,
+                          search_filter: SearchFilter | None = None) -> dict:
+    """Pipeline completo (cache, recuperação e geração) usado pelo /ask."""
+    try:
+        # === Cache de respostas (exato, depois semântico) ===
+        retrieval_start = time.time()
+        cached, cache_level, similarity, query_vector = await check_answer_cache(
+            question, semantic=not cited_clause_ids(question), lookup=search_filter is None
+        )
+        if cached is not None:
+            return cached_response(cached, question, cache_level, similarity, query_start_time)
 
-Resposta técnica:
-"""
+        # === Recuperar requisitos mais relevantes da ISO 17025 ===
+        active, candidates = await retrieve_documents(question, query_vector, k=retrieval_depth(),
+                                                      search_filter=search_filter)
+        retrieval_time = (time.time() - retrieval_start) * 1000  # em ms
+        retrieved_docs, rerank_metrics = await rerank_documents(question, candidates)
+        logger.debug("📚 Recuperados %d documentos em %.2fms: %s", len(retrieved_docs), retrieval_time,
+                     document_refs(retrieved_docs))
 
-        # === Chamar o modelo GPT para gerar resposta de consultoria ===
-        logger.info("🤖 Gerando resposta com GPT-4o-mini...")
-        generation_start = time.time()
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            max_tokens=800
-        )
-        generation_time = (time.time() - generation_start) * 1000  # em ms
-        
-        answer = response.choices[0].message.content.strip()
-        logger.info(f"Resposta gerada em {generation_time:.2f}ms")
+        # === Montar prompt e chamar o modelo GPT para gerar resposta de consultoria ===
+        answer, generation_time, pack = await generate_answer(retrieved_docs, question, "/ask")
+        # Só os documentos que couberam no orçamento do contexto foram vistos pelo modelo
+        doc_refs = document_refs(pack.documents)
         
         # === Calcular tempo total ===
         total_time = (time.time() - query_start_time) * 1000  # em ms
+        prom.REQUEST_SECONDS.labels(endpoint="/ask").observe(total_time / 1000)
         
         # === Atualizar estatísticas ===
-        query_stats['total_queries'] += 1
-        query_stats['total_response_time_ms'] += total_time
-        query_stats['min_response_time_ms'] = min(query_stats['min_response_time_ms'], total_time)
-        query_stats['max_response_time_ms'] = max(query_stats['max_response_time_ms'], total_time)
-        
         query_info = {
             'timestamp': datetime.now().isoformat(),
             'query': question,
@@ -157,44 +762,527 @@ Resposta técnica:
             'generation_time_ms': round(generation_time, 2),
             'documents_retrieved': len(retrieved_docs),
             'document_refs': doc_refs,
+            'context_tokens': pack.tokens,
             'answer_length': len(answer),
+            'cache': cache_level,
             'status': 'success'
         }
-        query_stats['queries'].append(query_info)
+        record_query(query_info)
         
-        # Log das métricas
-        logger.info(f"⏱️  Tempo total: {total_time:.2f}ms (Recuperação: {retrieval_time:.2f}ms + Geração: {generation_time:.2f}ms)")
-        logger.info(f"📊 Estatísticas acumuladas - Consultas: {query_stats['total_queries']}, "
-                   f"Tempo médio: {query_stats['total_response_time_ms']/query_stats['total_queries']:.2f}ms")
+        # Uma linha estruturada por consulta, com os spans de cada etapa
+        logger.info("⏱️  Tempo total: %.2fms (Recuperação: %.2fms + Geração: %.2fms)",
+                    total_time, retrieval_time, generation_time,
+                    extra={"endpoint": "/ask", "spans": current_spans(), "cache": cache_level,
+                           "document_refs": doc_refs, "context_tokens": pack.tokens,
+                           "context_documents": len(pack.documents)})
 
         # === Retornar resultado da consultoria ===
-        return {
+        result = {
             "question": question,
             "answer": answer,
-            "context_used": [doc.page_content[:250] for doc in retrieved_docs],
+            "context_used": [doc.page_content[:250] for doc in pack.documents],
             "documents_retrieved": len(retrieved_docs),
+            "system_info": SYSTEM_INFO
+        }
+        if ANSWER_CACHE_ENABLED and search_filter is None:
+            answer_cache.put(question, query_vector, result, index_version=active.version)
+
+        return {
+            **result,
             "metrics": {
                 "total_time_ms": round(total_time, 2),
                 "retrieval_time_ms": round(retrieval_time, 2),
-                "generation_time_ms": round(generation_time, 2)
-            },
-            "system_info": {
-                "scenario": "Consultoria em Qualidade Laboratorial",
-                "standard": "ISO/IEC 17025:2017",
-                "method": "RAG (Retrieval-Augmented Generation)"
+                **rerank_metrics,
+                "generation_time_ms": round(generation_time, 2),
+                "context_tokens": pack.tokens,
+                "cache": cache_level
             }
         }
         
+    except LLMGatewayError as e:
+        # Sobrecarga ou limite da OpenAI: status HTTP próprio para o cliente tentar de novo depois
+        record_error(question, e)
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=retry_after_headers(e))
     except Exception as e:
-        logger.error(f"❌ Erro ao processar consulta: {str(e)}", exc_info=True)
-        error_query = {
+        record_error(question, e)
+        return {"error": str(e), "status": "failed"}
+
+def ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+@app.post("/ask/stream")
+async def ask_rag_stream(req: QueryRequest):
+    """
+    Versão em streaming do /ask (NDJSON, um evento JSON por linha):
+      - {"event": "context", ...}: trechos e seções recuperados, enviado antes da geração
+      - {"event": "token", "content": ...}: fragmentos da resposta à medida que o LLM os gera
+      - {"event": "done", "metrics": ...}: métricas finais da consulta
+      - {"event": "error", "error": ...}: falha durante o processamento
+    Com a fila do LLM cheia, responde 503 antes de abrir o stream.
+    """
+    ensure_ready()
+    if llm_gateway.saturated():
+        raise HTTPException(status_code=503, detail="Fila de chamadas ao LLM cheia",
+                            headers={"Retry-After": str(max(1, round(LLM_QUEUE_TIMEOUT_S / 2)))})
+    query_start_time = time.time()
+    question = req.question.strip()
+    if not question:
+        logger.warning("❌ Consulta vazia recebida")
+        return {"error": "Consulta vazia"}
+
+    logger.info("🔍 Nova consulta (streaming) recebida: '%s'", question)
+
+    async def event_stream():
+        # aclosing: se o cliente desconectar, o pipeline é encerrado na hora
+        # (e com ele o stream da OpenAI), sem esperar a coleta do gerador
+        with prom.REQUESTS_IN_FLIGHT.labels(endpoint="/ask/stream").track_inprogress():
+            async with aclosing(stream_answer(question, query_start_time, req.search_filter())) as events:
+                async for event in events:
+                    yield event
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+async def stream_answer(question: str, query_start_time: float, search_filter: SearchFilter | None = None):
+    """Pipeline do /ask/stream: gera os eventos NDJSON da consulta."""
+    try:
+        # === Cache de respostas: a resposta inteira é enviada como um único fragmento ===
+        retrieval_start = time.time()
+        cached, cache_level, similarity, query_vector = await check_answer_cache(
+            question, semantic=not cited_clause_ids(question), lookup=search_filter is None
+        )
+        if cached is not None:
+            response = cached_response(cached, question, cache_level, similarity, query_start_time)
+            yield ndjson({
+                "event": "context",
+                "question": question,
+                "context_used": response["context_used"],
+                "documents_retrieved": response["documents_retrieved"],
+                "cache": cache_level
+            })
+            yield ndjson({"event": "token", "content": response["answer"]})
+            yield ndjson({"event": "done", "metrics": response["metrics"]})
+            return
+
+        active, candidates = await retrieve_documents(question, query_vector, k=retrieval_depth(),
+                                                      search_filter=search_filter)
+        retrieval_time = (time.time() - retrieval_start) * 1000  # em ms
+        retrieved_docs, rerank_metrics = await rerank_documents(question, candidates)
+        logger.debug("📚 Recuperados %d documentos em %.2fms: %s", len(retrieved_docs), retrieval_time,
+                     document_refs(retrieved_docs))
+
+        # O prompt é montado antes do evento de contexto: ele lista só os
+        # documentos que couberam no orçamento, os que o modelo vai ver
+        messages, pack = timed_build_prompt(retrieved_docs, question)
+        doc_refs = document_refs(pack.documents)
+        context_used = [doc.page_content[:250] for doc in pack.documents]
+        yield ndjson({
+            "event": "context",
+            "question": question,
+            "context_used": context_used,
+            "document_refs": doc_refs,
+            "documents_retrieved": len(retrieved_docs),
+            "cache": cache_level,
+            "metrics": {"retrieval_time_ms": round(retrieval_time, 2), **rerank_metrics}
+        })
+
+        # === Gerar resposta repassando os tokens conforme chegam ===
+        generation_start = time.time()
+        first_token_time = None
+        parts = []
+        if not retrieved_docs:
+            # Filtro sem documentos: resposta fixa, sem chamar o LLM
+            parts.append(NO_CONTEXT_ANSWER)
+            yield ndjson({"event": "token", "content": NO_CONTEXT_ANSWER})
+        else:
+            with span("llm"):
+                async with llm_gateway.stream(
+                    messages=messages,
+                    stream_options={"include_usage": True},
+                    **GENERATION_PARAMS
+                ) as (stream, usage):
+                    async for chunk in stream:
+                        # O último fragmento (sem choices) traz o usage da requisição
+                        if getattr(chunk, "usage", None) is not None:
+                            usage.append(chunk.usage)
+                            prom.record_usage(chunk.usage)
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if not delta:
+                            continue
+                        if first_token_time is None:
+                            first_token_time = (time.time() - generation_start) * 1000  # em ms
+                            prom.LLM_TTFT_SECONDS.observe(first_token_time / 1000)
+                        parts.append(delta)
+                        yield ndjson({"event": "token", "content": delta})
+
+        generation_time = (time.time() - generation_start) * 1000  # em ms
+        total_time = (time.time() - query_start_time) * 1000  # em ms
+        prom.LLM_GENERATION_SECONDS.labels(endpoint="/ask/stream").observe(generation_time / 1000)
+        prom.REQUEST_SECONDS.labels(endpoint="/ask/stream").observe(total_time / 1000)
+        answer = "".join(parts).strip()
+        metrics = {
+            "total_time_ms": round(total_time, 2),
+            "retrieval_time_ms": round(retrieval_time, 2),
+            **rerank_metrics,
+            "generation_time_ms": round(generation_time, 2),
+            "time_to_first_token_ms": round(first_token_time or generation_time, 2),
+            "context_tokens": pack.tokens,
+            "cache": cache_level
+        }
+        record_query({
             'timestamp': datetime.now().isoformat(),
             'query': question,
-            'status': 'error',
-            'error': str(e)
+            **{key: value for key, value in metrics.items() if key != 'cache'},
+            'documents_retrieved': len(retrieved_docs),
+            'document_refs': doc_refs,
+            'answer_length': len(answer),
+            'cache': cache_level,
+            'status': 'success'
+        })
+        logger.info("⏱️  Tempo total (streaming): %.2fms (Primeiro token: %.2fms)",
+                    total_time, metrics['time_to_first_token_ms'],
+                    extra={"endpoint": "/ask/stream", "spans": current_spans(), "cache": cache_level,
+                           "document_refs": doc_refs, "context_tokens": pack.tokens})
+
+        if ANSWER_CACHE_ENABLED and search_filter is None:
+            answer_cache.put(question, query_vector, {
+                "question": question,
+                "answer": answer,
+                "context_used": context_used,
+                "documents_retrieved": len(retrieved_docs),
+                "system_info": SYSTEM_INFO
+            }, index_version=active.version)
+        yield ndjson({"event": "done", "metrics": metrics})
+
+    except LLMGatewayError as e:
+        # O status HTTP já foi enviado: o código vai no próprio evento
+        record_error(question, e)
+        yield ndjson({"event": "error", "error": str(e), "status": "failed",
+                      "status_code": e.status_code, "retry_after": e.retry_after})
+    except Exception as e:
+        record_error(question, e)
+        yield ndjson({"event": "error", "error": str(e), "status": "failed"})
+
+# === Consultas em lote (/ask/batch) ===
+async def retrieve_batch(questions: list[str], query_vectors: list[np.ndarray | None],
+                         search_filter: SearchFilter | None = None, k: int = K_DOCUMENTS):
+    """
+    Recuperação de várias perguntas com uma única busca multi-consulta no
+    índice (matriz de embeddings) e o BM25 de todas em um único job do
+    executor. Retorna (índice usado, ids ranqueados por pergunta).
+    """
+    active = index_manager.current
+    subset = await filter_subset(active, search_filter)
+    if subset is not None and not subset.ids:
+        return active, [[] for _ in questions]
+    use_lexical = HYBRID_SEARCH and active.lexical is not None
+    candidates = max(k, HYBRID_CANDIDATES) if use_lexical else k
+    dense_rows = [i for i, vector in enumerate(query_vectors) if vector is not None]
+
+    def search():
+        dense, lexical = {}, {}
+        if dense_rows:
+            with prom.SEARCH_SECONDS.time():
+                hits = active.dense_search(np.stack([query_vectors[i] for i in dense_rows]), candidates, subset)
+            dense = {i: [doc_id for doc_id, _ in row] for i, row in zip(dense_rows, hits)}
+        if use_lexical:
+            allowed = subset.lexical_positions if subset is not None else None
+            for i, question in enumerate(questions):
+                with prom.LEXICAL_SEARCH_SECONDS.time():
+                    lexical[i] = [doc_id for doc_id, _ in active.lexical.search(question, candidates, allowed)]
+        return dense, lexical
+
+    with span("search"):
+        dense, lexical = await run_in_executor(retrieval_executor, search)
+    ranked = []
+    for i, question in enumerate(questions):
+        rankings = [ranking for ranking in (dense.get(i), lexical.get(i)) if ranking is not None]
+        ranked.append(fuse_rankings(pinned_clause_ids(question, subset), rankings, k))
+    return active, ranked
+
+async def prepare_batch(questions: list[str], search_filter: SearchFilter | None, batch_start: float) -> dict:
+    """
+    Cache, embeddings e recuperação do lote inteiro. Itens servidos pelo cache
+    (ou inválidos) já saem prontos; os demais ficam pendentes para o LLM com
+    os ids dos seus documentos. Cada documento é lido uma única vez, mesmo
+    quando recuperado por várias perguntas.
+    """
+    lookup = ANSWER_CACHE_ENABLED and search_filter is None
+    if ANSWER_CACHE_ENABLED:
+        answer_cache.ensure_index_version(index_manager.current.version)
+    done, misses = [], []
+    valid = []
+    for i, question in enumerate(questions):
+        if question:
+            valid.append(i)
+        else:
+            done.append({"index": i, "question": question, "error": "Consulta vazia", "status": "failed"})
+    # Nível exato do lote inteiro com uma só leitura no backend compartilhado
+    exact = await answer_cache.get_exact_many([questions[i] for i in valid]) if lookup else [None] * len(valid)
+    for i, cached in zip(valid, exact):
+        if cached is not None:
+            prom.CACHE_LOOKUPS.labels(result="exact").inc()
+            done.append({"index": i, **cached_response(cached, questions[i], "exact", 1.0, batch_start)})
+        else:
+            misses.append(i)
+
+    # Um único forward pass para todas as perguntas que precisam de embedding
+    semantic = [i for i in misses if not cited_clause_ids(questions[i])]
+    vectors = {i: canned_queries.vector(questions[i]) for i in semantic if questions[i] in canned_queries}
+    if vectors:
+        prom.CANNED_QUERY_HITS.labels(kind="embedding").inc(len(vectors))
+    to_encode = [i for i in semantic if i not in vectors]
+    if to_encode:
+        with span("embed"), prom.EMBEDDING_SECONDS.time():
+            encoded = await run_in_executor(
+                retrieval_executor, embeddings.encode, [questions[i] for i in to_encode]
+            )
+        vectors.update(zip(to_encode, encoded))
+
+    pending = []
+    for i in misses:
+        vector = vectors.get(i)
+        if lookup and vector is not None:
+            cached, similarity = answer_cache.get_semantic(vector)
+            prom.CACHE_LOOKUPS.labels(result="semantic" if cached is not None else "miss").inc()
+            if cached is not None:
+                done.append({"index": i, **cached_response(cached, questions[i], "semantic", similarity, batch_start)})
+                continue
+        elif lookup:
+            answer_cache.record_miss()
+            prom.CACHE_LOOKUPS.labels(result="miss").inc()
+        pending.append(i)
+
+    active, ranked = await retrieve_batch(
+        [questions[i] for i in pending], [vectors.get(i) for i in pending], search_filter
+    )
+    unique_ids = list(dict.fromkeys(doc_id for ids in ranked for doc_id in ids))
+    documents = dict(zip(unique_ids, active.documents_for(unique_ids)))
+    return {
+        "done": done,
+        "pending": [(i, questions[i], vectors.get(i), ids) for i, ids in zip(pending, ranked)],
+        "documents": documents,
+        "index_version": active.version,
+        "cache_level": "bypass" if search_filter is not None else "miss",
+        "retrieval_time_ms": round((time.time() - batch_start) * 1000, 2)
+    }
+
+async def answer_batch_item(index: int, question: str, query_vector: np.ndarray | None, doc_ids: list[str],
+                            prepared: dict, semaphore: asyncio.Semaphore, batch_start: float,
+                            cacheable: bool) -> dict:
+    """Geração de um item do lote, limitada pelo semáforo de chamadas simultâneas ao LLM."""
+    docs = [prepared["documents"][doc_id] for doc_id in doc_ids]
+    queued_at = time.time()
+    try:
+        async with semaphore:
+            queue_wait = (time.time() - queued_at) * 1000  # em ms
+            answer, generation_time, pack = await generate_answer(docs, question, "/ask/batch")
+        total_time = (time.time() - batch_start) * 1000  # em ms
+        # Só os documentos que couberam no orçamento do contexto foram vistos pelo modelo
+        in_context = {id(doc) for doc in pack.documents}
+        doc_ids = [doc_id for doc_id, doc in zip(doc_ids, docs) if id(doc) in in_context]
+        doc_refs = document_refs(pack.documents)
+        metrics = {
+            "total_time_ms": round(total_time, 2),
+            "retrieval_time_ms": prepared["retrieval_time_ms"],
+            "queue_wait_ms": round(queue_wait, 2),
+            "generation_time_ms": round(generation_time, 2),
+            "context_tokens": pack.tokens,
+            "cache": prepared["cache_level"]
         }
-        query_stats['queries'].append(error_query)
-        return {"error": str(e), "status": "failed"}
+        record_query({
+            'timestamp': datetime.now().isoformat(),
+            'query': question,
+            **{key: value for key, value in metrics.items() if key not in ('cache', 'queue_wait_ms')},
+            'documents_retrieved': len(docs),
+            'document_refs': doc_refs,
+            'answer_length': len(answer),
+            'cache': prepared["cache_level"],
+            'status': 'success'
+        })
+        if cacheable:
+            answer_cache.put(question, query_vector, {
+                "question": question,
+                "answer": answer,
+                "context_used": [doc.page_content[:250] for doc in pack.documents],
+                "documents_retrieved": len(docs),
+                "system_info": SYSTEM_INFO
+            }, index_version=prepared["index_version"])
+        return {
+            "index": index,
+            "question": question,
+            "answer": answer,
+            "document_ids": doc_ids,
+            "document_refs": doc_refs,
+            "documents_retrieved": len(docs),
+            "metrics": metrics
+        }
+    except LLMGatewayError as e:
+        record_error(question, e)
+        return {"index": index, "question": question, "error": str(e), "status": "failed",
+                "status_code": e.status_code, "retry_after": e.retry_after}
+    except Exception as e:
+        record_error(question, e)
+        return {"index": index, "question": question, "error": str(e), "status": "failed"}
+
+async def run_batch(questions: list[str], search_filter: SearchFilter | None, batch_start: float):
+    """Gera os eventos do lote: "contexts" (documentos deduplicados) e um "item" por pergunta ao terminar."""
+    prepared = await prepare_batch(questions, search_filter, batch_start)
+    yield {
+        "event": "contexts",
+        "contexts": {
+            doc_id: {"section": doc.metadata.get("section", "Unknown"), "text": doc.page_content[:250]}
+            for doc_id, doc in prepared["documents"].items()
+        },
+        "retrieval_time_ms": prepared["retrieval_time_ms"]
+    }
+    for item in prepared["done"]:
+        yield {"event": "item", **item}
+
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+    cacheable = ANSWER_CACHE_ENABLED and search_filter is None
+    tasks = [
+        asyncio.create_task(answer_batch_item(i, question, vector, doc_ids, prepared, semaphore,
+                                              batch_start, cacheable))
+        for i, question, vector, doc_ids in prepared["pending"]
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield {"event": "item", **(await next_done)}
+    finally:
+        # Cliente desconectou no meio do streaming: não gasta mais chamadas ao LLM
+        for task in tasks:
+            task.cancel()
+
+def batch_metrics(items: list[dict], retrieval_time_ms: float, batch_start: float) -> dict:
+    total_time = (time.time() - batch_start) * 1000  # em ms
+    prom.REQUEST_SECONDS.labels(endpoint="/ask/batch").observe(total_time / 1000)
+    failed = sum(1 for item in items if "error" in item)
+    return {
+        "questions": len(items),
+        "completed": len(items) - failed,
+        "failed": failed,
+        "cache_hits": sum(1 for item in items if item.get("metrics", {}).get("cache") in ("exact", "semantic")),
+        "total_time_ms": round(total_time, 2),
+        "retrieval_time_ms": retrieval_time_ms,
+        "llm_concurrency": BATCH_LLM_CONCURRENCY,
+        "questions_per_s": round(len(items) / max(total_time / 1000, 1e-9), 2)
+    }
+
+@app.post("/ask/batch")
+async def ask_rag_batch(req: BatchQueryRequest):
+    """
+    Consulta em lote (ex.: checklists de auditoria): todas as perguntas são
+    codificadas em um único forward pass e buscadas em uma única chamada
+    multi-consulta ao índice; as respostas são geradas com no máximo
+    BATCH_LLM_CONCURRENCY chamadas simultâneas ao LLM.
+
+    Os documentos recuperados são deduplicados em "contexts" (id -> seção e
+    trecho) e cada item os referencia por "document_ids". Sem stream, retorna
+    os itens na ordem das perguntas; com stream=true, envia NDJSON:
+    {"event": "contexts"}, um {"event": "item"} por pergunta na ordem em que
+    terminam (com "index") e {"event": "done", "metrics": ...} ao final.
+    """
+    ensure_ready()
+    if not req.questions:
+        raise HTTPException(status_code=400, detail="Lista de perguntas vazia")
+    if len(req.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"Máximo de {BATCH_MAX_QUESTIONS} perguntas por lote")
+
+    batch_start = time.time()
+    questions = [question.strip() for question in req.questions]
+    search_filter = req.search_filter()
+    logger.info("📋 Lote recebido: %d perguntas", len(questions))
+
+    if req.stream:
+        async def event_stream():
+            with prom.REQUESTS_IN_FLIGHT.labels(endpoint="/ask/batch").track_inprogress():
+                items, retrieval_time = [], 0.0
+                async for event in run_batch(questions, search_filter, batch_start):
+                    if event["event"] == "contexts":
+                        retrieval_time = event["retrieval_time_ms"]
+                    else:
+                        items.append(event)
+                    yield ndjson(event)
+                yield ndjson({"event": "done", "metrics": batch_metrics(items, retrieval_time, batch_start)})
+
+        return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+    with prom.REQUESTS_IN_FLIGHT.labels(endpoint="/ask/batch").track_inprogress():
+        contexts, items, retrieval_time = {}, [], 0.0
+        async for event in run_batch(questions, search_filter, batch_start):
+            if event.pop("event") == "contexts":
+                contexts, retrieval_time = event["contexts"], event["retrieval_time_ms"]
+            else:
+                items.append(event)
+    metrics = batch_metrics(items, retrieval_time, batch_start)
+    logger.info("📋 Lote concluído: %d/%d em %.0fms", metrics['completed'], metrics['questions'],
+                metrics['total_time_ms'], extra={"endpoint": "/ask/batch", "spans": current_spans()})
+    return {
+        "results": sorted(items, key=lambda item: item["index"]),
+        "contexts": contexts,
+        "system_info": SYSTEM_INFO,
+        "metrics": metrics
+    }
+
+# === Busca sem geração (/search) ===
+@app.post("/search")
+async def search_documents(req: SearchRequest):
+    """
+    Apenas a recuperação híbrida, sem reranking nem LLM: trechos ranqueados
+    com pontuações e metadados, paginados por k/offset. O ranking é sempre
+    calculado na profundidade fixa SEARCH_MAX_DEPTH e só então fatiado: o
+    conjunto de candidatos da fusão não muda com a página, e as páginas não se
+    sobrepõem nem pulam trechos. Perguntas da tabela pré-calculada (exemplos
+    da interface e CANNED_QUERIES_FILE) sem filtro são servidas direto do
+    ranking guardado, sem embedding nem busca.
+    """
+    ensure_ready()
+    search_start = time.time()
+    query = req.query.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Consulta vazia")
+    if not 1 <= req.k <= SEARCH_MAX_K or req.offset < 0 or req.offset + req.k > SEARCH_MAX_DEPTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Use 1 <= k <= {SEARCH_MAX_K}, offset >= 0 e offset + k <= {SEARCH_MAX_DEPTH}"
+        )
+    search_filter = req.search_filter()
+    depth = req.offset + req.k
+    canned = search_filter is None and query in canned_queries
+
+    with prom.REQUESTS_IN_FLIGHT.labels(endpoint="/search").track_inprogress():
+        active = index_manager.current
+        ranked = canned_queries.ranking(query, active.version) if canned else None
+        source = "precomputed" if ranked is not None else "search"
+        if ranked is not None:
+            prom.CANNED_QUERY_HITS.labels(kind="ranking").inc()
+        else:
+            query_vector = None if cited_clause_ids(query) else await embed_question(query)
+            active, ranked = await rank_documents(query, query_vector, SEARCH_MAX_DEPTH, search_filter)
+            if canned:  # índice trocado desde o pré-cálculo: guarda o novo ranking
+                canned_queries.store_ranking(query, active.version, ranked)
+        page = ranked[req.offset:depth]
+        documents = active.documents_for([doc_id for doc_id, _ in page])
+
+    results = [
+        {"rank": req.offset + i + 1, "id": doc_id, "text": doc.page_content, "metadata": doc.metadata, **scores}
+        for i, ((doc_id, scores), doc) in enumerate(zip(page, documents))
+    ]
+    total_time = (time.time() - search_start) * 1000  # em ms
+    prom.SEARCH_REQUEST_SECONDS.observe(total_time / 1000)
+    logger.info("🔎 Busca '%s': %d trecho(s) em %.2fms (%s)", query, len(results), total_time, source,
+                extra={"endpoint": "/search", "spans": current_spans()})
+    return {
+        "query": query,
+        "results": results,
+        "k": req.k,
+        "offset": req.offset,
+        "next_offset": depth if len(ranked) > depth else None,
+        "index_version": active.version,
+        "metrics": {"total_time_ms": round(total_time, 2), "source": source, "spans_ms": current_spans()}
+    }
 
 @app.get("/")
 async def root():
@@ -203,61 +1291,114 @@ async def root():
         "scenario": "Consultoria técnica especializada",
         "standard": "ISO/IEC 17025:2017",
         "technology": "RAG (Retrieval-Augmented Generation)",
-        "endpoints": ["/ask", "/health", "/stats"],
-        "status": "ready"
+        "endpoints": ["/ask", "/ask/stream", "/ask/batch", "/search", "/health", "/live", "/ready", "/stats", "/metrics",
+                      "/admin/reload-index"],
+        "status": startup_state["status"]
     }
 
+@app.get("/live")
+async def liveness():
+    """Liveness: o processo responde. Só falha se a inicialização falhou (o contêiner deve ser reiniciado)."""
+    if startup_state["status"] == "failed":
+        return JSONResponse(status_code=503, content={"status": "failed", "error": startup_state["error"]})
+    return {"status": "alive"}
+
+@app.get("/ready")
+async def readiness():
+    """Readiness: modelo e índice carregados e aquecidos; só então o tráfego deve ser roteado."""
+    body = {"status": startup_state["status"], "startup_ms": startup_state["timings_ms"]}
+    if startup_state["status"] != "ready":
+        return JSONResponse(status_code=503, content={**body, "error": startup_state["error"]})
+    return body
+
 @app.get("/health")
 async def health_check():
     """Endpoint para verificar a saúde do sistema."""
+    if startup_state["status"] != "ready":
+        return {
+            "status": startup_state["status"],
+            "error": startup_state["error"],
+            "startup_ms": startup_state["timings_ms"]
+        }
     return {
         "status": "healthy",
         "faiss_index": "loaded",
-        "embeddings_model": "all-MiniLM-L6-v2",
+        **index_manager.describe(),
+        "embeddings_model": EMBEDDING_MODEL,
+        "embeddings_backend": EMBEDDING_BACKEND,
+        "embeddings_parity": embedding_parity,
+        "startup_ms": startup_state["timings_ms"],
         "llm_model": "gpt-4o-mini",
-        "documents_indexed": "156 requisitos ISO 17025",
-        "total_queries_processed": query_stats['total_queries']
+        "context_max_tokens": CONTEXT_MAX_TOKENS,
+        "reranker": RERANK_MODEL if reranker is not None else None,
+        "token_counter": context_builder.counter.backend,
+        "total_queries_processed": metrics_store.total_queries
     }
 
+async def aggregated_stats() -> tuple[MetricsStore, dict]:
+    """
+    Estatísticas deste worker somadas às publicadas pelos demais workers e
+    réplicas no backend compartilhado (com STATE_BACKEND=local, só as locais).
+    Retorna (métricas mescladas, workers e contadores somados).
+    """
+    merged = MetricsStore(recent_size=METRICS_RECENT_QUERIES)
+    merged.merge(metrics_store)
+    counters = worker_counters()
+    workers = [worker_id()]
+    if stats_publisher is not None:
+        peers = await run_in_executor(None, stats_publisher.peers)
+        for worker, snapshot in peers.items():
+            merged.merge(MetricsStore.from_dict(snapshot["metrics"], recent_size=METRICS_RECENT_QUERIES))
+            for name, values in counters.items():
+                for key, value in snapshot.get(name, {}).items():
+                    values[key] = values.get(key, 0) + value
+            workers.append(worker)
+    backend = state_backend.name if state_backend is not None else "local"
+    return merged, {"backend": backend, "workers": sorted(workers), **counters}
+
 @app.get("/stats")
 async def get_statistics():
     """
     Endpoint para coletar estatísticas de desempenho do sistema.
-    Útil para análise e geração de relatórios.
+    Útil para análise e geração de relatórios. Com STATE_BACKEND
+    compartilhado, "summary", "stages" e "queries" agregam todos os workers;
+    os demais blocos descrevem este worker e "cluster" soma os contadores.
     """
-    if query_stats['total_queries'] == 0:
+    store, cluster = await aggregated_stats()
+    if store.total_queries == 0:
         return {
             "message": "Nenhuma consulta processada ainda",
             "total_queries": 0
         }
     
-    avg_response_time = query_stats['total_response_time_ms'] / query_stats['total_queries']
-    
     stats = {
-        "summary": {
-            "total_queries": query_stats['total_queries'],
-            "avg_response_time_ms": round(avg_response_time, 2),
-            "min_response_time_ms": round(query_stats['min_response_time_ms'], 2),
-            "max_response_time_ms": round(query_stats['max_response_time_ms'], 2),
-            "total_response_time_ms": round(query_stats['total_response_time_ms'], 2),
-        },
-        "queries": query_stats['queries'],
+        "summary": store.summary(),
+        "stages": store.stage_summary(),
+        "queries": store.recent_queries(),
+        "embedding_batching": query_embedder.stats if query_embedder else {},
+        "llm_gateway": llm_gateway.summary() if llm_gateway else {},
+        "answer_cache": answer_cache.summary(),
+        "coalescing": single_flight.summary(),
+        "canned_queries": canned_queries.summary(),
+        "cluster": cluster,
         "timestamp": datetime.now().isoformat()
     }
     
-    logger.info(f"📊 Estatísticas solicitadas - Total de consultas: {query_stats['total_queries']}")
+    logger.info("📊 Estatísticas solicitadas - Total de consultas: %d (%d worker(s))",
+                store.total_queries, len(cluster['workers']))
     return stats
 
 @app.get("/export-metrics")
 async def export_metrics():
     """
-    Endpoint para exportar métricas em JSON para uso em relatórios.
+    Endpoint para exportar métricas em JSON para uso em relatórios
+    (agregadas entre workers com STATE_BACKEND compartilhado).
     """
-    if query_stats['total_queries'] == 0:
+    store, cluster = await aggregated_stats()
+    if store.total_queries == 0:
         return {"error": "Sem dados para exportar"}
     
-    avg_response_time = query_stats['total_response_time_ms'] / query_stats['total_queries']
-    
+    summary = store.summary()
     metrics = {
         "generated_at": datetime.now().isoformat(),
         "system": {
@@ -265,22 +1406,50 @@ async def export_metrics():
             "standard": "ISO/IEC 17025:2017",
             "embedding_model": "all-MiniLM-L6-v2",
             "embedding_dimensions": 384,
-            "documents_indexed": 156,
+            "documents_indexed": index_manager.current.documents if index_manager.current else 0,
             "llm_model": "gpt-4o-mini",
             "temperature": 0.2
         },
         "performance": {
-            "total_queries_processed": query_stats['total_queries'],
-            "avg_response_time_ms": round(avg_response_time, 2),
-            "min_response_time_ms": round(query_stats['min_response_time_ms'], 2),
-            "max_response_time_ms": round(query_stats['max_response_time_ms'], 2),
-            "std_deviation_ms": round(
-                np.std([q['total_time_ms'] for q in query_stats['queries'] if q.get('status') == 'success']),
-                2
-            ) if query_stats['queries'] else 0
+            "total_queries_processed": summary["total_queries"],
+            "avg_response_time_ms": summary["avg_response_time_ms"],
+            "min_response_time_ms": summary["min_response_time_ms"],
+            "max_response_time_ms": summary["max_response_time_ms"],
+            "std_deviation_ms": summary["std_deviation_ms"],
+            "stages": store.stage_summary(),
+            "workers": len(cluster["workers"])
         },
-        "queries_detail": [q for q in query_stats['queries'] if q.get('status') == 'success']
+        # Apenas as consultas mais recentes (METRICS_RECENT_QUERIES) são mantidas em detalhe
+        "queries_detail": store.recent_queries(status="success")
     }
     
     logger.info("📤 Métricas exportadas para relatório")
     return metrics
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Exposição no formato Prometheus/OpenMetrics para scraping."""
+    content, content_type = prom.render_latest()
+    return Response(content=content, media_type=content_type)
+
+@app.post("/admin/reload-index")
+async def reload_index(force: bool = False, x_admin_token: str | None = Header(default=None)):
+    """
+    Carrega em segundo plano a versão atual de iso17025_faiss_qwen e a troca
+    atomicamente pelo índice em uso. Sem force, nada acontece se a versão em
+    disco for a mesma já carregada. Com backend compartilhado, os demais
+    workers recarregam em até STATE_SYNC_INTERVAL_S.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Endpoints de administração desativados (defina ADMIN_TOKEN)")
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Token de administração inválido")
+    ensure_ready()
+    try:
+        result = await index_manager.reload(force=force)
+    except Exception as e:
+        logger.error("❌ Falha ao recarregar índice FAISS: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Falha ao recarregar índice: {e}")
+    if reload_broadcast is not None:
+        await reload_broadcast.publish(force)
+    return result
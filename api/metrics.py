@@ -0,0 +1,239 @@
+import math
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+
+
+class RunningStats:
+    """Média, variância (Welford), mínimo e máximo em memória O(1)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "RunningStats"):
+        """Combina duas séries (algoritmo paralelo de Chan et al.)."""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.mean, "m2": self._m2, "total": self.total,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunningStats":
+        stats = cls()
+        if data["count"]:
+            stats.count, stats.mean, stats._m2, stats.total = data["count"], data["mean"], data["m2"], data["total"]
+            stats.min, stats.max = data["min"], data["max"]
+        return stats
+
+    @property
+    def variance(self) -> float:
+        """Variância populacional (equivalente a np.var)."""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class LatencyHistogram:
+    """
+    Histograma de latências com buckets geométricos fixos (erro relativo de
+    no máximo growth - 1 nos percentis) e mesclável entre instâncias com os
+    mesmos limites.
+    """
+
+    def __init__(self, min_ms: float = 0.1, max_ms: float = 600_000, growth: float = 1.05):
+        self.params = (min_ms, max_ms, growth)
+        bounds = []
+        bound = min_ms
+        while bound < max_ms:
+            bounds.append(bound)
+            bound *= growth
+        bounds.append(max_ms)
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # último bucket: acima de max_ms
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value_ms: float):
+        self.counts[bisect_left(self.bounds, value_ms)] += 1
+        self.count += 1
+        self.max = max(self.max, value_ms)
+
+    def merge(self, other: "LatencyHistogram"):
+        if other.bounds != self.bounds:
+            raise ValueError("Histogramas com buckets diferentes não podem ser mesclados")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> dict:
+        # Esparso: a maioria dos buckets fica vazia
+        return {"params": self.params, "counts": {i: c for i, c in enumerate(self.counts) if c},
+                "count": self.count, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls(*data["params"])
+        for i, bucket_count in data["counts"].items():
+            histogram.counts[int(i)] = bucket_count
+        histogram.count, histogram.max = data["count"], data["max"]
+        return histogram
+
+    def percentile(self, q: float) -> float:
+        """Percentil q (0-100) estimado pelo limite superior do bucket que o contém."""
+        if self.count == 0:
+            return 0.0
+        rank = math.ceil(q / 100 * self.count)
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= max(rank, 1):
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+
+class StageMetrics:
+    def __init__(self):
+        self.stats = RunningStats()
+        self.histogram = LatencyHistogram()
+
+    def add(self, value_ms: float):
+        self.stats.add(value_ms)
+        self.histogram.add(value_ms)
+
+    def merge(self, other: "StageMetrics"):
+        self.stats.merge(other.stats)
+        self.histogram.merge(other.histogram)
+
+    def to_dict(self) -> dict:
+        return {"stats": self.stats.to_dict(), "histogram": self.histogram.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StageMetrics":
+        stage = cls()
+        stage.stats = RunningStats.from_dict(data["stats"])
+        stage.histogram = LatencyHistogram.from_dict(data["histogram"])
+        return stage
+
+    def summary(self) -> dict:
+        if self.stats.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.stats.count,
+            "avg_ms": round(self.stats.mean, 2),
+            "std_ms": round(self.stats.std, 2),
+            "min_ms": round(self.stats.min, 2),
+            "max_ms": round(self.stats.max, 2),
+            "p50_ms": round(self.histogram.percentile(50), 2),
+            "p95_ms": round(self.histogram.percentile(95), 2),
+            "p99_ms": round(self.histogram.percentile(99), 2)
+        }
+
+
+class MetricsStore:
+    """
+    Estatísticas de consultas com memória constante: agregados por etapa
+    (retrieval, generation, total) e um buffer circular apenas com as
+    consultas mais recentes para inspeção.
+    """
+
+    STAGES = ("retrieval", "generation", "total")
+    # Níveis de cache que respondem sem passar por recuperação/geração
+    CACHE_HITS = ("exact", "semantic")
+
+    def __init__(self, recent_size: int = 200, max_question_chars: int = 200):
+        self.recent = deque(maxlen=recent_size)
+        self.max_question_chars = max_question_chars
+        self.stages = {stage: StageMetrics() for stage in self.STAGES}
+        self.total_queries = 0
+        self.errors = 0
+        self.started_at = datetime.now().isoformat()
+
+    def _truncate(self, question: str) -> str:
+        if len(question) <= self.max_question_chars:
+            return question
+        return question[:self.max_question_chars] + "…"
+
+    def record_success(self, query_info: dict):
+        """Registra uma consulta bem-sucedida; espera as chaves *_time_ms de cada etapa."""
+        self.total_queries += 1
+        for stage in self.STAGES:
+            value = query_info.get(f"{stage}_time_ms")
+            # Respostas do cache não passam por recuperação/geração; "miss" e "bypass" (filtro) passam
+            if value is not None and (stage == "total" or query_info.get("cache") not in self.CACHE_HITS):
+                self.stages[stage].add(value)
+        self.recent.append({**query_info, "query": self._truncate(query_info.get("query", ""))})
+
+    def record_error(self, query_info: dict):
+        self.errors += 1
+        self.recent.append({**query_info, "query": self._truncate(query_info.get("query", ""))})
+
+    def merge(self, other: "MetricsStore"):
+        self.total_queries += other.total_queries
+        self.errors += other.errors
+        for stage in self.STAGES:
+            self.stages[stage].merge(other.stages[stage])
+        # Consultas recentes de todos os processos, pelas mais novas
+        recent = sorted([*self.recent, *other.recent], key=lambda q: q.get("timestamp", ""))
+        self.recent = deque(recent[-self.recent.maxlen:], maxlen=self.recent.maxlen)
+
+    def to_dict(self) -> dict:
+        """Snapshot serializável em JSON, publicado para agregação entre workers."""
+        return {
+            "total_queries": self.total_queries,
+            "errors": self.errors,
+            "started_at": self.started_at,
+            "stages": {stage: metrics.to_dict() for stage, metrics in self.stages.items()},
+            "recent": list(self.recent)
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, recent_size: int = 200) -> "MetricsStore":
+        store = cls(recent_size=recent_size)
+        store.total_queries, store.errors, store.started_at = data["total_queries"], data["errors"], data["started_at"]
+        store.stages = {stage: StageMetrics.from_dict(metrics) for stage, metrics in data["stages"].items()}
+        store.recent.extend(data["recent"])
+        return store
+
+    def summary(self) -> dict:
+        total = self.stages["total"].stats
+        return {
+            "total_queries": self.total_queries,
+            "errors": self.errors,
+            "avg_response_time_ms": round(total.mean, 2),
+            "min_response_time_ms": round(total.min, 2) if total.count else 0,
+            "max_response_time_ms": round(total.max, 2) if total.count else 0,
+            "std_deviation_ms": round(total.std, 2),
+            "total_response_time_ms": round(total.total, 2)
+        }
+
+    def stage_summary(self) -> dict:
+        return {stage: metrics.summary() for stage, metrics in self.stages.items()}
+
+    def recent_queries(self, status: str | None = None) -> list[dict]:
+        return [q for q in self.recent if status is None or q.get("status") == status]
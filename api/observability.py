@@ -0,0 +1,193 @@
+import asyncio
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+# Identificador da requisição e spans já concluídos, propagados pelas tasks do asyncio
+trace_id_var: ContextVar[str | None] = ContextVar("trace_id", default=None)
+spans_var: ContextVar[dict | None] = ContextVar("spans", default=None)
+
+_tracer = None  # tracer do OpenTelemetry, quando a exportação OTLP está configurada
+
+# Atributos padrão de LogRecord: o restante (extra=...) vai para o JSON
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "trace_id"}
+
+
+class TraceIdFilter(logging.Filter):
+    """Anexa o trace ID da requisição corrente ao registro (roda na thread de quem loga)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro: horário, nível, logger, mensagem, trace_id e os campos de extra."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", None),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _LocalQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A formatação fica para a thread do listener; só a mensagem e a exceção
+        # são resolvidas aqui para o registro não depender de objetos mutáveis
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(log_file: str, level: str = "INFO", json_format: bool = True,
+                  max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5) -> QueueListener:
+    """
+    Logging fora do event loop: os handlers do root só enfileiram o registro
+    (QueueHandler) e uma thread em segundo plano formata e grava no console
+    e no arquivo rotacionado. Retorna o listener, já iniciado.
+    """
+    formatter = JsonFormatter() if json_format else logging.Formatter(
+        '%(asctime)s - [%(levelname)s] - [%(trace_id)s] - %(message)s'
+    )
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                            encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _LocalQueueHandler(log_queue)
+    queue_handler.addFilter(TraceIdFilter())
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper())
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def setup_tracing(endpoint: str | None, service_name: str):
+    """Exporta os spans via OTLP/HTTP se OTEL_EXPORTER_OTLP_ENDPOINT estiver definido e o SDK instalado."""
+    global _tracer
+    if not endpoint:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("⚠️  opentelemetry-sdk não instalado; spans não serão exportados")
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    # BatchSpanProcessor exporta em thread própria, fora do caminho da requisição
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=f"{endpoint.rstrip('/')}/v1/traces")))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("rag-api")
+    logger.info("🔭 Exportando spans OTLP para %s", endpoint)
+
+
+def shutdown_tracing():
+    if _tracer is not None:
+        from opentelemetry import trace
+        trace.get_tracer_provider().shutdown()
+
+
+@contextmanager
+def request_trace(name: str, trace_id: str | None = None, **attributes):
+    """Abre o trace da requisição: define o trace ID, zera os spans e, com OTLP, cria o span raiz."""
+    trace_token = trace_id_var.set(trace_id or uuid.uuid4().hex)
+    spans_token = spans_var.set({})
+    try:
+        if _tracer is None:
+            yield trace_id_var.get()
+        else:
+            with _tracer.start_as_current_span(name, attributes={"rag.trace_id": trace_id_var.get(), **attributes}):
+                yield trace_id_var.get()
+    finally:
+        spans_var.reset(spans_token)
+        trace_id_var.reset(trace_token)
+
+
+class TraceMiddleware:
+    """
+    Middleware ASGI puro: um trace ID por requisição (X-Request-ID do cliente,
+    se enviado), devolvido em X-Trace-Id. Ao contrário de @app.middleware("http"),
+    a resposta não passa por uma task e uma fila intermediárias, e o corpo dos
+    streams é gerado dentro do trace da requisição.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = dict(scope["headers"]).get(b"x-request-id")
+        method, path = scope["method"], scope["path"]
+        with request_trace(f"{method} {path}", request_id.decode("latin-1") if request_id else None,
+                           **{"http.method": method, "http.route": path}) as trace_id:
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    headers = [*message.get("headers", []), (b"x-trace-id", trace_id.encode("latin-1"))]
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
+
+
+def run_in_executor(executor, fn, *args):
+    """
+    loop.run_in_executor levando o contexto da requisição (trace ID, spans e o
+    span OTLP ativo) para a thread: logs e spans do job ficam no mesmo trace.
+    """
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, context.run, fn, *args)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Mede uma etapa (embed, search, prompt, llm...) da requisição corrente, em ms."""
+    start = time.perf_counter()
+    try:
+        if _tracer is None:
+            yield
+        else:
+            with _tracer.start_as_current_span(name, attributes=attributes):
+                yield
+    finally:
+        spans = spans_var.get()
+        if spans is not None:
+            spans[name] = round(spans.get(name, 0.0) + (time.perf_counter() - start) * 1000, 2)
+
+
+def current_spans() -> dict:
+    return dict(spans_var.get() or {})
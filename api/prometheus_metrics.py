@@ -0,0 +1,105 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Buckets em segundos, seguindo a convenção do Prometheus
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+LLM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 60.0)
+
+EMBEDDING_SECONDS = Histogram(
+    "rag_embedding_seconds", "Tempo para gerar o embedding da pergunta (inclui espera do lote)",
+    buckets=FAST_BUCKETS
+)
+SEARCH_SECONDS = Histogram(
+    "rag_faiss_search_seconds", "Tempo de busca no índice FAISS",
+    buckets=FAST_BUCKETS
+)
+LEXICAL_SEARCH_SECONDS = Histogram(
+    "rag_lexical_search_seconds", "Tempo de busca BM25 no índice invertido",
+    buckets=FAST_BUCKETS
+)
+RERANK_SECONDS = Histogram(
+    "rag_rerank_seconds", "Tempo de reranking dos candidatos com o cross-encoder",
+    buckets=FAST_BUCKETS
+)
+RERANK_FALLBACKS = Counter(
+    "rag_rerank_fallbacks_total", "Reranking descartado (ordem da busca usada), por motivo", ["reason"]
+)
+CLAUSE_LOOKUPS = Counter(
+    "rag_clause_lookups_total", "Perguntas com número de seção resolvido pela tabela de seções"
+)
+CONTEXT_TOKENS = Histogram(
+    "rag_context_tokens", "Tokens do contexto enviado ao LLM após o orçamento",
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+)
+PROMPT_BUILD_SECONDS = Histogram(
+    "rag_prompt_build_seconds", "Tempo para montar o prompt a partir do contexto",
+    buckets=FAST_BUCKETS
+)
+LLM_TTFT_SECONDS = Histogram(
+    "rag_llm_time_to_first_token_seconds", "Tempo até o primeiro token do LLM (streaming)",
+    buckets=LLM_BUCKETS
+)
+LLM_GENERATION_SECONDS = Histogram(
+    "rag_llm_generation_seconds", "Tempo total de geração da resposta pelo LLM",
+    ["endpoint"], buckets=LLM_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "rag_request_seconds", "Tempo total de processamento da consulta",
+    ["endpoint"], buckets=LLM_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "rag_requests_in_flight", "Consultas em processamento", ["endpoint"]
+)
+ERRORS = Counter(
+    "rag_errors_total", "Erros ao processar consultas, por tipo de exceção", ["type"]
+)
+CACHE_LOOKUPS = Counter(
+    "rag_answer_cache_lookups_total", "Consultas ao cache de respostas por resultado", ["result"]
+)
+SEARCH_REQUEST_SECONDS = Histogram(
+    "rag_search_request_seconds", "Tempo total do /search (recuperação sem geração)",
+    buckets=FAST_BUCKETS
+)
+CANNED_QUERY_HITS = Counter(
+    "rag_canned_query_hits_total", "Perguntas atendidas pela tabela pré-calculada, por item reaproveitado",
+    ["kind"]
+)
+COALESCED_REQUESTS = Counter(
+    "rag_coalesced_requests_total", "Consultas ao /ask atendidas por uma execução idêntica já em andamento"
+)
+LLM_TOKENS = Counter(
+    "rag_llm_tokens_total", "Tokens consumidos na API OpenAI (response.usage)", ["kind"]
+)
+STARTUP_SECONDS = Gauge(
+    "rag_startup_seconds", "Duração de cada fase da inicialização da API", ["phase"]
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "rag_llm_queue_depth", "Chamadas ao LLM aguardando vaga no gateway"
+)
+LLM_ACTIVE_CALLS = Gauge(
+    "rag_llm_active_calls", "Chamadas ao LLM em andamento (vagas do gateway ocupadas)"
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "rag_llm_queue_wait_seconds", "Espera por uma vaga no gateway do LLM",
+    buckets=LLM_BUCKETS
+)
+LLM_RETRIES = Counter(
+    "rag_llm_retries_total", "Novas tentativas de chamadas ao LLM, por motivo", ["reason"]
+)
+LLM_SHED = Counter(
+    "rag_llm_shed_total", "Chamadas ao LLM recusadas pelo gateway (fila cheia ou espera esgotada)", ["reason"]
+)
+
+
+def record_usage(usage):
+    """Contabiliza prompt_tokens/completion_tokens do objeto usage da OpenAI, se presente."""
+    if usage is None:
+        return
+    LLM_TOKENS.labels(kind="prompt").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(kind="completion").inc(usage.completion_tokens or 0)
+    # Parte do prompt servida pelo cache de prompt da OpenAI (prefixo repetido)
+    details = getattr(usage, "prompt_tokens_details", None)
+    LLM_TOKENS.labels(kind="cached_prompt").inc(getattr(details, "cached_tokens", None) or 0)
+
+
+def render_latest() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
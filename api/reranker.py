@@ -0,0 +1,59 @@
+import logging
+from typing import NamedTuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Multilíngue (treinado no mMARCO): o corpus e as perguntas são em português
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+class RerankResult(NamedTuple):
+    documents: list[Document]
+    scores: list[float]  # relevância (0-1) dos documentos mantidos, em ordem decrescente
+    candidates: int
+
+
+class CrossEncoderReranker:
+    """
+    Reordena os candidatos da busca híbrida com um cross-encoder em CPU:
+    todos os pares (pergunta, trecho) são pontuados em um único forward pass.
+    Ficam só os melhores top_n com relevância >= min_score, parando antes
+    quando a relevância cai mais que max_gap em relação ao anterior (os
+    trechos seguintes são bem menos relevantes e só aumentariam o prompt).
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, max_length: int = 256, batch_size: int = 32):
+        import torch
+        from sentence_transformers import CrossEncoder
+
+        torch.cuda.is_available = lambda: False
+        self.model_name = model_name
+        self.batch_size = batch_size
+        # num_labels=1: o CrossEncoder aplica sigmoide e devolve relevância entre 0 e 1
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+
+    def score(self, question: str, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.empty(0, dtype=np.float32)
+        return np.asarray(self.model.predict(
+            [(question, text) for text in texts],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        ), dtype=np.float32)
+
+    def rerank(self, question: str, docs: list[Document], top_n: int, min_score: float = 0.0,
+               max_gap: float = 1.0, min_docs: int = 1) -> RerankResult:
+        scores = self.score(question, [doc.page_content for doc in docs])
+        order = np.argsort(-scores, kind="stable")
+        kept = []
+        for position in order[:top_n]:
+            score = float(scores[position])
+            if len(kept) >= min_docs:
+                if score < min_score or kept[-1][1] - score > max_gap:
+                    break
+            kept.append((docs[position], score))
+        return RerankResult([doc for doc, _ in kept], [round(score, 4) for _, score in kept], len(docs))
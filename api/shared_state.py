@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+STATE_BACKENDS = ("local", "memory", "redis")
+
+
+class StateBackend:
+    """
+    Armazenamento chave-valor compartilhado entre workers (bytes com TTL).
+    Falhas do backend nunca derrubam uma consulta: leitura vira falta e
+    escrita é descartada, com aviso no log.
+    """
+    name = "base"
+
+    def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        """Vários valores em uma só ida ao backend, na ordem das chaves."""
+        return [self.get(key) for key in keys]
+
+    def set(self, key: str, value: bytes, ttl_seconds: float | None = None):
+        raise NotImplementedError
+
+    def scan(self, prefix: str) -> dict[str, bytes]:
+        """Todas as chaves (não expiradas) com o prefixo."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(StateBackend):
+    """Substituto em memória do Redis (mesma semântica de TTL), para testes e desenvolvimento."""
+    name = "memory"
+
+    def __init__(self):
+        self._data: dict[str, tuple[bytes, float | None]] = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key: str) -> bool:
+        expires_at = self._data[key][1]
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            return False
+        return True
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            return self._data[key][0] if key in self._data and self._alive(key) else None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float | None = None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl_seconds if ttl_seconds else None)
+
+    def scan(self, prefix: str) -> dict[str, bytes]:
+        with self._lock:
+            return {key: self._data[key][0] for key in list(self._data)
+                    if key.startswith(prefix) and self._alive(key)}
+
+
+class RedisBackend(StateBackend):
+    """Redis (ou compatível: KeyDB, Valkey, Dragonfly) local, com timeouts curtos: está no caminho da consulta."""
+    name = "redis"
+
+    def __init__(self, url: str, timeout_s: float = 0.25):
+        import redis  # dependência opcional, só com STATE_BACKEND=redis
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout_s, socket_connect_timeout=timeout_s)
+        self.client.ping()
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self.client.get(key)
+        except Exception as e:
+            logger.warning("⚠️  Redis indisponível na leitura de '%s': %s", key, e)
+            return None
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        if not keys:
+            return []
+        try:
+            return self.client.mget(keys)
+        except Exception as e:
+            logger.warning("⚠️  Redis indisponível na leitura de %d chaves: %s", len(keys), e)
+            return [None] * len(keys)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float | None = None):
+        try:
+            self.client.set(key, value, px=int(ttl_seconds * 1000) if ttl_seconds else None)
+        except Exception as e:
+            logger.warning("⚠️  Redis indisponível na escrita de '%s': %s", key, e)
+
+    def scan(self, prefix: str) -> dict[str, bytes]:
+        try:
+            keys = list(self.client.scan_iter(match=f"{prefix}*", count=100))
+            values = self.client.mget(keys) if keys else []
+        except Exception as e:
+            logger.warning("⚠️  Redis indisponível ao listar '%s*': %s", prefix, e)
+            return {}
+        return {key.decode(): value for key, value in zip(keys, values) if value is not None}
+
+    def close(self):
+        self.client.close()
+
+
+def create_state_backend(kind: str, redis_url: str | None = None) -> StateBackend | None:
+    """
+    local (padrão): estado só no processo, sem backend; memory: substituto em
+    memória; redis: compartilhado. Se o Redis não responder na inicialização,
+    a API sobe com estado local em vez de falhar.
+    """
+    if kind not in STATE_BACKENDS:
+        raise ValueError(f"STATE_BACKEND inválido: {kind} (opções: {', '.join(STATE_BACKENDS)})")
+    if kind == "local":
+        return None
+    if kind == "memory":
+        return MemoryBackend()
+    try:
+        return RedisBackend(redis_url or "redis://localhost:6379/0")
+    except Exception as e:
+        logger.error("❌ Redis indisponível (%s); usando estado local neste worker", e)
+        return None
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class StatsPublisher:
+    """
+    Cada worker publica periodicamente um snapshot das suas estatísticas em
+    <prefix>:workers:<host:pid>, com TTL de três intervalos: workers que
+    saem somem sozinhos. O /stats de qualquer worker agrega os snapshots.
+    """
+
+    def __init__(self, backend: StateBackend, prefix: str, snapshot: Callable[[], dict],
+                 interval_s: float = 2.0):
+        self.backend = backend
+        self.prefix = f"{prefix}:workers:"
+        self.key = self.prefix + worker_id()
+        self.snapshot = snapshot
+        self.interval_s = interval_s
+        self._task: asyncio.Task | None = None
+
+    def peers(self) -> dict[str, dict]:
+        """Snapshots dos outros workers (o próprio é lido ao vivo por quem chama)."""
+        return {key[len(self.prefix):]: json.loads(value)
+                for key, value in self.backend.scan(self.prefix).items() if key != self.key}
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # snapshot no event loop (consistente), escrita no executor padrão
+                payload = json.dumps(self.snapshot(), ensure_ascii=False).encode("utf-8")
+                await loop.run_in_executor(None, self.backend.set, self.key, payload, self.interval_s * 3)
+            except Exception as e:
+                logger.warning("⚠️  Falha ao publicar estatísticas do worker: %s", e)
+            await asyncio.sleep(self.interval_s)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class ReloadBroadcast:
+    """
+    Leva o /admin/reload-index a todos os workers: quem recebe a chamada
+    recarrega o próprio índice e grava o pedido em <prefix>:index:reload;
+    os demais consultam a chave a cada interval_s e recarregam também.
+    Pedidos anteriores à inicialização do worker são ignorados: o índice
+    que ele acabou de carregar já é o atual.
+    """
+
+    def __init__(self, backend: StateBackend, prefix: str, reload: Callable[[bool], Awaitable],
+                 interval_s: float = 2.0):
+        self.backend = backend
+        self.key = f"{prefix}:index:reload"
+        self.reload = reload
+        self.interval_s = interval_s
+        self._seen: str | None = None
+        self._task: asyncio.Task | None = None
+
+    async def _read(self) -> dict | None:
+        raw = await asyncio.get_running_loop().run_in_executor(None, self.backend.get, self.key)
+        return json.loads(raw) if raw is not None else None
+
+    async def publish(self, force: bool = False):
+        request = {"id": uuid.uuid4().hex, "force": force, "worker": worker_id()}
+        self._seen = request["id"]
+        payload = json.dumps(request).encode("utf-8")
+        await asyncio.get_running_loop().run_in_executor(None, self.backend.set, self.key, payload, None)
+
+    async def _run(self):
+        try:
+            request = await self._read()
+            if self._seen is None and request is not None:
+                self._seen = request["id"]
+        except Exception as e:
+            logger.warning("⚠️  Falha ao ler pedidos de recarga do índice: %s", e)
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                request = await self._read()
+                if request is None or request["id"] == self._seen:
+                    continue
+                self._seen = request["id"]
+                logger.info("📣 Recarga do índice pedida pelo worker %s", request["worker"])
+                await self.reload(request["force"])
+            except Exception as e:
+                logger.error("❌ Falha ao processar pedido de recarga do índice: %s", e, exc_info=True)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,38 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Deduplicação de execuções simultâneas: enquanto uma chamada com a mesma
+    chave está em andamento, as seguintes aguardam o resultado dela em vez de
+    repetir o pipeline (ex.: vários usuários clicando no mesmo exemplo).
+    Exceções também são compartilhadas. Nada é guardado depois que a
+    execução termina — isso é papel do cache de respostas.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self.stats = {'executions': 0, 'coalesced': 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]) -> tuple[object, bool]:
+        """Retorna (resultado, compartilhado): compartilhado=True quando outra requisição executou."""
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if shared:
+            self.stats['coalesced'] += 1
+        else:
+            self.stats['executions'] += 1
+            task = asyncio.create_task(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield: se uma das requisições for cancelada, as demais continuam esperando
+        return await asyncio.shield(task), shared
+
+    def summary(self) -> dict:
+        total = self.stats['executions'] + self.stats['coalesced']
+        return {
+            **self.stats,
+            'in_flight': len(self._in_flight),
+            'coalesced_rate': round(self.stats['coalesced'] / total, 4) if total else 0.0
+        }
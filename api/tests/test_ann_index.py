@@ -0,0 +1,41 @@
+import faiss
+import numpy as np
+import pytest
+
+from ann_index import apply_search_params, create_trained_index, index_spec, supports_removal
+
+
+def test_flat_and_hnsw_specs():
+    assert index_spec("flat", 100, 384) == "Flat"
+    assert index_spec("hnsw", 100, 384, hnsw_m=16) == "HNSW16"
+
+
+def test_nlist_is_clamped_to_training_set():
+    assert index_spec("ivf_flat", 1000, 384, nlist=1024) == f"IVF{1000 // 39},Flat"
+    assert index_spec("ivf_flat", 100000, 384, nlist=64) == "IVF64,Flat"
+
+
+def test_pq_codebook_shrinks_then_falls_back_to_flat():
+    # 39 · 2**6 = 2496 vetores de treino: no máximo 6 bits por código
+    assert index_spec("ivf_pq", 3000, 384).endswith("x6")
+    assert index_spec("ivf_pq", 100, 384) == "Flat"
+
+
+def test_unknown_index_type():
+    with pytest.raises(ValueError):
+        index_spec("annoy", 100, 384)
+
+
+@pytest.mark.parametrize("spec,removable", [("Flat", True), ("IVF4,Flat", False), ("HNSW8", False)])
+def test_only_flat_supports_incremental_removal(spec, removable):
+    vectors = np.random.default_rng(0).standard_normal((400, 8)).astype(np.float32)
+    index = create_trained_index(spec, vectors)
+    assert supports_removal(index) is removable
+
+
+def test_search_params_apply_only_where_they_exist():
+    vectors = np.random.default_rng(0).standard_normal((400, 8)).astype(np.float32)
+    ivf = create_trained_index("IVF4,Flat", vectors)
+    assert apply_search_params(ivf, nprobe=2, ef_search=64) == {"nprobe": 2}
+    assert faiss.extract_index_ivf(ivf).nprobe == 2
+    assert apply_search_params(create_trained_index("Flat", vectors), nprobe=2) == {}
@@ -0,0 +1,125 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache, normalize_question
+from shared_state import MemoryBackend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    return now
+
+
+def get_exact(cache, question):
+    return asyncio.run(cache.get_exact(question))
+
+
+def answer(text):
+    return {"answer": text}
+
+
+def test_normalize_question_keeps_section_numbers():
+    assert normalize_question("  Qual é o item 6.2.5?  ") == "qual e o item 6.2.5"
+    assert normalize_question("Calibração.") == normalize_question("calibracao")
+
+
+def test_exact_hit_ignores_accents_and_case():
+    cache = AnswerCache(index_version="v1")
+    cache.put("Como calibrar equipamentos?", None, answer("a"))
+    assert get_exact(cache, "como calibrar EQUIPAMENTOS") == answer("a")
+    assert get_exact(cache, "outra pergunta") is None
+    assert cache.stats["exact_hits"] == 1
+
+
+def test_ttl_expiration(clock):
+    cache = AnswerCache(ttl_seconds=60, index_version="v1")
+    cache.put("q", np.ones(4), answer("a"))
+    clock[0] += 59
+    assert get_exact(cache, "q") == answer("a")
+    clock[0] += 2
+    assert get_exact(cache, "q") is None
+    assert cache.stats["expirations"] == 1
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_entries=2, index_version="v1")
+    cache.put("a", None, answer("a"))
+    cache.put("b", None, answer("b"))
+    get_exact(cache, "a")  # "b" passa a ser o menos usado
+    cache.put("c", None, answer("c"))
+    assert get_exact(cache, "b") is None
+    assert get_exact(cache, "a") == answer("a")
+    assert get_exact(cache, "c") == answer("c")
+    assert cache.stats["evictions"] == 1
+
+
+def test_semantic_hit_above_threshold():
+    cache = AnswerCache(similarity_threshold=0.95, index_version="v1")
+    cache.put("q", np.array([1.0, 0.0, 0.0]), answer("a"))
+    value, similarity = cache.get_semantic(np.array([0.99, 0.05, 0.0]))
+    assert value == answer("a") and similarity > 0.95
+    value, similarity = cache.get_semantic(np.array([0.0, 1.0, 0.0]))
+    assert value is None and similarity == pytest.approx(0.0)
+    assert cache.stats["semantic_hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_index_version_change_invalidates():
+    cache = AnswerCache(index_version="v1")
+    cache.put("q", np.ones(3), answer("a"))
+    cache.ensure_index_version("v1")
+    assert get_exact(cache, "q") == answer("a")
+    cache.ensure_index_version("v2")
+    assert get_exact(cache, "q") is None
+    assert cache.get_semantic(np.ones(3))[0] is None
+    assert cache.stats["invalidations"] == 1
+
+
+def test_put_from_swapped_out_index_is_dropped():
+    cache = AnswerCache(index_version="v1")
+    cache.invalidate("v2")  # índice trocado enquanto a resposta era gerada
+    assert cache.put("q", None, answer("old"), index_version="v1") is False
+    assert get_exact(cache, "q") is None
+    assert cache.stats["stale_writes"] == 1
+    assert cache.put("q", None, answer("new"), index_version="v2") is True
+    assert get_exact(cache, "q") == answer("new")
+
+
+def test_shared_backend_serves_other_workers():
+    backend = MemoryBackend()
+    writer = AnswerCache(index_version="v1", shared=backend)
+    reader = AnswerCache(index_version="v1", shared=backend)
+    other_version = AnswerCache(index_version="v2", shared=backend)
+    writer.put("q", np.array([1.0, 0.0]), answer("a"))  # fora do event loop: gravação direta
+
+    assert get_exact(other_version, "q") is None
+    assert asyncio.run(reader.get_exact_many(["Q", "missing"])) == [answer("a"), None]
+    assert reader.stats["shared_hits"] == 1
+    # A entrada trazida do backend também alimenta o nível semântico local
+    assert reader.get_semantic(np.array([1.0, 0.0]))[0] == answer("a")
+
+
+def test_shared_write_inside_event_loop():
+    backend = MemoryBackend()
+    cache = AnswerCache(index_version="v1", shared=backend, key_prefix="test")
+
+    async def scenario():
+        cache.put("q", None, answer("a"))
+        await asyncio.sleep(0.05)  # a gravação no backend não é aguardada pelo put
+
+    asyncio.run(scenario())
+    assert list(backend.scan("test:answers:v1:")) == ["test:answers:v1:q"]
+
+
+def test_exact_only_miss_counts_in_hit_rate():
+    cache = AnswerCache(index_version="v1")
+    cache.put("item 6.2.5", None, answer("a"))
+    assert get_exact(cache, "item 6.2.5") == answer("a")
+    assert get_exact(cache, "item 6.2.6") is None
+    cache.record_miss()  # citação de seção: sem busca semântica
+    assert cache.summary()["hit_rate"] == 0.5
@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+
+from canned_queries import DEFAULT_CANNED_QUERIES, CannedQueries, load_canned_queries
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_load_adds_file_questions_to_the_examples(tmp_path):
+    listing = tmp_path / "perguntas.txt"
+    listing.write_text("# comentário\nComo validar métodos?\n\nO que é rastreabilidade?\n", encoding="utf-8")
+    as_json = tmp_path / "perguntas.json"
+    as_json.write_text(json.dumps(["Como tratar reclamações?"]), encoding="utf-8")
+
+    assert load_canned_queries(None) == DEFAULT_CANNED_QUERIES
+    assert load_canned_queries(str(tmp_path / "ausente.txt")) == DEFAULT_CANNED_QUERIES
+    assert load_canned_queries(str(listing))[len(DEFAULT_CANNED_QUERIES):] == \
+        ["Como validar métodos?", "", "O que é rastreabilidade?"]
+    assert load_canned_queries(str(as_json))[-1] == "Como tratar reclamações?"
+
+
+def test_questions_are_deduplicated_and_encoded_in_one_batch():
+    embeddings = FakeEmbeddings()
+    canned = CannedQueries(["Como calibrar?", "  como CALIBRAR ", "", "Onde ficam os registros?"])
+    assert canned.encode(embeddings) == 2
+    assert embeddings.batches == [["Como calibrar?", "Onde ficam os registros?"]]
+    assert "COMO calibrar" in canned and "Outra pergunta" not in canned
+    np.testing.assert_array_equal(canned.vector("como calibrar"), [14.0, 1.0])
+    assert canned.vector("Outra pergunta") is None
+
+
+def test_rankings_are_kept_per_index_version():
+    canned = CannedQueries(["Como calibrar?"], depth=50)
+    canned.store_ranking("como calibrar", "v1", [("doc1", {"score": 1.0})])
+    assert canned.ranking("Como calibrar?", "v1") == [("doc1", {"score": 1.0})]
+    assert canned.ranking("Como calibrar?", "v2") is None
+    assert canned.summary() == {"queries": 0, "depth": 50, "rankings": 1}
@@ -0,0 +1,60 @@
+from langchain_core.documents import Document
+
+from context_builder import BYTES_PER_TOKEN, ContextBuilder, TokenCounter
+
+
+class WordCounter:
+    """Um token por palavra: orçamentos fáceis de calcular nos testes."""
+
+    def count(self, text):
+        return len(text.split())
+
+    def truncate(self, text, max_tokens):
+        return " ".join(text.split()[:max_tokens])
+
+
+def doc(section, text):
+    return Document(page_content=text, metadata={"section": section})
+
+
+def test_sections_become_headers_in_rank_order():
+    pack = ContextBuilder(WordCounter(), max_tokens=100).build([
+        doc("6.4.1", "O laboratório deve ter acesso a equipamentos."),
+        doc("7.2.1", "O laboratório deve usar métodos apropriados."),
+    ])
+    assert pack.text.startswith("[Seção 6.4.1]\nO laboratório deve ter acesso")
+    assert "\n\n[Seção 7.2.1]\n" in pack.text
+    assert [d.metadata["section"] for d in pack.documents] == ["6.4.1", "7.2.1"]
+    assert pack.tokens == WordCounter().count(pack.text) and not pack.truncated
+
+
+def test_repeated_sentences_are_removed():
+    shared = "Os registros devem ser mantidos."
+    pack = ContextBuilder(WordCounter(), max_tokens=100).build([
+        doc("7.5.1", f"{shared} O relatório deve ser claro."),
+        doc("8.4.1", "  os REGISTROS devem ser mantidos. A retenção deve ser definida."),
+        doc("8.4.2", shared),
+    ])
+    assert pack.text.lower().count("registros devem ser mantidos") == 1
+    assert "A retenção deve ser definida." in pack.text
+    assert len(pack.documents) == 2 and pack.dropped == 1
+
+
+def test_documents_over_budget_are_dropped():
+    docs = [doc(f"6.{i}", " ".join(["palavra"] * 8) + f" fim{i}.") for i in range(4)]
+    pack = ContextBuilder(WordCounter(), max_tokens=25).build(docs)
+    assert len(pack.documents) == 2 and pack.dropped == 2
+    assert pack.tokens <= 25
+
+
+def test_first_document_is_truncated_when_it_does_not_fit():
+    pack = ContextBuilder(WordCounter(), max_tokens=5).build([doc("4.1", " ".join(["termo"] * 20) + ".")])
+    assert pack.truncated and pack.tokens == 5
+    assert len(pack.documents) == 1
+
+
+def test_byte_estimate_without_tiktoken():
+    counter = TokenCounter(encoding_name="codificacao-inexistente")
+    assert counter.backend == "estimate"
+    assert counter.count("a" * 10) == -(-10 // BYTES_PER_TOKEN)
+    assert counter.truncate("ação " * 10, 2).encode("utf-8") == ("ação " * 10).encode("utf-8")[:2 * BYTES_PER_TOKEN]
@@ -0,0 +1,141 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+
+import create_vector_store as cvs
+from embedding_service import load_embedding_cache, text_hash
+from index_store import CompactStore
+
+DIM = 8
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / "index")
+    os.makedirs(path)  # criado pelo cache de embeddings antes de build_index
+    monkeypatch.setattr(cvs, "FAISS_PATH", path)
+    monkeypatch.setattr(cvs, "INDEX_TYPE", "flat")
+    monkeypatch.setattr(cvs, "FULL_REBUILD", False)
+    return path
+
+
+def corpus(names):
+    documents = {}
+    for name in names:
+        text = f"{name}. O laboratório deve manter registros de {name}."
+        metadata = {"standard": "ISO/IEC 17025:2017", "section": name, "title": name}
+        key = text_hash(text + json.dumps(metadata, sort_keys=True, ensure_ascii=False))
+        documents[key] = cvs.Requirement(text, metadata, text_hash(text))
+    return documents
+
+
+def embed(documents):
+    """Vetor determinístico por texto: o mesmo requisito tem o mesmo vetor em qualquer build."""
+    hashes = [doc.text_hash for doc in documents.values()]
+    vectors = np.stack([
+        np.random.default_rng(int(h[:8], 16)).standard_normal(DIM).astype(np.float32) for h in hashes
+    ])
+    return vectors, {h: i for i, h in enumerate(hashes)}
+
+
+def build(documents):
+    vectors, rows = embed(documents)
+    cvs.build_index(documents, vectors, rows)
+    return vectors, rows
+
+
+def assert_consistent(path, documents):
+    """Cada posição do FAISS e do formato compacto aponta para o documento certo."""
+    vectors, rows = embed(documents)
+    store = CompactStore(path)
+    assert store.ntotal == len(documents)
+    faiss_index = FAISS.load_local(path, cvs.LazyEmbeddings(), allow_dangerous_deserialization=True)
+    assert sorted(faiss_index.index_to_docstore_id.values()) == sorted(documents)
+    for doc_id, doc in documents.items():
+        vector = vectors[rows[doc.text_hash]][None, :]
+        _, positions = faiss_index.index.search(vector, 1)
+        assert faiss_index.index_to_docstore_id[int(positions[0][0])] == doc_id
+        position = store.position(doc_id)
+        assert store.document(position).page_content == doc.text
+        if store.index_type == "Flat":
+            _, compact_positions = store.search(vector, 1)
+            assert store.doc_id(int(compact_positions[0][0])) == doc_id
+
+
+def test_incremental_update_adds_and_removes(index_dir, capsys):
+    build(corpus([f"6.{i}" for i in range(10)]))
+    updated = corpus([f"6.{i}" for i in range(3, 14)])
+    build(updated)
+
+    assert "+4 / -3" in capsys.readouterr().out
+    assert_consistent(index_dir, updated)
+    with open(os.path.join(index_dir, cvs.MANIFEST_FILE), encoding="utf-8") as f:
+        assert json.load(f)["ids"] == list(updated)
+
+
+def test_unchanged_corpus_keeps_index(index_dir, capsys):
+    documents = corpus([f"7.{i}" for i in range(5)])
+    build(documents)
+    mtime = os.stat(os.path.join(index_dir, "index.faiss")).st_mtime_ns
+    build(documents)
+
+    assert "já está atualizada" in capsys.readouterr().out
+    assert os.stat(os.path.join(index_dir, "index.faiss")).st_mtime_ns == mtime
+
+
+def test_metadata_change_replaces_document(index_dir):
+    documents = corpus(["8.1", "8.2"])
+    build(documents)
+    key, doc = next(iter(documents.items()))
+    metadata = {**doc.metadata, "standard": "ISO 15189:2022"}
+    changed = {k: v for k, v in documents.items() if k != key}
+    changed[text_hash(doc.text + json.dumps(metadata, sort_keys=True, ensure_ascii=False))] = \
+        cvs.Requirement(doc.text, metadata, doc.text_hash)
+    build(changed)
+
+    assert_consistent(index_dir, changed)
+    store = CompactStore(index_dir)
+    assert store.position(key) is None
+
+
+def test_embedding_cache_keeps_only_live_hashes(index_dir, monkeypatch):
+    monkeypatch.setattr(cvs, "EMBEDDING_CACHE_DIR", os.path.join(index_dir, "embedding_cache"))
+    old = np.arange(6, dtype=np.float32).reshape(3, 2)
+    new = np.full((1, 2), 9, dtype=np.float32)
+    cvs.write_embedding_cache(["a", "b", "c"], None, {}, old, {"a": 0, "b": 1, "c": 2})
+    hashes, cached = load_embedding_cache(cvs.cache_path())
+    cvs.write_embedding_cache(["c", "d"], cached, {h: i for i, h in enumerate(hashes)}, new, {"d": 0})
+
+    hashes, vectors = load_embedding_cache(cvs.cache_path())
+    assert hashes == ["c", "d"]
+    assert np.array_equal(vectors, [[4, 5], [9, 9]])
+
+
+def test_memmap_buffer_is_removed(monkeypatch):
+    monkeypatch.setattr(cvs, "MEMMAP_THRESHOLD", 1)
+    monkeypatch.setattr(cvs, "_encode_batch",
+                        lambda start, texts: (start, np.ones((len(texts), DIM), dtype=np.float32)))
+    buffer = cvs.encode_texts(["a", "b", "c"])
+    directory = os.path.dirname(buffer.filename)
+    assert os.path.exists(directory) and buffer.shape == (3, DIM)
+
+    cvs.release_buffer(buffer)
+    assert not os.path.exists(directory)
+
+
+def test_ivf_removal_rebuilds_instead_of_reusing_labels(index_dir, monkeypatch, capsys):
+    monkeypatch.setattr(cvs, "INDEX_TYPE", "ivf_flat")
+    build(corpus([f"5.{i}" for i in range(100)]))
+    updated = corpus([f"5.{i}" for i in range(10, 120)])
+    build(updated)
+
+    assert "reconstruindo o índice" in capsys.readouterr().out
+    assert_consistent(index_dir, updated)
+    # Depois da reconstrução, novas inserções continuam incrementais
+    grown = corpus([f"5.{i}" for i in range(10, 125)])
+    build(grown)
+    assert "+5 / -0" in capsys.readouterr().out
+    assert_consistent(index_dir, grown)
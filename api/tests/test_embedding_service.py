@@ -0,0 +1,78 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from embedding_service import QueryEmbeddingBatcher
+
+
+class FakeEmbeddings:
+    """Embedding de uma dimensão (tamanho do texto); registra o tamanho de cada lote."""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def encode(self, texts):
+        self.batches.append(len(texts))
+        if self.fail:
+            raise RuntimeError("modelo indisponível")
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+
+def run_batcher(embeddings, texts, **kwargs):
+    async def scenario():
+        with ThreadPoolExecutor(1) as executor:
+            batcher = QueryEmbeddingBatcher(embeddings, executor, **kwargs)
+            await batcher.start()
+            try:
+                return await asyncio.gather(*(batcher.embed(text) for text in texts), return_exceptions=True), batcher
+            finally:
+                await batcher.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_questions_share_one_forward_pass():
+    embeddings = FakeEmbeddings()
+    texts = ["a", "bb", "ccc", "dddd"]
+    vectors, batcher = run_batcher(embeddings, texts, max_batch_size=32, max_wait_ms=20)
+    # Cada chamador recebe o vetor da própria pergunta
+    assert [float(vector[0]) for vector in vectors] == [1.0, 2.0, 3.0, 4.0]
+    assert embeddings.batches == [4]
+    assert batcher.stats == {"batches": 1, "texts": 4, "max_batch_seen": 4}
+
+
+def test_batches_are_capped_at_max_batch_size():
+    embeddings = FakeEmbeddings()
+    vectors, batcher = run_batcher(embeddings, ["x"] * 5, max_batch_size=2, max_wait_ms=20)
+    assert len(vectors) == 5
+    assert embeddings.batches == [2, 2, 1]
+    assert batcher.stats["max_batch_seen"] == 2
+
+
+def test_encode_error_reaches_every_caller_and_batcher_keeps_running():
+    embeddings = FakeEmbeddings(fail=True)
+    results, batcher = run_batcher(embeddings, ["a", "b"], max_wait_ms=20)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert batcher.stats["batches"] == 0
+
+
+def test_cancelled_caller_is_skipped():
+    embeddings = FakeEmbeddings()
+
+    async def scenario():
+        with ThreadPoolExecutor(1) as executor:
+            batcher = QueryEmbeddingBatcher(embeddings, executor, max_wait_ms=30)
+            await batcher.start()
+            gone = asyncio.create_task(batcher.embed("desistiu"))
+            kept = asyncio.create_task(batcher.embed("ok"))
+            await asyncio.sleep(0.005)
+            gone.cancel()
+            vector = await kept
+            await batcher.stop()
+            return vector
+
+    assert float(asyncio.run(scenario())[0]) == pytest.approx(2.0)
+    assert embeddings.batches == [1]
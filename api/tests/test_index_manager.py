@@ -0,0 +1,91 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from index_manager import LoadedIndex, SearchFilter, index_fingerprint
+from index_store import CompactStore, compact_path, write_compact_index
+from lexical_index import LexicalIndex
+
+SECTIONS = ["6.4", "6.4.1", "6.40", "7.1", "6.4.13"]
+STANDARDS = ["ISO/IEC 17025:2017", "ISO 15189:2022"]
+
+
+@pytest.fixture
+def loaded(tmp_path):
+    ids = [f"doc{i:02d}" for i in range(20)]
+    metadatas = [{"section": SECTIONS[i % len(SECTIONS)], "standard": STANDARDS[i % 2]} for i in range(20)]
+    vectors = np.random.default_rng(0).normal(size=(20, 4)).astype(np.float32)
+    write_compact_index(str(tmp_path), ids, ((f"texto {i}", m) for i, m in enumerate(metadatas)),
+                        vectors=iter([vectors]), dim=4)
+    lexical = LexicalIndex.build({doc_id: f"texto {i}" for i, doc_id in enumerate(ids)})
+    return LoadedIndex(store=CompactStore(str(tmp_path)), version="v1", lexical=lexical), metadatas
+
+
+def expected_ids(metadatas, search_filter):
+    return {f"doc{i:02d}" for i, metadata in enumerate(metadatas) if search_filter.matches(metadata)}
+
+
+@pytest.mark.parametrize("search_filter", [
+    SearchFilter(section_prefix="6.4"),
+    SearchFilter(section_prefix="6.4."),
+    SearchFilter(standard="iso 15189:2022"),
+    SearchFilter(section_prefix="6.4.1", standard="ISO/IEC 17025:2017"),
+    SearchFilter(section_prefix="8"),
+])
+def test_subset_from_columns_matches_metadata_filter(loaded, search_filter):
+    index, metadatas = loaded
+    subset = index.subset(search_filter)
+
+    assert subset.ids == expected_ids(metadatas, search_filter)
+    assert subset.lexical_positions == {index.lexical.positions[doc_id] for doc_id in subset.ids}
+    distances, positions = index.store.search(np.zeros((1, 4), dtype=np.float32), 20, subset.allowed)
+    assert {index.store.doc_id(int(p)) for p in positions[0] if p != -1} == subset.ids
+
+
+def test_section_prefix_does_not_match_sibling_numbers(loaded):
+    index, _ = loaded
+    sections = {index.store.document(index.store.position(doc_id)).metadata["section"]
+                for doc_id in index.subset(SearchFilter(section_prefix="6.4")).ids}
+    assert sections == {"6.4", "6.4.1", "6.4.13"}
+
+
+def test_subsets_are_cached_per_filter(loaded):
+    index, _ = loaded
+    search_filter = SearchFilter(section_prefix="7")
+    assert index.cached_subset(search_filter) is None
+    subset = index.subset(search_filter)
+    assert index.cached_subset(search_filter) is subset
+
+
+def test_index_without_columns_falls_back_to_records(loaded):
+    index, metadatas = loaded
+    manifest_path = os.path.join(index.store.directory, "manifest.json")
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    del manifest["columns"]
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    legacy = LoadedIndex(store=CompactStore(os.path.dirname(index.store.directory)), version="v0")
+    search_filter = SearchFilter(section_prefix="6.4", standard="ISO 15189:2022")
+    assert legacy.subset(search_filter).ids == expected_ids(metadatas, search_filter)
+
+
+def write_index(path, ids, signature):
+    write_compact_index(str(path), ids, ((f"texto {doc_id}", {"section": "6.1"}) for doc_id in ids),
+                        vectors=iter([np.ones((len(ids), 4), dtype=np.float32)]), dim=4, signature=signature)
+
+
+def test_fingerprint_depends_on_content_not_on_host(tmp_path):
+    signature = {"model": "all-MiniLM-L6-v2", "index_spec": "Flat"}
+    write_index(tmp_path / "a", ["doc1", "doc2"], signature)
+    write_index(tmp_path / "b", ["doc1", "doc2"], signature)
+    os.utime(os.path.join(compact_path(str(tmp_path / "b")), "manifest.json"), (0, 0))
+    assert index_fingerprint(str(tmp_path / "a")) == index_fingerprint(str(tmp_path / "b"))
+
+    write_index(tmp_path / "c", ["doc1", "doc3"], signature)
+    write_index(tmp_path / "d", ["doc1", "doc2"], {**signature, "index_spec": "HNSW32"})
+    versions = {index_fingerprint(str(tmp_path / name)) for name in "acd"}
+    assert len(versions) == 3
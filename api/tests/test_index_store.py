@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import index_store
+from index_store import CompactStore, write_compact_index
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8)).astype(np.float32)
+    ids = [f"doc{i:02d}" for i in range(len(vectors))]
+    records = ((f"texto {i}", {"section": f"{i % 5}.1"}) for i in range(len(vectors)))
+    write_compact_index(str(tmp_path), ids, records, vectors=iter([vectors[:20], vectors[20:]]), dim=8)
+    return CompactStore(str(tmp_path)), vectors
+
+
+def brute_force(vectors, queries, k, positions=None):
+    positions = np.arange(len(vectors)) if positions is None else np.asarray(positions)
+    distances = ((queries[:, None, :] - vectors[positions][None, :, :]) ** 2).sum(axis=2)
+    order = np.argsort(distances, axis=1)[:, :k]
+    return np.take_along_axis(distances, order, axis=1), positions[order]
+
+
+@pytest.mark.parametrize("block_rows", [7, 65536])
+def test_exact_search_matches_brute_force(store, monkeypatch, block_rows):
+    compact, vectors = store
+    monkeypatch.setattr(index_store, "SEARCH_BLOCK_ROWS", block_rows)
+    queries = np.random.default_rng(1).normal(size=(3, 8)).astype(np.float32)
+    distances, positions = compact.search(queries, 5)
+    expected_d, expected_i = brute_force(vectors, queries, 5)
+    np.testing.assert_array_equal(positions, expected_i)
+    np.testing.assert_allclose(distances, expected_d, rtol=1e-4, atol=1e-4)
+
+
+def test_exact_search_with_allowed_positions(store, monkeypatch):
+    compact, vectors = store
+    monkeypatch.setattr(index_store, "SEARCH_BLOCK_ROWS", 4)
+    allowed = compact.prepare_filter(np.array([40, 3, 17, 8, 25, 33]))
+    queries = vectors[[17]]
+    distances, positions = compact.search(queries, 3, allowed)
+    expected_d, expected_i = brute_force(vectors, queries, 3, allowed)
+    np.testing.assert_array_equal(positions, expected_i)
+    assert positions[0, 0] == 17 and distances[0, 0] == pytest.approx(0, abs=1e-4)
+
+
+def test_exact_search_pads_like_faiss(store):
+    compact, vectors = store
+    allowed = compact.prepare_filter(np.array([1, 2]))
+    distances, positions = compact.search(vectors[:1], 4, allowed)
+    assert positions[0, 2:].tolist() == [-1, -1]
+    assert np.isinf(distances[0, 2:]).all()
+
+
+def test_records_and_id_lookup(store):
+    compact, _ = store
+    assert compact.ntotal == 50
+    assert compact.doc_id(7) == "doc07"
+    assert compact.position("doc42") == 42
+    assert compact.position("missing") is None
+    document = compact.document(3)
+    assert document.page_content == "texto 3" and document.metadata == {"section": "3.1"}
+    assert compact.facets["sections"] == {str(i): 10 for i in range(5)}
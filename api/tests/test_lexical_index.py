@@ -0,0 +1,61 @@
+from lexical_index import LexicalIndex, clause_numbers, reciprocal_rank_fusion, reciprocal_rank_scores
+
+DOCUMENTS = {
+    "d1": "6.2.5 O laboratório deve ter procedimento para calibração de equipamentos.",
+    "d2": "7.5 Registros técnicos devem ser retidos pelo período definido.",
+    "d3": "6.4 Equipamentos devem ser calibrados quando a exatidão afetar a validade dos resultados.",
+    "d4": "7.4 Manuseio de itens de ensaio ou calibração, incluindo transporte e armazenamento.",
+}
+
+
+def build():
+    return LexicalIndex.build(DOCUMENTS)
+
+
+def test_bm25_ranks_matching_documents():
+    index = build()
+    ranked = [doc_id for doc_id, _ in index.search("registros técnicos retidos", k=3)]
+    assert ranked[0] == "d2"
+    scores = [score for _, score in index.search("equipamentos calibração", k=4)]
+    assert scores == sorted(scores, reverse=True)
+    assert index.search("palavra inexistente", k=3) == []
+
+
+def test_search_is_accent_insensitive_and_respects_k():
+    index = build()
+    assert index.search("calibracao", k=4) == index.search("CALIBRAÇÃO", k=4)
+    assert len(index.search("calibração", k=4)) == 2
+    assert len(index.search("calibração", k=1)) == 1
+
+
+def test_allowed_positions_restrict_results():
+    index = build()
+    allowed = {index.positions["d3"]}
+    assert [doc_id for doc_id, _ in index.search("equipamentos", k=4, allowed=allowed)] == ["d3"]
+
+
+def test_lookup_clauses():
+    index = build()
+    assert clause_numbers("Conforme o item 6.2.5 e a seção 7.5") == ["6.2.5", "7.5"]
+    assert index.lookup_clauses("O que diz o item 6.2.5?") == ["d1"]
+    assert index.lookup_clauses("itens 7.5 e 6.4") == ["d2", "d3"]
+    assert index.lookup_clauses("sem seção") == []
+
+
+def test_save_and_load(tmp_path):
+    index = build()
+    path = tmp_path / "lexical.json"
+    index.save(str(path))
+    loaded = LexicalIndex.load(str(path))
+    assert loaded.search("calibração", k=4) == index.search("calibração", k=4)
+    assert loaded.lookup_clauses("6.4") == index.lookup_clauses("6.4")
+
+
+def test_reciprocal_rank_fusion():
+    dense = ["a", "b", "c"]
+    lexical = ["c", "a", "d"]
+    scores = reciprocal_rank_scores([dense, lexical], k=60)
+    assert scores["a"] == 1 / 61 + 1 / 62
+    assert scores["d"] == 1 / 63
+    assert reciprocal_rank_fusion([dense, lexical], k=60) == ["a", "c", "b", "d"]
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,164 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import llm_gateway
+from llm_gateway import LLMGateway, LLMOverloaded, LLMRateLimited, TokenBucket, estimate_tokens
+
+
+class FakeStream:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """Imita client.chat.completions.create: cada chamada consome um item de outcomes (exceção ou resposta)."""
+
+    def __init__(self, outcomes=None, delay_s=0.0):
+        self.outcomes = list(outcomes or [])
+        self.delay_s = delay_s
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **params):
+        self.calls += 1
+        await asyncio.sleep(self.delay_s)
+        outcome = self.outcomes.pop(0) if self.outcomes else SimpleNamespace(usage=None)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeStream() if params.get("stream") else outcome
+
+
+def rate_limit_error():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after-ms": "1"})
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_token_bucket_waits_for_refill(monkeypatch):
+    now = [0.0]
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        now[0] += delay
+
+    monkeypatch.setattr(llm_gateway.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(llm_gateway.asyncio, "sleep", fake_sleep)
+
+    async def scenario():
+        bucket = TokenBucket(rate_per_minute=60)  # 1 ficha por segundo
+        assert await bucket.acquire(60) == 0.0
+        return await bucket.acquire(2)
+
+    assert asyncio.run(scenario()) == pytest.approx(2.0)
+    assert sleeps == [pytest.approx(2.0)]
+
+
+def test_token_bucket_adjust_can_go_negative():
+    bucket = TokenBucket(rate_per_minute=600)
+    bucket.adjust(1000)
+    assert bucket.tokens < 0
+    bucket.adjust(-10_000)
+    assert bucket.tokens == bucket.capacity
+
+
+def test_estimate_tokens():
+    params = {"messages": [{"content": "a" * 400}, {"content": None}], "max_tokens": 100}
+    assert estimate_tokens(params) == 200
+
+
+def test_sheds_when_queue_is_full():
+    async def scenario():
+        gateway = LLMGateway(FakeClient(delay_s=0.05), max_concurrency=1, max_queue=0)
+        first = asyncio.create_task(gateway.complete(messages=[]))
+        await asyncio.sleep(0.01)
+        assert gateway.saturated()
+        with pytest.raises(LLMOverloaded) as excinfo:
+            await gateway.complete(messages=[])
+        await first
+        return gateway, excinfo.value
+
+    gateway, error = asyncio.run(scenario())
+    assert gateway.stats["shed"] == 1
+    assert error.retry_after >= 1
+    assert gateway.active == 0 and not gateway.saturated()
+
+
+def test_sheds_after_queue_timeout():
+    async def scenario():
+        gateway = LLMGateway(FakeClient(delay_s=0.2), max_concurrency=1, max_queue=4, queue_timeout_s=0.02)
+        first = asyncio.create_task(gateway.complete(messages=[]))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LLMOverloaded):
+            await gateway.complete(messages=[])
+        assert gateway.waiting == 0
+        await first
+        return gateway
+
+    gateway = asyncio.run(scenario())
+    assert gateway.stats["shed"] == 1 and gateway.stats["calls"] == 1
+    assert not gateway._slots.locked()  # a vaga do descartado não ficou presa
+
+
+def test_acquire_won_at_timeout_returns_the_slot():
+    async def scenario():
+        gateway = LLMGateway(FakeClient(), max_concurrency=1)
+        acquire = asyncio.ensure_future(gateway._slots.acquire())
+        await asyncio.sleep(0)  # o acquire vence antes de o chamador desistir
+        assert acquire.done() and gateway._slots.locked()
+        gateway._abandon(acquire)
+        await asyncio.sleep(0)
+        return gateway
+
+    assert not asyncio.run(scenario())._slots.locked()
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def scenario():
+        gateway = LLMGateway(FakeClient(delay_s=0.05), max_concurrency=1, queue_timeout_s=5)
+        first = asyncio.create_task(gateway.complete(messages=[]))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(gateway.complete(messages=[]))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await first
+        await asyncio.sleep(0)
+        return gateway, waiter
+
+    gateway, waiter = asyncio.run(scenario())
+    assert waiter.cancelled()
+    assert gateway.waiting == 0 and not gateway._slots.locked()
+
+
+def test_retries_rate_limit_then_gives_up():
+    client = FakeClient([rate_limit_error(), SimpleNamespace(usage=None)])
+    gateway = LLMGateway(client, max_retries=2, backoff_base_s=0)
+    asyncio.run(gateway.complete(messages=[]))
+    assert client.calls == 2 and gateway.stats["retries"] == 1
+
+    client = FakeClient([rate_limit_error() for _ in range(3)])
+    gateway = LLMGateway(client, max_retries=2, backoff_base_s=0)
+    with pytest.raises(LLMRateLimited):
+        asyncio.run(gateway.complete(messages=[]))
+    assert client.calls == 3 and gateway.stats["rate_limited"] == 1
+
+
+def test_stream_closes_upstream_and_releases_slot():
+    async def scenario():
+        gateway = LLMGateway(FakeClient(), max_concurrency=1)
+        with pytest.raises(RuntimeError):
+            async with gateway.stream(messages=[]) as (stream, usage):
+                assert gateway.active == 1
+                raise RuntimeError("cliente desconectou")
+        return gateway, stream
+
+    gateway, stream = asyncio.run(scenario())
+    assert stream.closed
+    assert gateway.active == 0
@@ -0,0 +1,254 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+# main.py lê a configuração na importação: sem chave real e sem arquivo de log
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ["LOG_FILE"] = ""
+
+import main  # noqa: E402
+from canned_queries import CannedQueries  # noqa: E402
+from context_builder import ContextBuilder, TokenCounter  # noqa: E402
+from index_manager import LoadedIndex  # noqa: E402
+from index_store import CompactStore, write_compact_index  # noqa: E402
+from lexical_index import LexicalIndex  # noqa: E402
+from reranker import RerankResult  # noqa: E402
+
+DIM = 8
+SECTIONS = ["6.2.1", "6.2.5", "6.4.1", "6.4.13", "7.1.1", "7.4.1", "7.7.1", "8.4.2"]
+
+
+def vector(text: str) -> np.ndarray:
+    seed = int(hashlib.sha1(text.encode()).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+class FakeEmbedder:
+    async def embed(self, text):
+        return vector(text)
+
+
+class FakeGateway:
+    """Registra as mensagens recebidas e responde com um texto fixo."""
+
+    def __init__(self):
+        self.calls = []
+
+    def saturated(self):
+        return False
+
+    async def complete(self, messages, **params):
+        self.calls.append(messages)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=" Resposta técnica. "))],
+                               usage=None)
+
+    @asynccontextmanager
+    async def stream(self, messages, **params):
+        self.calls.append(messages)
+
+        async def chunks():
+            for content in ("Resposta ", "técnica."):
+                yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+        yield chunks(), []
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def ready(tmp_path, monkeypatch):
+    """API 'pronta' sobre um índice compacto pequeno, com modelo e LLM falsos."""
+    ids = [f"doc-{section}" for section in SECTIONS]
+    texts = {doc_id: f"{section} O laboratório deve manter registros de calibração ({section})."
+             for doc_id, section in zip(ids, SECTIONS)}
+    write_compact_index(str(tmp_path), ids,
+                        ((texts[doc_id], {"section": section, "standard": "ISO/IEC 17025:2017"})
+                         for doc_id, section in zip(ids, SECTIONS)),
+                        vectors=iter([np.stack([vector(texts[doc_id]) for doc_id in ids])]), dim=DIM)
+    lexical = LexicalIndex.build(texts, sections=dict(zip(ids, SECTIONS)))
+    gateway = FakeGateway()
+    monkeypatch.setitem(main.startup_state, "status", "ready")
+    monkeypatch.setattr(main.index_manager, "current",
+                        LoadedIndex(store=CompactStore(str(tmp_path)), version="test", lexical=lexical))
+    monkeypatch.setattr(main, "query_embedder", FakeEmbedder())
+    monkeypatch.setattr(main, "context_builder", ContextBuilder(TokenCounter(), max_tokens=2000))
+    monkeypatch.setattr(main, "llm_gateway", gateway)
+    monkeypatch.setattr(main, "ANSWER_CACHE_ENABLED", False)
+    return gateway
+
+
+def test_live_and_ready_while_starting(client):
+    assert client.get("/live").json() == {"status": "alive"}
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+
+
+def test_queries_are_rejected_until_ready(client):
+    response = client.post("/ask", json={"question": "Como calibrar equipamentos?"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_admin_endpoints_disabled_without_token(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+    assert client.post("/admin/reload-index").status_code == 403
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "segredo")
+    assert client.post("/admin/reload-index", headers={"X-Admin-Token": "errado"}).status_code == 403
+
+
+def test_ask_answers_from_retrieved_context(client, ready):
+    body = client.post("/ask", json={"question": "Como registrar a calibração?"}).json()
+
+    assert body["answer"] == "Resposta técnica."
+    assert body["documents_retrieved"] == main.K_DOCUMENTS
+    assert len(ready.calls) == 1
+    prompt = ready.calls[0][-1]["content"]
+    assert all(text[:200] in prompt for text in body["context_used"])
+
+
+def test_cited_section_is_pinned_first(client, ready):
+    body = client.post("/ask", json={"question": "O que exige o item 7.4.1?"}).json()
+    assert body["context_used"][0].startswith("7.4.1")
+
+
+def test_filter_without_documents_skips_the_llm(client, ready):
+    body = client.post("/ask", json={"question": "Como registrar a calibração?",
+                                     "filters": {"section_prefix": "9"}}).json()
+    assert body["answer"] == main.NO_CONTEXT_ANSWER
+    assert body["documents_retrieved"] == 0
+    assert ready.calls == []
+
+
+def test_stream_sends_context_tokens_and_done(client, ready):
+    with client.stream("POST", "/ask/stream", json={"question": "Como registrar a calibração?",
+                                                    "filters": {"section_prefix": "6.4"}}) as response:
+        events = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert [event["event"] for event in events] == ["context", "token", "token", "done"]
+    assert sorted(events[0]["document_refs"]) == ["6.4.1", "6.4.13"]
+    assert "".join(event["content"] for event in events[1:3]) == "Resposta técnica."
+
+
+def test_search_pages_do_not_overlap(client, ready):
+    first = client.post("/search", json={"query": "registros de calibração", "k": 3}).json()
+    second = client.post("/search", json={"query": "registros de calibração", "k": 3, "offset": 3}).json()
+
+    assert [r["rank"] for r in first["results"]] == [1, 2, 3]
+    assert first["next_offset"] == 3
+    assert not {r["id"] for r in first["results"]} & {r["id"] for r in second["results"]}
+    assert client.post("/search", json={"query": "x", "k": 0}).status_code == 400
+
+
+def test_no_documents_answers_without_calling_the_llm(monkeypatch):
+    gateway = FakeGateway()
+    monkeypatch.setattr(main, "llm_gateway", gateway)
+    answer, generation_time, pack = asyncio.run(main.generate_answer([], "O que diz a seção 9.9?", "/ask"))
+
+    assert answer == main.NO_CONTEXT_ANSWER
+    assert generation_time == 0
+    assert pack.documents == [] and pack.tokens == 0
+    assert gateway.calls == []
+
+
+def test_rerank_skips_empty_candidates(monkeypatch):
+    monkeypatch.setattr(main, "reranker", object())
+    assert asyncio.run(main.rerank_documents("Como calibrar equipamentos?", [])) == ([], {})
+
+
+class SlowReranker:
+    """Cross-encoder que só termina quando o teste libera; conta as chamadas."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def rerank(self, question, docs, top_n, min_score, max_gap):
+        self.calls += 1
+        self.release.wait(5)
+        return RerankResult(list(reversed(docs)), [1.0] * len(docs), len(docs))
+
+
+@pytest.fixture
+def slow_reranker(monkeypatch):
+    reranker = SlowReranker()
+    executor = ThreadPoolExecutor(1)
+    monkeypatch.setattr(main, "reranker", reranker)
+    monkeypatch.setattr(main, "rerank_executor", executor)
+    monkeypatch.setattr(main, "rerank_in_flight", 0)
+    monkeypatch.setattr(main, "RERANK_BUDGET_MS", 20)
+    monkeypatch.setattr(main, "RERANK_MAX_IN_FLIGHT", 1)
+    monkeypatch.setattr(main, "cited_clause_ids", lambda question: [])
+    yield reranker
+    reranker.release.set()
+    executor.shutdown(wait=True)
+
+
+def test_rerank_over_budget_keeps_search_order_and_its_slot(slow_reranker):
+    docs = [Document(page_content=f"trecho {i}") for i in range(3)]
+
+    async def scenario():
+        first = await main.rerank_documents("Como calibrar?", docs)
+        # O cross-encoder ainda roda: a próxima pergunta nem tenta reranquear
+        second = await main.rerank_documents("Como calibrar?", docs)
+        in_flight = main.rerank_in_flight
+        slow_reranker.release.set()
+        while main.rerank_in_flight:
+            await asyncio.sleep(0.01)
+        third = await main.rerank_documents("Como calibrar?", docs)
+        return first, second, in_flight, third
+
+    first, second, in_flight, third = asyncio.run(scenario())
+    assert first[0] == docs and first[1]["rerank"] == "budget_exceeded"
+    assert second == (docs, {"rerank": "saturated"})
+    assert in_flight == 1 and slow_reranker.calls == 2
+    assert third[0] == list(reversed(docs))
+
+
+def test_lifespan_starts_and_stops_background_services(monkeypatch):
+    events = []
+
+    async def warm_start():
+        events.append("warm_start")
+
+    async def stop_watcher():
+        events.append("stop_watcher")
+
+    monkeypatch.setattr(main, "warm_start", warm_start)
+    monkeypatch.setattr(main.index_manager, "stop_watcher", stop_watcher)
+    monkeypatch.setattr(main, "retrieval_executor", SimpleNamespace(shutdown=lambda wait: events.append("executor")))
+    monkeypatch.setattr(main, "rerank_executor", SimpleNamespace(shutdown=lambda wait: None))
+    monkeypatch.setattr(main, "shutdown_tracing", lambda: events.append("tracing"))
+    monkeypatch.setattr(main, "startup_task", None)
+    with TestClient(main.app):
+        assert main.startup_task is not None
+    assert [event for event in events if event != "warm_start"] == ["stop_watcher", "executor", "tracing"]
+
+
+def test_canned_query_ranking_is_reused_until_the_index_changes(client, ready, monkeypatch):
+    canned = CannedQueries(["Quais registros de calibração manter?"], depth=main.SEARCH_MAX_DEPTH)
+    canned.encode(SimpleNamespace(encode=lambda texts: np.stack([vector(text) for text in texts])))
+    monkeypatch.setattr(main, "canned_queries", canned)
+    request = {"query": "quais registros de calibracao manter", "k": 2}
+
+    first = client.post("/search", json=request).json()
+    second = client.post("/search", json=request).json()
+    assert first["metrics"]["source"] == "search"
+    assert second["metrics"]["source"] == "precomputed"
+    assert second["results"] == first["results"]
+
+    monkeypatch.setattr(main.index_manager.current, "version", "novo")
+    assert client.post("/search", json=request).json()["metrics"]["source"] == "search"
@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+from metrics import LatencyHistogram, MetricsStore, RunningStats
+
+
+def success(total_ms, cache="miss", retrieval_ms=10.0, generation_ms=50.0, timestamp="2024-01-01T00:00:00"):
+    return {"timestamp": timestamp, "query": "q", "status": "success", "cache": cache,
+            "total_time_ms": total_ms, "retrieval_time_ms": retrieval_ms, "generation_time_ms": generation_ms}
+
+
+def test_running_stats_merge_matches_numpy():
+    values = np.random.default_rng(0).exponential(100, 500)
+    left, right = RunningStats(), RunningStats()
+    for value in values[:200]:
+        left.add(value)
+    for value in values[200:]:
+        right.add(value)
+    left.merge(right)
+    assert left.count == len(values)
+    assert left.mean == pytest.approx(values.mean())
+    assert left.variance == pytest.approx(values.var())
+    assert left.min == values.min() and left.max == values.max()
+
+
+def test_histogram_percentile_relative_error():
+    histogram = LatencyHistogram()
+    values = np.arange(1, 1001, dtype=float)
+    for value in values:
+        histogram.add(value)
+    assert histogram.percentile(50) == pytest.approx(500, rel=0.05)
+    assert histogram.percentile(99) == pytest.approx(990, rel=0.05)
+    assert histogram.percentile(100) == 1000
+
+
+def test_histogram_merge_requires_same_buckets():
+    with pytest.raises(ValueError):
+        LatencyHistogram().merge(LatencyHistogram(growth=1.1))
+
+
+def test_record_success_skips_stages_only_for_cache_hits():
+    store = MetricsStore()
+    store.record_success(success(100))
+    store.record_success(success(120, cache="bypass"))
+    store.record_success(success(2, cache="exact"))
+    store.record_success(success(3, cache="semantic"))
+    assert store.stages["total"].stats.count == 4
+    assert store.stages["retrieval"].stats.count == 2
+    assert store.stages["generation"].stats.count == 2
+
+
+def test_merge_combines_workers():
+    a, b = MetricsStore(recent_size=3), MetricsStore(recent_size=3)
+    for i, total in enumerate((100, 200)):
+        a.record_success(success(total, timestamp=f"2024-01-01T00:00:0{2 * i}"))
+    for i, total in enumerate((300, 400)):
+        b.record_success(success(total, timestamp=f"2024-01-01T00:00:0{2 * i + 1}"))
+    b.record_error({"timestamp": "2024-01-01T00:00:09", "query": "q", "status": "error", "error": "x"})
+    a.merge(b)
+    assert a.total_queries == 4 and a.errors == 1
+    assert a.stages["total"].stats.mean == pytest.approx(250)
+    assert a.stages["total"].histogram.count == 4
+    # Só as mais recentes de todos os workers, em ordem
+    assert [q["timestamp"][-2:] for q in a.recent] == ["02", "03", "09"]
+
+
+def test_to_dict_from_dict_round_trip():
+    store = MetricsStore()
+    for total in (10, 20, 30):
+        store.record_success(success(total))
+    # Mesmo caminho do StatsPublisher: snapshot serializado em JSON
+    restored = MetricsStore.from_dict(json.loads(json.dumps(store.to_dict())))
+    assert restored.total_queries == 3
+    assert restored.summary() == store.summary()
+    assert restored.stage_summary() == store.stage_summary()
+    assert list(restored.recent) == list(store.recent)
+
+
+def test_from_dict_of_empty_store():
+    restored = MetricsStore.from_dict(json.loads(json.dumps(MetricsStore().to_dict())))
+    assert restored.total_queries == 0
+    assert restored.stage_summary()["total"] == {"count": 0}
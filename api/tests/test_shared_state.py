@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+import shared_state
+from answer_cache import SHARED_FALLBACK_TTL_S, AnswerCache
+from shared_state import MemoryBackend, ReloadBroadcast, create_state_backend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(shared_state.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_memory_backend_get_set():
+    backend = MemoryBackend()
+    assert backend.get("a") is None
+    backend.set("a", b"1")
+    assert backend.get("a") == b"1"
+    backend.set("a", b"2")
+    assert backend.get("a") == b"2"
+
+
+def test_memory_backend_ttl(clock):
+    backend = MemoryBackend()
+    backend.set("a", b"1", ttl_seconds=10)
+    backend.set("b", b"2")
+    clock[0] += 9.9
+    assert backend.get("a") == b"1"
+    clock[0] += 0.1
+    assert backend.get("a") is None
+    assert backend.get("b") == b"2"
+
+
+def test_memory_backend_get_many_and_scan(clock):
+    backend = MemoryBackend()
+    backend.set("rag:workers:1", b"w1")
+    backend.set("rag:workers:2", b"w2", ttl_seconds=1)
+    backend.set("rag:answers:x", b"x")
+    assert backend.get_many(["rag:workers:1", "missing", "rag:answers:x"]) == [b"w1", None, b"x"]
+    assert backend.scan("rag:workers:") == {"rag:workers:1": b"w1", "rag:workers:2": b"w2"}
+    clock[0] += 1
+    assert backend.scan("rag:workers:") == {"rag:workers:1": b"w1"}
+
+
+def test_create_state_backend():
+    assert create_state_backend("local") is None
+    assert isinstance(create_state_backend("memory"), MemoryBackend)
+    with pytest.raises(ValueError):
+        create_state_backend("sqlite")
+
+
+def test_reload_broadcast_reaches_other_workers():
+    async def scenario():
+        backend = MemoryBackend()
+        calls = {"a": [], "b": []}
+
+        async def reload_a(force):
+            calls["a"].append(force)
+
+        async def reload_b(force):
+            calls["b"].append(force)
+
+        a = ReloadBroadcast(backend, "rag", reload_a, interval_s=0.01)
+        b = ReloadBroadcast(backend, "rag", reload_b, interval_s=0.01)
+        await a.publish(False)  # anterior à inicialização de b: ignorado
+        a.start()
+        b.start()
+        await asyncio.sleep(0.05)
+        await a.publish(True)
+        await asyncio.sleep(0.05)
+        await a.stop()
+        await b.stop()
+        return calls
+
+    assert asyncio.run(scenario()) == {"a": [], "b": [True]}
+
+
+class RecordingBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.ttls = {}
+
+    def set(self, key, value, ttl_seconds=None):
+        self.ttls[key] = ttl_seconds
+        super().set(key, value, ttl_seconds)
+
+
+@pytest.mark.parametrize("ttl_seconds,expected", [(60, 60), (0, SHARED_FALLBACK_TTL_S)])
+def test_shared_answers_always_expire(ttl_seconds, expected):
+    # Com volatile-lru, só chaves com TTL podem ser despejadas pelo Redis
+    backend = RecordingBackend()
+    cache = AnswerCache(ttl_seconds=ttl_seconds, index_version="v1", shared=backend)
+    cache.put("Como calibrar?", None, {"answer": "a", "context_used": [], "documents_retrieved": 0})
+    assert list(backend.ttls.values()) == [expected]
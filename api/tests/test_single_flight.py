@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("q", work) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert [result for result, _ in results] == ["answer"] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert len(calls) == 1
+    assert flight.summary() == {"executions": 1, "coalesced": 4, "in_flight": 0, "coalesced_rate": 0.8}
+
+
+def test_nothing_is_kept_after_completion():
+    flight = SingleFlight()
+
+    async def work():
+        return 1
+
+    async def scenario():
+        await flight.do("q", work)
+        await flight.do("q", work)
+
+    asyncio.run(scenario())
+    assert flight.stats == {"executions": 2, "coalesced": 0}
+
+
+def test_exception_is_shared():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("falhou")
+
+    async def scenario():
+        return await asyncio.gather(flight.do("q", work), flight.do("q", work), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.stats == {"executions": 1, "coalesced": 1}
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        first = asyncio.create_task(flight.do("q", work))
+        second = asyncio.create_task(flight.do("q", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == ("answer", True)
@@ -1,11 +1,89 @@
 import os
+import json
+import time
+import threading
+from collections import OrderedDict
 import requests
 import streamlit as st
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
 
 # API URL configurável via variável de ambiente para deploy em containers
 API_BASE_URL = os.getenv("API_URL", "http://localhost:8000")
 API_URL = f"{API_BASE_URL}/ask"
+API_STREAM_URL = f"{API_BASE_URL}/ask/stream"
+# Exibe a resposta token a token via /ask/stream (STREAM_RESPONSES=false volta ao /ask)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+# (conexão, leitura): no streaming, a leitura é o intervalo máximo entre dois fragmentos
+API_TIMEOUT = (float(os.getenv("API_CONNECT_TIMEOUT_S", "3")), float(os.getenv("API_TIMEOUT_S", "60")))
+HEALTH_CACHE_TTL_S = float(os.getenv("HEALTH_CACHE_TTL_S", "10"))
+UI_ANSWER_CACHE_TTL_S = float(os.getenv("UI_ANSWER_CACHE_TTL_S", "600"))
+UI_ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("UI_ANSWER_CACHE_MAX_ENTRIES", "256"))
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """Sessão HTTP compartilhada por todas as execuções e usuários: conexões keep-alive reaproveitadas."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=int(os.getenv("API_POOL_SIZE", "16")))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class AnswerMemo:
+    """Respostas já exibidas, por pergunta, com TTL e limite de entradas (LRU) compartilhados entre sessões."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(question: str) -> str:
+        return " ".join(question.lower().split())
+
+    def get(self, question: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(self.key(question))
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[self.key(question)]
+                return None
+            self._entries.move_to_end(self.key(question))
+            return entry[1]
+
+    def put(self, question: str, value: dict):
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[self.key(question)] = (time.monotonic(), value)
+            self._entries.move_to_end(self.key(question))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource
+def answer_memo() -> AnswerMemo:
+    return AnswerMemo(UI_ANSWER_CACHE_TTL_S, UI_ANSWER_CACHE_MAX_ENTRIES)
+
+
+@st.cache_data(ttl=HEALTH_CACHE_TTL_S, show_spinner=False)
+def fetch_health_status() -> str:
+    """Status do /health, reaproveitado por HEALTH_CACHE_TTL_S em vez de consultado a cada rerun."""
+    try:
+        health = http_session().get(f"{API_BASE_URL}/health", timeout=2)
+    except requests.exceptions.RequestException:
+        return "offline"
+    if health.status_code != 200:
+        return "unhealthy"
+    try:
+        return health.json().get("status", "unknown")
+    except ValueError:  # corpo que não é JSON (ex.: página de erro de um proxy)
+        return "unknown"
 
 # Page configuration
 st.set_page_config(
@@ -104,16 +182,17 @@ with col2:
 with st.sidebar:
     st.markdown("## Sobre o Sistema")
     
-    # Health check
-    try:
-        health = requests.get(f"{API_BASE_URL}/health", timeout=2)
-        if health.status_code == 200:
-            st.success("API Online", icon="✅")
-        else:
-            st.warning("⚠️ API com Problema", icon="⚠️")
-    except:
+    # Health check (em cache por HEALTH_CACHE_TTL_S)
+    status = fetch_health_status()
+    if status == "healthy":
+        st.success("API Online", icon="✅")
+    elif status == "starting":
+        st.info("API iniciando (carregando modelo e índice)", icon="⏳")
+    elif status == "offline":
         st.error("API Offline", icon="❌")
         st.caption(f"Não conseguiu conectar em: {API_BASE_URL}")
+    else:
+        st.warning("⚠️ API com Problema", icon="⚠️")
     
     info_col1, info_col2 = st.columns(2)
     with info_col1:
@@ -194,48 +273,128 @@ col1, col2, col3 = st.columns([1, 2, 1])
 with col2:
     submit_button = st.button("Enviar Consulta", use_container_width=True, type="primary")
 
+def answer_html(answer: str) -> str:
+    return f"""
+        <div class="response-success">
+            <p style="line-height: 1.8; color: #e0e0e0;">{answer}</p>
+        </div>
+    """
+
+
+def render_documents(context_used: list[str]):
+    with st.expander("Documentos Recuperados", expanded=False):
+        st.markdown("""
+            <p style="color: #b0b0b0; font-size: 0.95rem;">
+            Trechos da norma ISO/IEC 17025 utilizados para gerar a resposta:
+            </p>
+        """, unsafe_allow_html=True)
+
+        for i, context in enumerate(context_used, 1):
+            st.markdown(f"""
+                <div style="background-color: var(--card-bg); padding: 1rem; border-radius: 0.5rem; margin: 0.5rem 0; border-left: 3px solid var(--primary-color);">
+                    <p style="margin: 0; color: var(--primary-color); font-weight: 600;">Documento {i}</p>
+                    <p style="margin: 0.5rem 0 0 0; color: #d0d0d0; font-size: 0.95rem;">{context}...</p>
+                </div>
+            """, unsafe_allow_html=True)
+
+
+def show_api_error(response):
+    """429/503 são sobrecarga temporária da API (fila do LLM cheia ou limite da OpenAI)."""
+    if response.status_code in (429, 503):
+        retry_after = response.headers.get("Retry-After")
+        wait = f" em {retry_after}s" if retry_after else " em instantes"
+        st.warning(f"⏳ Sistema sobrecarregado no momento. Tente novamente{wait}.")
+    else:
+        st.error(f"Erro na API: Status {response.status_code}")
+        st.info("Verifique se a API está disponível.")
+
+
+def stream_answer(question: str) -> bool:
+    """Consome o NDJSON de /ask/stream renderizando a resposta conforme os tokens chegam."""
+    st.markdown("### Resposta do Sistema")
+    answer_placeholder = st.empty()
+    answer_placeholder.markdown(answer_html("Processando consulta..."), unsafe_allow_html=True)
+    documents_placeholder = st.container()
+    answer = ""
+    context_used = []
+    completed = False
+
+    with http_session().post(API_STREAM_URL, json={"question": question}, stream=True,
+                             timeout=API_TIMEOUT) as response:
+        if response.status_code != 200:
+            show_api_error(response)
+            return False
+
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["event"] == "context":
+                    context_used = event["context_used"]
+                    with documents_placeholder:
+                        render_documents(context_used)
+                elif event["event"] == "token":
+                    answer += event["content"]
+                    answer_placeholder.markdown(answer_html(answer + "▌"), unsafe_allow_html=True)
+                elif event["event"] == "done":
+                    completed = True
+                elif event["event"] == "error":
+                    st.error(f"❌ Erro ao processar consulta: {event['error']}")
+                    return False
+        except requests.exceptions.ConnectionError as e:
+            # Durante a leitura do corpo, o requests entrega o timeout do urllib3 como ConnectionError
+            if e.args and isinstance(e.args[0], ReadTimeoutError):
+                raise requests.exceptions.ReadTimeout(e, response=response) from e
+            raise
+
+    answer_placeholder.markdown(answer_html(answer), unsafe_allow_html=True)
+    if not completed:
+        # Stream encerrado sem o evento "done": resposta parcial, não vai para o memo
+        st.warning("⚠️ A resposta foi interrompida antes do fim. Tente novamente.")
+        return False
+    answer_memo().put(question, {"answer": answer, "context_used": context_used})
+    return True
+
+
+def show_answer(data: dict):
+    st.markdown("### Resposta do Sistema")
+    st.markdown(answer_html(data["answer"]), unsafe_allow_html=True)
+    render_documents(data["context_used"])
+
+
 if submit_button:
     if not question.strip():
         st.warning("Por favor, digite uma consulta antes de enviar.")
     else:
         with st.spinner("Processando consulta..."):
             try:
-                response = requests.post(API_URL, json={"question": question})
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # Display response with improved styling
-                    st.markdown("### Resposta do Sistema")
-                    st.markdown(f"""
-                        <div class="response-success">
-                            <p style="line-height: 1.8; color: #e0e0e0;">{data["answer"]}</p>
-                        </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Display retrieved documents
-                    with st.expander("Documentos Recuperados", expanded=False):
-                        st.markdown("""
-                            <p style="color: #b0b0b0; font-size: 0.95rem;">
-                            Trechos da norma ISO/IEC 17025 utilizados para gerar a resposta:
-                            </p>
-                        """, unsafe_allow_html=True)
-                        
-                        for i, context in enumerate(data["context_used"], 1):
-                            st.markdown(f"""
-                                <div style="background-color: var(--card-bg); padding: 1rem; border-radius: 0.5rem; margin: 0.5rem 0; border-left: 3px solid var(--primary-color);">
-                                    <p style="margin: 0; color: var(--primary-color); font-weight: 600;">Documento {i}</p>
-                                    <p style="margin: 0.5rem 0 0 0; color: #d0d0d0; font-size: 0.95rem;">{context}...</p>
-                                </div>
-                            """, unsafe_allow_html=True)
-                    
-                    # Clear example question after use
-                    if 'example_question' in st.session_state:
-                        del st.session_state.example_question
-                        
+                cached = answer_memo().get(question)
+                if cached is not None:
+                    # Mesma pergunta exibida há pouco (por qualquer usuário): sem nova chamada à API
+                    show_answer(cached)
+                    answered = True
+                elif STREAM_RESPONSES:
+                    answered = stream_answer(question)
                 else:
-                    st.error(f"Erro na API: Status {response.status_code}")
-                    st.info("Verifique se a API está disponível.")
-                    
+                    answered = False
+                    response = http_session().post(API_URL, json={"question": question}, timeout=API_TIMEOUT)
+                    if response.status_code != 200:
+                        show_api_error(response)
+                    elif "answer" not in (data := response.json()):
+                        st.error(f"❌ Erro ao processar consulta: {data.get('error')}")
+                    else:
+                        show_answer(data)
+                        answer_memo().put(question, {"answer": data["answer"], "context_used": data["context_used"]})
+                        answered = True
+
+                # Clear example question after use
+                if answered and 'example_question' in st.session_state:
+                    del st.session_state.example_question
+
+            except requests.exceptions.ReadTimeout:
+                st.error("❌ Tempo de Espera Excedido")
+                st.warning(f"A API ficou mais de {API_TIMEOUT[1]:.0f}s sem enviar dados. Tente novamente.")
             except requests.exceptions.ConnectionError:
                 st.error("❌ Erro de Conexão")
                 st.warning(f"Não foi possível conectar à API em: **{API_BASE_URL}**")